@@ -1,18 +1,98 @@
-from flask import Flask, flash, redirect, render_template, request, url_for
-from datetime import datetime
+from flask import Flask, Response, abort, flash, jsonify, redirect, render_template, request, url_for
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from neo4j import GraphDatabase
+from src.connectingSearch import ConnectingSearch
+from src.farePrefetcher import FarePrefetcher
 from src.graphRepository import GraphRepository
-from src.ryanairApi import getActiveAirports, getDestinationsForAirport
-from src.utils import build_trips_from_neo4j_results, distanceForEachAirport
+from src.ingestionJobs import IngestionBusy, IngestionJobManager
+from src.metrics import REGISTRY, log_event, search_stage_seconds
+from src.ryanairApi import (
+    adv_flights_cache,
+    exchange_rate_cache,
+    getActiveAirports,
+    getAdvFlights,
+    get_exchange_rate,
+    http_client,
+    request_scheduler,
+)
+from src.searchCache import SearchResultCache, canonical_search
+from src.searchEngine import FlightSearchEngine
+from src.searchJobs import JobRejected, SearchJob, SearchJobManager
+from src.tripColumns import (
+    TRIP_COLUMNS,
+    AirportDictionary,
+    decode_cursor,
+    encode_cursor,
+    filter_trips,
+    query_fingerprint,
+    trip_columns,
+)
+from src.utils import SORT_KEYS, build_trips_from_neo4j_results
 from typing import List
 
+import atexit
+import gzip
+import json
+import logging
+import math
 import os
+import time
 
 neo4j_uri = os.getenv("NEO4J_URI", "bolt://neo4j:7687") 
 neo4j_user = os.getenv("NEO4J_USER", "neo4j")
 neo4j_password = os.getenv("NEO4J_PASSWORD", "test1234")
 flask_secret_key = os.getenv("FLASK_SECRET_KEY", "supersecretkey")
 
+# Structured logs are one JSON object per line (see src/metrics.py)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(message)s")
+
+# Connection pool settings, shared by every request in this process.
+# Size the pool to roughly the number of threads per gunicorn worker.
+neo4j_max_pool_size = int(os.getenv("NEO4J_MAX_POOL_SIZE", "50"))
+neo4j_acquisition_timeout = float(os.getenv("NEO4J_CONNECTION_ACQUISITION_TIMEOUT", "30"))
+neo4j_liveness_check_timeout = float(os.getenv("NEO4J_LIVENESS_CHECK_TIMEOUT", "30"))
+neo4j_max_connection_lifetime = float(os.getenv("NEO4J_MAX_CONNECTION_LIFETIME", "3600"))
+
+# "neo4j" runs every search as Cypher, "memory" uses the in-process FlightSearchEngine
+search_backend = os.getenv("SEARCH_BACKEND", "neo4j")
+search_engine_max_age = float(os.getenv("SEARCH_ENGINE_MAX_AGE", "300"))
+
+# Cached search results: candidate rows follow the graph, assembled trips also follow fares
+search_cache_candidate_ttl = float(os.getenv("SEARCH_CACHE_CANDIDATE_TTL", "3600"))
+search_cache_trip_ttl = float(os.getenv("SEARCH_CACHE_TRIP_TTL", "300"))
+search_cache_maxsize = int(os.getenv("SEARCH_CACHE_MAXSIZE", "256"))
+
+# Connecting (multi-hop) search over the in-process route/date snapshot
+connecting_max_hops = int(os.getenv("CONNECTING_MAX_HOPS", "2"))
+connecting_max_paths = int(os.getenv("CONNECTING_MAX_PATHS", "200"))
+connecting_max_results = int(os.getenv("CONNECTING_MAX_RESULTS", "100"))
+connecting_time_budget = float(os.getenv("CONNECTING_TIME_BUDGET", "20"))
+graph_version_check_interval = float(os.getenv("GRAPH_VERSION_CHECK_INTERVAL", "5"))
+
+trips_page_size = int(os.getenv("TRIPS_PAGE_SIZE", "100"))
+
+# JSON search API: trips ranked per search, largest page and smallest gzipped response
+search_api_max_trips = int(os.getenv("SEARCH_API_MAX_TRIPS", "5000"))
+search_api_max_page_size = int(os.getenv("SEARCH_API_MAX_PAGE_SIZE", "1000"))
+gzip_min_size = int(os.getenv("GZIP_MIN_SIZE", "1024"))
+
+# Background search jobs: concurrency, admission limit, per-job time budget and how many trips each keeps
+search_job_workers = int(os.getenv("SEARCH_JOB_WORKERS", "4"))
+search_job_max_queued = int(os.getenv("SEARCH_JOB_MAX_QUEUED", "16"))
+search_job_time_budget = float(os.getenv("SEARCH_JOB_TIME_BUDGET", "120"))
+search_job_max_trips = int(os.getenv("SEARCH_JOB_MAX_TRIPS", "1000"))
+
+# Background worker that fetches likely legs before anyone searches for them
+fare_prefetch_enabled = os.getenv("FARE_PREFETCH_ENABLED", "false").lower() == "true"
+fare_prefetch_interval = float(os.getenv("FARE_PREFETCH_INTERVAL", "300"))
+fare_prefetch_budget = int(os.getenv("FARE_PREFETCH_BUDGET", "200"))
+fare_prefetch_horizon_days = int(os.getenv("FARE_PREFETCH_HORIZON_DAYS", "28"))
+
+# Background ingestion
+ingestion_lock_ttl = float(os.getenv("INGESTION_LOCK_TTL", "900"))
+ingestion_history = int(os.getenv("INGESTION_HISTORY", "20"))
+
 
 # BASE_AIRPORTS = ["DUB", "SNN", "NOC"]
 
@@ -28,13 +108,158 @@ def parse_dates(date_string: str) -> List[datetime]:
 def parse_list(value: str) -> List[str]:
     return [v.strip() for v in value.split(",") if v.strip()]
 
+
+class InvalidInput(ValueError):
+    """A form field that cannot be parsed, answered with a 400."""
+
+
+def parse_number(value: str, name: str, kind=int, minimum=None):
+    try:
+        number = kind(value)
+    except (TypeError, ValueError):
+        raise InvalidInput(f"{name} must be {'an integer' if kind is int else 'a number'}, got {value!r}")
+    if not math.isfinite(number):
+        raise InvalidInput(f"{name} must be a finite number, got {value!r}")
+    if minimum is not None and number < minimum:
+        raise InvalidInput(f"{name} must be at least {minimum}, got {value!r}")
+    return number
+
+
+def form_number(form, name: str, kind=int, default=None, minimum=None):
+    """Number from an optional form field, `default` when it is missing or empty."""
+    value = form.get(name)
+    return parse_number(value, name, kind, minimum) if value else default
+
+
+def form_dates(form, name: str) -> List[datetime]:
+    try:
+        return parse_dates(form[name])
+    except ValueError:
+        raise InvalidInput(f"{name} must be comma separated YYYY-MM-DD dates, got {form[name]!r}")
+
 # Neo4j driver setup
 def get_neo4j_driver(uri=neo4j_uri, user=neo4j_user, password=neo4j_password):
-    return GraphDatabase.driver(uri, auth=(user, password))
+    return GraphDatabase.driver(
+        uri,
+        auth=(user, password),
+        max_connection_pool_size=neo4j_max_pool_size,
+        connection_acquisition_timeout=neo4j_acquisition_timeout,
+        liveness_check_timeout=neo4j_liveness_check_timeout,
+        max_connection_lifetime=neo4j_max_connection_lifetime,
+    )
 
-def get_airports_by_codes(airport_codes, airports):
-    return [airport for airport in airports if airport.code in airport_codes]
+def get_pool_stats(driver) -> dict:
+    # The driver has no public pool API, so read its internal pool defensively
+    pool = getattr(driver, "_pool", None)
+    if pool is None:
+        return {}
 
+    connections = [
+        connection
+        for address_connections in pool.connections.values()
+        for connection in address_connections
+    ]
+    in_use = sum(1 for connection in connections if connection.in_use)
+
+    return {
+        "max_pool_size": neo4j_max_pool_size,
+        "connection_acquisition_timeout": neo4j_acquisition_timeout,
+        "liveness_check_timeout": neo4j_liveness_check_timeout,
+        "open": len(connections),
+        "in_use": in_use,
+        "idle": len(connections) - in_use,
+        "pending": sum(pool.connections_reservations.values()),
+    }
+
+
+# One driver (and connection pool) per process, closed on shutdown
+driver = get_neo4j_driver()
+atexit.register(driver.close)
+
+graph_repository = GraphRepository(driver)
+# Loaded on first use unless it also serves the direct search
+route_engine = FlightSearchEngine(graph_repository, search_engine_max_age)
+search_engine = route_engine if search_backend == "memory" else None
+connecting_search = ConnectingSearch(route_engine)
+search_cache = SearchResultCache(
+    graph_repository,
+    candidate_ttl=search_cache_candidate_ttl,
+    trip_ttl=search_cache_trip_ttl,
+    maxsize=search_cache_maxsize,
+    version_check_interval=graph_version_check_interval,
+)
+
+try:
+    graph_repository.setup_schema()
+    graph_repository.load_spatial_index()
+    if search_engine:
+        search_engine.reload()
+except Exception as e:
+    print(f"Warning: Could not prepare Neo4j schema and airport index at startup. Error: {e}")
+
+fare_prefetcher = FarePrefetcher(
+    graph_repository,
+    interval=fare_prefetch_interval,
+    budget=fare_prefetch_budget,
+    horizon_days=fare_prefetch_horizon_days,
+)
+if fare_prefetch_enabled:
+    fare_prefetcher.start()
+
+
+def query_candidates(search: dict):
+    return search_cache.get_candidates(search, lambda: (search_engine or graph_repository).query_flights(**search))
+
+
+def run_search_job(job: SearchJob):
+    job.stage = "query"
+    job.check_stop()
+    result = query_candidates(job.search)
+    fare_prefetcher.record_search(result, job.adults)
+    job.results = len(result)
+
+    job.stage = "pricing"
+    job.check_stop()
+    return search_cache.get_trips(
+        job.search,
+        job.adults,
+        job.sort_key,
+        job.limit,
+        lambda: build_trips_from_neo4j_results(
+            result,
+            job.adults,
+            graph_repository.getAirports(),
+            limit=job.limit,
+            sort_key=job.sort_key,
+            on_progress=job.set_progress,
+            should_stop=job.should_stop,
+            max_fare=job.search["max_total_fare"],
+            on_trips=job.set_trips_found,
+        ),
+    )
+
+
+def reload_search_state():
+    if search_engine:
+        search_engine.reload()
+    else:
+        route_engine.invalidate()
+    search_cache.clear()
+
+
+ingestion_jobs = IngestionJobManager(
+    graph_repository,
+    on_change=reload_search_state,
+    lock_ttl=ingestion_lock_ttl,
+    history=ingestion_history,
+)
+
+search_jobs = SearchJobManager(
+    run_search_job,
+    max_workers=search_job_workers,
+    max_queued=search_job_max_queued,
+    time_budget=search_job_time_budget,
+)
 
 # Flask application setup
 app = Flask(__name__)
@@ -42,53 +267,325 @@ app.secret_key = flask_secret_key
 
 @app.route("/", methods=["GET"])
 def index():
-    airports = GraphRepository(get_neo4j_driver()).getAirports()
+    airports = graph_repository.getAirports()
     country_set = set(airport.countryName for airport in airports)
     country_options = sorted(list(country_set))
 
-    base_airports_obj = GraphRepository(get_neo4j_driver()).getBaseAirports()
+    base_airports_obj = graph_repository.getBaseAirports()
     base_airport_codes = {airport.code for airport in base_airports_obj}
     base_airport_codes = sorted(list(base_airport_codes))
 
     return render_template("index.jinja2", origin_options=base_airport_codes, country_options=country_options)
 
 
+def parse_search_form(form) -> dict:
+    # Keyword arguments for GraphRepository.query_flights
+    return {
+        "origin_departure_airports": form.getlist("origin_departure_airports[]"),
+        "origin_arrival_airports": form.getlist("origin_arrival_airports[]"),
+        "r1_dates": form_dates(form, "r1_dates"),
+        "r2_dates": form_dates(form, "r2_dates"),
+        "lengths_of_stay": [parse_number(x, "lengths_of_stay", minimum=0) for x in parse_list(form["lengths_of_stay"])],
+        "blacklist_countries": form.getlist("blacklist_countries[]"),
+        "whitelist_countries": form.getlist("whitelist_countries[]"),
+        "same_airport_return": "same_airport_return" in form,
+        "max_distance": form_number(form, "max_distance", minimum=0),
+        "max_total_fare": form_number(form, "max_total_fare", float, minimum=0),
+    }
+
+
+@contextmanager
+def timed_stage(timings: dict, stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = time.perf_counter() - started
+        search_stage_seconds.observe(timings[stage], stage=stage)
+
+
 @app.route("/submit", methods=["POST"])
 def submit():
-    origin_departure_airports = request.form.getlist("origin_departure_airports[]")
-    origin_arrival_airports = request.form.getlist("origin_arrival_airports[]")
+    sort_key = request.form.get("sort", "fare")
+    if sort_key not in SORT_KEYS:
+        sort_key = "fare"
+
+    # The page loads its trips from /api/search, so it renders before the search finishes
+    return render_template(
+        "trips.jinja2",
+        trips=None,
+        sort_key=sort_key,
+        sort_keys=SORT_KEYS,
+        search_form=request.form,
+        results_action=url_for("submit"),
+        api_url=url_for("api_search"),
+        page_size=trips_page_size,
+    )
 
-    r1_dates = parse_dates(request.form["r1_dates"])
-    r2_dates = parse_dates(request.form["r2_dates"])
 
-    lengths_of_stay = [int(x) for x in parse_list(request.form["lengths_of_stay"])]
-    adults = int(request.form["adults"])
-    
-    blacklist_countries = request.form.getlist("blacklist_countries[]")
-    whitelist_countries = request.form.getlist("whitelist_countries[]")
-
-    same_airport_return = "same_airport_return" in request.form
-    max_distance = int(request.form["max_distance"]) if request.form.get("max_distance") else None
-
-   # Run the query
-    result = GraphRepository(get_neo4j_driver()).query_flights(
-        origin_departure_airports,
-        origin_arrival_airports,
-        r1_dates,
-        r2_dates,
-        lengths_of_stay,
-        blacklist_countries,
-        whitelist_countries,
-        same_airport_return,
-        max_distance
-    )
-
-    # Build trips from the query result
-    trips = build_trips_from_neo4j_results(result, adults, GraphRepository(get_neo4j_driver()).getAirports())
-    
-    trips.sort(key=lambda t: (t.fullFare))
+@app.errorhandler(InvalidInput)
+def invalid_input(e):
+    return json_response({"error": str(e)}, 400)
+
+
+def json_response(payload, status: int = 200) -> Response:
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    response = Response(body, status=status, mimetype="application/json")
+    if len(body) >= gzip_min_size and "gzip" in request.headers.get("Accept-Encoding", ""):
+        response.set_data(gzip.compress(body, compresslevel=5))
+        response.headers["Content-Encoding"] = "gzip"
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
+
+
+@app.route("/api/search", methods=["POST"])
+def api_search():
+    """
+    Trips for the search form fields as columns, a page at a time.
+
+    Besides the search fields it takes sort, max_fare, destinations[],
+    limit and cursor. The first page (no cursor) also carries the airport
+    dictionary the trip columns index into.
+    """
+    form = request.form
+    search = parse_search_form(form)
+    adults = form_number(form, "adults", default=1, minimum=1)
+    sort_key = form.get("sort", "fare")
+    if sort_key not in SORT_KEYS:
+        return json_response({"error": f"Unknown sort {sort_key}"}, 400)
+
+    limit = max(1, min(form_number(form, "limit", default=trips_page_size), search_api_max_page_size))
+    max_fare = form_number(form, "max_fare", float, minimum=0)
+    destinations = form.getlist("destinations[]")
+    timings = {}
+
+    with timed_stage(timings, "query"):
+        result = query_candidates(search)
+    fare_prefetcher.record_search(result, adults)
+
+    # Every page is cut from one ranking, cached by the search cache
+    with timed_stage(timings, "trips"):
+        trips = search_cache.get_trips(
+            search,
+            adults,
+            sort_key,
+            search_api_max_trips,
+            lambda: build_trips_from_neo4j_results(
+                result,
+                adults,
+                graph_repository.getAirports(),
+                limit=search_api_max_trips,
+                sort_key=sort_key,
+                max_fare=search["max_total_fare"],
+            ),
+        )
+    trips = filter_trips(trips, max_fare, destinations)
+
+    fingerprint = query_fingerprint(
+        canonical_search(search), adults, sort_key, max_fare, sorted(destinations), search_cache.graph_version()
+    )
+    cursor = form.get("cursor")
+    try:
+        offset = decode_cursor(cursor, fingerprint) if cursor else 0
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+
+    with timed_stage(timings, "serialize"):
+        page = trips[offset:offset + limit]
+        airports = AirportDictionary(graph_repository.getAirports())
+        payload = {
+            "columns": TRIP_COLUMNS,
+            "trips": trip_columns(page, airports),
+            "total": len(trips),
+            "next_cursor": encode_cursor(offset + limit, fingerprint) if offset + limit < len(trips) else None,
+        }
+        if not cursor:
+            payload["airports"] = airports.to_columns()
+        response = json_response(payload)
+
+    log_event(
+        "search",
+        backend=search_backend,
+        results=len(result),
+        trips=len(trips),
+        offset=offset,
+        sort=sort_key,
+        bytes=response.content_length,
+        **{f"{stage}_seconds": round(seconds, 3) for stage, seconds in timings.items()},
+    )
+    return response
+
+
+def connecting_trip_response(trip) -> dict:
+    return {
+        "origin": trip.origin,
+        "destination": trip.destination,
+        "via": trip.via,
+        "stops": trip.stops,
+        "fare": round(trip.fullFare, 2),
+        "departure": trip.departureTime.isoformat(timespec="minutes"),
+        "arrival": trip.arrivalTime.isoformat(timespec="minutes"),
+        "travel_minutes": int(trip.travelTime.total_seconds() // 60),
+        "connection_minutes": [int(gap.total_seconds() // 60) for gap in trip.connectionTimes],
+        "legs": [
+            {
+                "origin": leg.origin,
+                "destination": leg.destination,
+                "flight_number": leg.flightNumber,
+                "departure": leg.departureTime.isoformat(timespec="minutes"),
+                "arrival": leg.arrivalTime.isoformat(timespec="minutes"),
+                "fare": leg.fare,
+            }
+            for leg in trip.legs
+        ],
+    }
+
+
+@app.route("/api/connecting", methods=["POST"])
+def api_connecting():
+    """
+    One-way itineraries with up to max_hops connections, cheapest first.
+
+    Takes origin_departure_airports[], destinations[], r1_dates (departure
+    dates), adults, max_hops, min_connection and max_connection (minutes),
+    max_travel_hours, max_total_fare and limit.
+    """
+    form = request.form
+    destinations = form.getlist("destinations[]")
+    if not destinations:
+        return json_response({"error": "At least one destination is required"}, 400)
+
+    max_hops = form_number(form, "max_hops", default=1)
+    if not 0 <= max_hops <= connecting_max_hops:
+        return json_response({"error": f"max_hops must be between 0 and {connecting_max_hops}"}, 400)
+
+    timings = {}
+    with timed_stage(timings, "connecting"):
+        trips = connecting_search.search(
+            form.getlist("origin_departure_airports[]"),
+            destinations,
+            form_dates(form, "r1_dates"),
+            adults=form_number(form, "adults", default=1, minimum=1),
+            max_hops=max_hops,
+            min_connection=timedelta(minutes=form_number(form, "min_connection", default=60, minimum=0)),
+            max_connection=timedelta(minutes=form_number(form, "max_connection", default=480, minimum=0)),
+            max_travel_time=timedelta(hours=form_number(form, "max_travel_hours", float, default=24, minimum=0)),
+            max_total_fare=form_number(form, "max_total_fare", float, minimum=0),
+            limit=max(1, min(form_number(form, "limit", default=50), connecting_max_results)),
+            max_paths=connecting_max_paths,
+            time_budget=connecting_time_budget,
+        )
+
+    log_event(
+        "connecting_search",
+        trips=len(trips),
+        max_hops=max_hops,
+        **{f"{stage}_seconds": round(seconds, 3) for stage, seconds in timings.items()},
+    )
+    return json_response({"trips": [connecting_trip_response(trip) for trip in trips]})
+
+
+def search_job_response(job: SearchJob) -> dict:
+    return dict(
+        job.to_dict(),
+        status_url=url_for("search_job_status", job_id=job.id),
+        events_url=url_for("search_job_events", job_id=job.id),
+        trips_url=url_for("search_job_trips", job_id=job.id),
+    )
+
+
+def get_search_job(job_id: str) -> SearchJob:
+    job = search_jobs.get(job_id)
+    if job is None:
+        abort(404)
+    return job
+
+
+@app.route("/search_jobs", methods=["POST"])
+def submit_search_job():
+    sort_key = request.form.get("sort", "fare")
+    if sort_key not in SORT_KEYS:
+        sort_key = "fare"
+
+    try:
+        job = search_jobs.submit(
+            parse_search_form(request.form),
+            form_number(request.form, "adults", default=1, minimum=1),
+            sort_key,
+            limit=search_job_max_trips,
+            form=request.form.copy(),
+        )
+    except JobRejected as e:
+        response = jsonify({"error": str(e)})
+        response.status_code = 429
+        response.headers["Retry-After"] = "5"
+        return response
+
+    return jsonify(search_job_response(job)), 202
+
+
+@app.route("/search_jobs/<job_id>", methods=["GET"])
+def search_job_status(job_id):
+    return jsonify(search_job_response(get_search_job(job_id)))
+
+
+@app.route("/search_jobs/<job_id>/events", methods=["GET"])
+def search_job_events(job_id):
+    job = get_search_job(job_id)
+
+    def stream():
+        # Server-sent events, one progress snapshot per change until the job finishes
+        last = None
+        while True:
+            snapshot = job.to_dict()
+            snapshot.pop("queued_seconds")
+            snapshot.pop("running_seconds")
+            if snapshot != last:
+                yield f"data: {json.dumps(snapshot)}\n\n"
+                last = snapshot
+            if job.finished:
+                return
+            time.sleep(0.5)
+
+    return Response(stream(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.route("/search_jobs/<job_id>/cancel", methods=["POST"])
+def cancel_search_job(job_id):
+    get_search_job(job_id)
+    return jsonify(search_job_response(search_jobs.cancel(job_id)))
+
+
+@app.route("/search_jobs/<job_id>/trips", methods=["GET", "POST"])
+def search_job_trips(job_id):
+    job = get_search_job(job_id)
+    if job.status != "done":
+        return jsonify(search_job_response(job)), 409
+
+    page = form_number(request.values, "page", default=1, minimum=1)
+    start = (page - 1) * trips_page_size
+
+    # The job ranked its trips once, so the page only offers the sort it was run with
+    return render_template(
+        "trips.jinja2",
+        trips=job.trips[start:start + trips_page_size],
+        page=page,
+        has_next_page=len(job.trips) > start + trips_page_size,
+        sort_key=job.sort_key,
+        sort_keys=[job.sort_key],
+        search_form=job.form,
+        results_action=url_for("search_job_trips", job_id=job.id),
+    )
+
 
-    return render_template("trips.jinja2", trips=trips)
+def submit_ingestion_job(kind: str, bases: List[str], **kwargs):
+    try:
+        job = ingestion_jobs.submit(kind, bases, **kwargs)
+    except IngestionBusy as e:
+        flash(str(e), "warning")
+        return None
+    flash(f"Ingestion job {job.id[:8]} started for {', '.join(job.bases) or 'no new bases'}", "info")
+    return job
 
 
 @app.route("/admin", methods=["GET", "POST"])
@@ -98,69 +595,180 @@ def admin():
     
     airport_codes = sorted(list(airport_codes))
     
-    driver = get_neo4j_driver()
-    base_airports_obj = GraphRepository(driver).getBaseAirports()
+    base_airports_obj = graph_repository.getBaseAirports()
     base_airport_codes = {airport.code for airport in base_airports_obj}
     
     # global selected_airports
     if request.method == "POST":
-        # Update selected base airports        
-        GraphRepository(driver).clearGraph()
-        
+        # Only crawl bases that were added, and drop routes of removed ones
         selected_airports = request.form.getlist("base_airports")
-        
-        desinations = set()
 
-        GraphRepository(driver).save_airports(airports)
-        
-        for selected_airport in selected_airports:
-            GraphRepository(driver).setBaseAirport(selected_airport, True)
+        added_airports = set(selected_airports) - base_airport_codes
+        removed_airports = base_airport_codes - set(selected_airports)
 
-        for aiport in selected_airports:
-            flights = getDestinationsForAirport(aiport, airports)
-            GraphRepository(driver).save_flights(flights)
-            for flight in flights:
-                desinations.add(flight.origin.code)
-
-        airport_objects = get_airports_by_codes(desinations, airports)
-
-        distances = distanceForEachAirport(airport_objects)
-
-        GraphRepository(driver).save_distances(distances)
-        
-        flash(f"Selected base airports updated: {', '.join(selected_airports)}", "success")
+        submit_ingestion_job(
+            "bases",
+            sorted(added_airports),
+            selected=selected_airports,
+            removed=sorted(removed_airports),
+        )
         return redirect(url_for("admin"))
 
     return render_template("admin.jinja2", 
                            airport_codes=airport_codes,
-                           base_airport_codes=base_airport_codes)
+                           base_airport_codes=base_airport_codes,
+                           ingestion=ingestion_response(),
+                           checkpoint=graph_repository.getIngestionCheckpoint())
 
 @app.route("/update_all_flights", methods=["POST"])
 def update_all_flights():
-    driver = get_neo4j_driver()
-    airports = getActiveAirports()
-    
     # Get current base airports
-    base_airports_obj = GraphRepository(driver).getBaseAirports()
+    base_airports_obj = graph_repository.getBaseAirports()
     base_airport_codes = [airport.code for airport in base_airports_obj]
 
-    destinations = set()
-    GraphRepository(driver).save_airports(airports)
-
     # Update flights for all base airports
-    for aiport in base_airport_codes:
-        flights = getDestinationsForAirport(aiport, airports)
-        GraphRepository(driver).save_flights(flights)
-        for flight in flights:
-            destinations.add(flight.origin.code)
+    submit_ingestion_job("refresh", base_airport_codes)
+    return redirect(url_for("admin"))
 
-    airport_objects = get_airports_by_codes(destinations, airports)
-    distances = distanceForEachAirport(airport_objects)
-    GraphRepository(driver).save_distances(distances)
 
-    flash(f"Flights updated for base airports: {', '.join(base_airport_codes)}", "success")
+@app.route("/ingestion_jobs/resume", methods=["POST"])
+def resume_ingestion_job():
+    try:
+        job = ingestion_jobs.resume()
+    except (IngestionBusy, ValueError) as e:
+        flash(str(e), "warning")
+    else:
+        flash(f"Ingestion job {job.id[:8]} resumed, {len(job.completed)} of {len(job.bases)} bases already done", "info")
     return redirect(url_for("admin"))
 
 
+def ingestion_response() -> dict:
+    current = ingestion_jobs.current()
+    return {
+        "current": current.to_dict() if current else None,
+        "history": [job.to_dict() for job in ingestion_jobs.history()],
+    }
+
+
+@app.route("/ingestion_jobs", methods=["GET"])
+def ingestion_job_list():
+    return jsonify(ingestion_response())
+
+
+@app.route("/ingestion_jobs/<job_id>", methods=["GET"])
+def ingestion_job_status(job_id):
+    job = ingestion_jobs.get(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job.to_dict())
+
+
+@app.route("/explain", methods=["POST"])
+def explain():
+    # Which indexes the search query would use for the submitted form
+    return jsonify(graph_repository.explain_flights_query(**parse_search_form(request.form)))
+
+
+@app.route("/pool_stats", methods=["GET"])
+def pool_stats():
+    return jsonify(get_pool_stats(driver))
+
+
+@app.route("/cache_stats", methods=["GET"])
+def cache_stats():
+    return jsonify({
+        "adv_flights": getAdvFlights.cache_info(),
+        "exchange_rates": get_exchange_rate.cache_info(),
+        "prefetch": fare_prefetcher.stats(),
+        "search_results": search_cache.stats(),
+    })
+
+
+@app.route("/search_job_stats", methods=["GET"])
+def search_job_stats():
+    return jsonify(search_jobs.stats())
+
+
+def register_metrics() -> None:
+    caches = {
+        "adv_flights": (getAdvFlights, adv_flights_cache),
+        "exchange_rates": (get_exchange_rate, exchange_rate_cache),
+    }
+
+    REGISTRY.callback(
+        "cache_requests_total", "Cache lookups by result", "counter", ("cache", "result"),
+        lambda: {
+            (name, result): count
+            for name, (cached, _) in caches.items()
+            for result, count in cached.cache_info().items()
+        },
+    )
+    REGISTRY.callback(
+        "cache_evictions_total", "Entries evicted from the in-memory cache tier", "counter", ("cache",),
+        lambda: {(name,): cache.evictions for name, (_, cache) in caches.items()},
+    )
+    REGISTRY.callback(
+        "cache_backend_errors_total", "Shared cache backend calls that failed and fell back to memory", "counter",
+        ("cache",),
+        lambda: {(name,): cache.backend_errors for name, (_, cache) in caches.items()},
+    )
+    REGISTRY.callback(
+        "cache_entries", "Entries in the in-memory cache tier", "gauge", ("cache",),
+        lambda: {(name,): len(cache) for name, (_, cache) in caches.items()},
+    )
+    REGISTRY.callback(
+        "search_result_cache_total", "Search result cache lookups", "counter", ("result",),
+        lambda: {
+            (name,): value
+            for name, value in search_cache.stats().items()
+            if name.endswith(("_hits", "_misses"))
+        },
+    )
+    REGISTRY.callback(
+        "upstream_queue_depth", "Requests waiting for an upstream rate or concurrency slot", "gauge", ("endpoint",),
+        lambda: {(name,): stats["queue_depth"] for name, stats in request_scheduler.stats().items()},
+    )
+    REGISTRY.callback(
+        "upstream_in_flight", "Upstream requests in flight", "gauge", ("endpoint",),
+        lambda: {(name,): stats["in_flight"] for name, stats in request_scheduler.stats().items()},
+    )
+    REGISTRY.callback(
+        "upstream_concurrency_limit", "Current adaptive concurrency limit", "gauge", ("endpoint",),
+        lambda: {(name,): stats["concurrency_limit"] for name, stats in request_scheduler.stats().items()},
+    )
+    REGISTRY.callback(
+        "search_jobs", "Search jobs by status", "gauge", ("status",),
+        lambda: {(status,): count for status, count in search_jobs.stats()["jobs"].items()},
+    )
+    REGISTRY.callback(
+        "ingestion_jobs", "Ingestion jobs in the recent history by status", "gauge", ("status",),
+        lambda: {(status,): count for status, count in ingestion_jobs.stats()["jobs"].items()},
+    )
+    REGISTRY.callback(
+        "neo4j_pool_connections", "Neo4j driver pool connections", "gauge", ("state",),
+        lambda: {
+            (state,): value
+            for state, value in get_pool_stats(driver).items()
+            if state in ("open", "in_use", "idle", "pending")
+        },
+    )
+
+
+register_metrics()
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/upstream_stats", methods=["GET"])
+def upstream_stats():
+    return jsonify({
+        "endpoints": request_scheduler.stats(),
+        "http": http_client.stats(),
+    })
+
+
 if __name__ == "__main__":
     app.run(debug=True)
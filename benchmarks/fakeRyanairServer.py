@@ -0,0 +1,198 @@
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+
+from benchmarks.synthetic import SyntheticNetwork
+
+ROUTES_PATH = re.compile(r"^/api/views/locate/searchWidget/routes/en/airport/(\w+)$")
+DATES_PATH = re.compile(r"^/api/farfnd/v4/oneWayFares/(\w+)/(\w+)/availabilities$")
+CHEAPEST_PATH = re.compile(r"^/api/farfnd/v4/oneWayFares/(\w+)/(\w+)/cheapestPerDay$")
+EXCHANGE_RATE_PATH = re.compile(r"^/v4/latest/(\w+)$")
+
+
+class FakeRyanairServer:
+    """
+    Local stand-in for the Ryanair endpoints used by src/ryanairApi.py, serving
+    a SyntheticNetwork.
+
+    Every response is delayed by `latency` seconds (plus up to `jitter`), and
+    a `throttle_rate` fraction of requests is answered with 429 and
+    Retry-After: 0 so the scheduler's backoff path is exercised. List
+    endpoints send ETags and honour If-None-Match.
+
+    Point the client at it with RYANAIR_BASE_URL and EXCHANGE_RATE_BASE_URL
+    (see `base_url`) before importing src.ryanairApi.
+    """
+
+    def __init__(
+        self,
+        network: SyntheticNetwork,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        throttle_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.network = network
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0, "throttled": 0, "not_modified": 0}
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeRyanairServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-ryanair", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeRyanairServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _count(self, counter: str) -> None:
+        with self.lock:
+            self.counts[counter] += 1
+
+    def _throttled(self) -> bool:
+        with self.lock:
+            return self.rng.random() < self.throttle_rate
+
+    def _delay(self) -> float:
+        with self.lock:
+            return self.latency + self.rng.uniform(0, self.jitter)
+
+    def airports_payload(self) -> list:
+        return [
+            {
+                "code": airport.code,
+                "name": airport.name,
+                "city": {"name": airport.cityName},
+                "country": {"name": airport.countryName},
+                "coordinates": {"latitude": airport.latitude, "longitude": airport.longitude},
+            }
+            for airport in self.network.airports
+        ]
+
+    def availability_payload(self, origin: str, destination: str, depart_date: str) -> dict:
+        lookup = self.network.airport_lookup
+        flights = []
+        if depart_date in {d.isoformat() for d in self.network.routes.get((origin, destination), [])}:
+            flights = [
+                {
+                    "segments": [{
+                        "time": [flight["departure"].isoformat(), flight["arrival"].isoformat()],
+                        "flightNumber": flight["flightNumber"],
+                        "duration": flight["duration"],
+                    }],
+                    "regularFare": {"fares": [{"amount": flight["fare"]}]},
+                }
+                for flight in self.network.fares(origin, destination, depart_date)
+            ]
+
+        return {
+            "currency": "EUR",
+            "trips": [{
+                "originName": lookup[origin].cityName if origin in lookup else origin,
+                "destinationName": lookup[destination].cityName if destination in lookup else destination,
+                "dates": [{"dateOut": depart_date, "flights": flights}],
+            }],
+        }
+
+    def cheapest_payload(self, origin: str, destination: str, month: str, currency: str) -> dict:
+        first = date.fromisoformat(month).replace(day=1)
+        flying = set(self.network.routes.get((origin, destination), []))
+        fares = []
+        day = first
+        while day.month == first.month:
+            if day in flying:
+                price = {"value": self.network.cheapest_fare(origin, destination, day.isoformat()), "currencyCode": currency}
+                fares.append({"day": day.isoformat(), "price": price, "soldOut": False, "unavailable": False})
+            else:
+                fares.append({"day": day.isoformat(), "price": None, "soldOut": False, "unavailable": True})
+            day += timedelta(days=1)
+        return {"outbound": {"fares": fares}}
+
+    def route(self, path: str, query: dict):
+        """(status, payload, cacheable) for a request path."""
+        if path == "/api/views/locate/5/airports/en/active":
+            return 200, self.airports_payload(), True
+
+        if match := ROUTES_PATH.match(path):
+            return 200, [{"arrivalAirport": {"code": code}} for code in self.network.destinations(match[1])], True
+
+        if match := DATES_PATH.match(path):
+            dates = self.network.routes.get((match[1], match[2]), [])
+            return 200, [d.isoformat() for d in dates], True
+
+        if match := CHEAPEST_PATH.match(path):
+            month = query["outboundMonthOfDate"][0]
+            return 200, self.cheapest_payload(match[1], match[2], month, query.get("currency", ["EUR"])[0]), True
+
+        if path == "/api/booking/v4/en-gb/availability":
+            return 200, self.availability_payload(query["Origin"][0], query["Destination"][0], query["DateOut"][0]), False
+
+        if match := EXCHANGE_RATE_PATH.match(path):
+            return 200, {"base": match[1], "rates": {"EUR": 1.0, "GBP": 0.85, "PLN": 4.3}}, False
+
+        return 404, {"error": f"Unknown path {path}"}, False
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server._count("requests")
+                time.sleep(server._delay())
+
+                if server._throttled():
+                    server._count("throttled")
+                    self.send_response(429)
+                    self.send_header("Retry-After", "0")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                url = urlparse(self.path)
+                status, payload, cacheable = server.route(url.path, parse_qs(url.query))
+                body = json.dumps(payload).encode()
+
+                etag = f'"{hashlib.md5(body).hexdigest()}"' if cacheable else None
+                if etag and self.headers.get("If-None-Match") == etag:
+                    server._count("not_modified")
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                if etag:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
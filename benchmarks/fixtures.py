@@ -0,0 +1,114 @@
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+import os
+import shutil
+import subprocess
+import time
+
+from neo4j import GraphDatabase
+
+from benchmarks.synthetic import SyntheticNetwork
+from src.models.airport import Airport
+
+BENCH_NEO4J_URI = os.getenv("BENCH_NEO4J_URI", "bolt://localhost:7687")
+BENCH_NEO4J_USER = os.getenv("BENCH_NEO4J_USER", "neo4j")
+BENCH_NEO4J_PASSWORD = os.getenv("BENCH_NEO4J_PASSWORD", "benchmark")
+BENCH_NEO4J_IMAGE = os.getenv("BENCH_NEO4J_IMAGE", "neo4j:5")
+
+
+class SyntheticRepository:
+    """
+    Read side of GraphRepository over a SyntheticNetwork, enough for
+    FlightSearchEngine to load without a database.
+    """
+
+    def __init__(self, network: SyntheticNetwork):
+        self.network = network
+
+    def getAirports(self) -> List[Airport]:
+        return list(self.network.airports)
+
+    def getRouteDates(self) -> Dict[Tuple[str, str], List[date]]:
+        return dict(self.network.routes)
+
+    def getRouteFares(self) -> Dict[Tuple[str, str], Dict[date, float]]:
+        return self.network.route_fares()
+
+    def getGraphVersion(self) -> Optional[str]:
+        return None
+
+
+class Neo4jContainer:
+    """
+    Throwaway Neo4j in docker or podman, with no volume so every run starts
+    from an empty graph. Used when BENCH_NEO4J_URI does not point at a
+    server already.
+    """
+
+    def __init__(self, image: str = BENCH_NEO4J_IMAGE, password: str = BENCH_NEO4J_PASSWORD, port: int = 17687):
+        self.image = image
+        self.password = password
+        self.port = port
+        self.runtime = shutil.which("docker") or shutil.which("podman")
+        self.container_id: Optional[str] = None
+
+    @property
+    def uri(self) -> str:
+        return f"bolt://localhost:{self.port}"
+
+    def start(self, timeout: float = 120) -> "Neo4jContainer":
+        if self.runtime is None:
+            raise RuntimeError("Neither docker nor podman is installed")
+
+        self.container_id = subprocess.run(
+            [
+                self.runtime, "run", "-d", "--rm",
+                "-p", f"{self.port}:7687",
+                "-e", f"NEO4J_AUTH=neo4j/{self.password}",
+                self.image,
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                with GraphDatabase.driver(self.uri, auth=("neo4j", self.password)) as driver:
+                    driver.verify_connectivity()
+                return self
+            except Exception:
+                if time.monotonic() > deadline:
+                    self.stop()
+                    raise
+                time.sleep(1)
+
+    def stop(self) -> None:
+        if self.container_id:
+            subprocess.run([self.runtime, "stop", self.container_id], capture_output=True)
+            self.container_id = None
+
+
+def connect_neo4j(container: bool = False):
+    """
+    Driver for the benchmark database, or (None, None) when none is reachable.
+    Returns (driver, container) so the caller can stop a container it started.
+    """
+    started = None
+    uri, password = BENCH_NEO4J_URI, BENCH_NEO4J_PASSWORD
+    if container:
+        started = Neo4jContainer().start()
+        uri, password = started.uri, started.password
+
+    driver = GraphDatabase.driver(uri, auth=(BENCH_NEO4J_USER, password))
+    try:
+        driver.verify_connectivity()
+    except Exception as e:
+        print(f"Warning: Neo4j not reachable at {uri}, skipping graph benchmarks. Error: {e}")
+        driver.close()
+        if started:
+            started.stop()
+        return None, None
+
+    return driver, started
@@ -0,0 +1,70 @@
+"""
+PROFILE the round-trip search query against the query it replaced.
+
+Both run over the same populated graph and must return the same rows; the
+rewritten query is expected to touch the store fewer times. Used by the
+Neo4j section of benchmarks.run and by tests/test_query_profile.py.
+"""
+from typing import Dict
+
+from src.graphRepository import GraphRepository
+
+
+def baseline_flights_query(
+    origin_departure_airports: list,
+    origin_arrival_airports: list,
+    r1_dates: list,
+    r2_dates: list,
+    lengths_of_stay: list,
+    blacklist_countries: list = None,
+    whitelist_countries: list = None,
+    same_airport_return: bool = True,
+) -> tuple:
+    """The direct search query as it was before build_flights_query, for comparison only."""
+    query = """
+        MATCH (o1:Airport)-[r1:FLYS_TO]->(d:Airport)-[r2:FLYS_TO]->(o2:Airport)
+        WHERE o1.code IN $origin_departure_airports
+            AND r1.date IN $r1_dates
+            AND r2.date IN $r2_dates
+            AND r2.date >= r1.date
+            AND duration.between(r1.date, r2.date).days IN $lengths_of_stay
+            AND o2.code IN $origin_arrival_airports
+        """
+    if blacklist_countries:
+        query += "\n        AND NOT d.countryName IN $blacklist_countries"
+    if whitelist_countries:
+        query += "\n        AND d.countryName IN $whitelist_countries"
+    if same_airport_return:
+        query += "\n        AND o1.code = o2.code"
+
+    query += """
+        RETURN
+            o1.code AS origin_departure_airport_code,
+            r1.date AS origin_departure_date,
+            d.code  AS destination_arrival_airport_code,
+            d.code  AS destination_departure_airport_code,
+            r2.date AS destination_departure,
+            o2.code AS origin_arrival_airport_code,
+            null    AS landDistance
+        """
+
+    params = {
+        "origin_departure_airports": origin_departure_airports,
+        "origin_arrival_airports": origin_arrival_airports,
+        "r1_dates": r1_dates,
+        "r2_dates": r2_dates,
+        "lengths_of_stay": lengths_of_stay,
+        "blacklist_countries": blacklist_countries or [],
+        "whitelist_countries": whitelist_countries or [],
+    }
+    return query, params
+
+
+def compare(repository: GraphRepository, search: Dict) -> Dict[str, Dict]:
+    """PROFILE the baseline and current direct search for the same arguments."""
+    baseline = repository.profile_query(*baseline_flights_query(**search))
+    current = repository.profile_flights_query(**search)
+
+    if baseline["rows"] != current["rows"]:
+        raise AssertionError(f"Rewritten query returned {current['rows']} rows, baseline {baseline['rows']}")
+    return {"baseline": baseline, "current": current}
@@ -0,0 +1,232 @@
+"""
+Offline benchmarks for ingestion, search and trip assembly.
+
+    python -m benchmarks.run --airports 500 --output bench.json
+    python -m benchmarks.compare baseline.json bench.json
+
+Upstream calls go to a local FakeRyanairServer. Graph benchmarks run
+against BENCH_NEO4J_URI, or a throwaway container with --neo4j-container,
+and are skipped when neither is reachable.
+"""
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.fakeRyanairServer import FakeRyanairServer
+from benchmarks.fixtures import SyntheticRepository, connect_neo4j
+from benchmarks.synthetic import generate_network
+
+
+def measure(fn: Callable[[], object], repeat: int, setup: Optional[Callable[[], None]] = None) -> Dict:
+    times = []
+    output = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        output = fn()
+        times.append(time.perf_counter() - started)
+
+    result = {
+        "runs": repeat,
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "max": max(times),
+        "times": times,
+    }
+    if isinstance(output, int):
+        result["items"] = output
+    elif hasattr(output, "__len__"):
+        result["items"] = len(output)
+    return result
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], check=True, capture_output=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--airports", type=int, default=200, help="synthetic airports (100 to 2000)")
+    parser.add_argument("--bases", type=int, default=5)
+    parser.add_argument("--days", type=int, default=60, help="days of schedule per route")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds added to every fake API response")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of fake API responses that are 429")
+    parser.add_argument("--max-results", type=int, default=2000, help="candidate rows priced per trip assembly run")
+    parser.add_argument("--memory-trips", type=int, default=100_000, help="trips built for the memory benchmark")
+    parser.add_argument("--neo4j-container", action="store_true", help="start a throwaway Neo4j container")
+    parser.add_argument("--skip-neo4j", action="store_true")
+    parser.add_argument("--output", default="bench_results.json")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    network = generate_network(airport_count=args.airports, base_count=args.bases, days=args.days, seed=args.seed)
+    print(f"Synthetic network: {len(network.airports)} airports, {len(network.routes)} routes, "
+          f"{sum(len(dates) for dates in network.routes.values())} flights")
+
+    server = FakeRyanairServer(network, latency=args.latency, throttle_rate=args.throttle_rate, seed=args.seed).start()
+
+    # Must be set before src.ryanairApi is imported, it reads them once
+    os.environ["RYANAIR_BASE_URL"] = server.base_url
+    os.environ["EXCHANGE_RATE_BASE_URL"] = server.base_url
+    os.environ["FARE_CACHE_BACKEND"] = "memory"
+    os.environ.setdefault("CRAWL_RATE_LIMIT", "1000")
+    os.environ.setdefault("FARES_RATE_LIMIT", "1000")
+
+    from benchmarks import queryProfile
+    from src.connectingSearch import ConnectingSearch
+    from src.graphRepository import GraphRepository
+    from src.ryanairApi import getAdvFlights, getDestinationsForAirports, http_client
+    from src.searchEngine import FlightSearchEngine
+    from src.utils import build_trips_from_neo4j_results, distanceForEachAirport
+
+    results: Dict[str, Dict] = {}
+    profiles: Dict[str, Dict] = {}
+
+    def run(name: str, fn, setup=None, repeat=args.repeat):
+        print(f"Running {name}...")
+        results[name] = measure(fn, repeat, setup)
+        print(f"  median {results[name]['median'] * 1000:.1f} ms")
+
+    start = min(d for dates in network.routes.values() for d in dates)
+    search = {
+        "origin_departure_airports": network.bases,
+        "origin_arrival_airports": network.bases,
+        "r1_dates": [start + timedelta(days=d) for d in range(7)],
+        "r2_dates": [start + timedelta(days=d) for d in range(2, 14)],
+        "lengths_of_stay": [2, 3, 4, 5],
+    }
+
+    try:
+        run("distance_for_each_airport", lambda: list(distanceForEachAirport(network.airports)))
+
+        engine = FlightSearchEngine(SyntheticRepository(network))
+        run("search_engine_load", engine.reload)
+        run("search_engine_query", lambda: engine.query_flights(**search))
+        run("search_engine_query_open_jaw", lambda: engine.query_flights(**search, max_distance=300))
+        run("search_engine_query_budget", lambda: engine.query_flights(**search, max_total_fare=120))
+
+        connecting = ConnectingSearch(engine)
+        # Airports no base flies to directly come first, so most itineraries need a connection.
+        # Small networks may have none, then the least served airports make up the rest.
+        served = {destination for base in network.bases for destination in network.destinations(base)}
+        connecting_args = dict(
+            origins=network.bases,
+            destinations=sorted(
+                (a.code for a in network.airports if a.code not in network.bases),
+                key=lambda code: (code in served, code),
+            )[:20],
+            departure_dates=search["r1_dates"],
+            max_hops=2,
+        )
+        if not connecting.candidate_paths(**connecting_args):
+            raise RuntimeError(f"No connecting paths to {connecting_args['destinations']}, the benchmark would measure nothing")
+        run("connecting_paths", lambda: connecting.candidate_paths(**connecting_args))
+        run(
+            "connecting_search_cold",
+            lambda: connecting.search(**connecting_args, limit=50, max_paths=100),
+            setup=getAdvFlights.cache_clear,
+        )
+
+        run(
+            "crawl_destinations_cold",
+            lambda: getDestinationsForAirports(network.bases, network.airports)[0],
+            setup=http_client.clear,
+        )
+        run("crawl_destinations_revalidated", lambda: getDestinationsForAirports(network.bases, network.airports)[0])
+
+        candidates = engine.query_flights(**search)[:args.max_results]
+        airports = network.airports
+        run(
+            "build_trips_cold",
+            lambda: build_trips_from_neo4j_results(candidates, 1, airports, limit=100),
+            setup=getAdvFlights.cache_clear,
+        )
+        run("build_trips_warm", lambda: build_trips_from_neo4j_results(candidates, 1, airports, limit=100))
+
+        from benchmarks import tripMemory
+        print(f"Running trip_memory ({args.memory_trips} trips)...")
+        memory = tripMemory.run(args.memory_trips)["trip"]
+        results["trip_memory"] = dict(memory, runs=1, median=memory["seconds"])
+        print(f"  {memory['bytes_per_trip']:.0f} bytes per trip")
+
+        if not args.skip_neo4j:
+            driver, container = connect_neo4j(container=args.neo4j_container)
+            if driver is not None:
+                try:
+                    repository = GraphRepository(driver)
+                    flights = network.flights()
+                    distances = list(distanceForEachAirport(network.airports))
+
+                    def reset():
+                        repository.clearGraph()
+                        repository.setup_schema()
+
+                    run("save_airports", lambda: repository.save_airports(network.airports), setup=reset)
+                    run("save_flights", lambda: repository.save_flights(flights))
+                    run("save_distances", lambda: repository.save_distances(distances))
+
+                    repository.load_spatial_index()
+                    run("neo4j_query_flights", lambda: repository.query_flights(**search))
+                    run("neo4j_query_flights_open_jaw", lambda: repository.query_flights(**search, max_distance=300))
+                    run("neo4j_query_flights_budget", lambda: repository.query_flights(**search, max_total_fare=120))
+
+                    print("Profiling the search query against the baseline query...")
+                    profiles["query_flights"] = queryProfile.compare(repository, search)
+                    print(f"  db hits {profiles['query_flights']['baseline']['db_hits']} baseline, "
+                          f"{profiles['query_flights']['current']['db_hits']} current")
+                finally:
+                    driver.close()
+                    if container:
+                        container.stop()
+    finally:
+        server.stop()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "args": vars(args),
+            "network": {
+                "airports": len(network.airports),
+                "routes": len(network.routes),
+                "flights": sum(len(dates) for dates in network.routes.values()),
+            },
+            "fake_api": server.counts,
+        },
+        "results": results,
+        "profiles": profiles,
+    }
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.output}")
+
+    slower = [name for name, p in profiles.items() if p["current"]["db_hits"] >= p["baseline"]["db_hits"]]
+    if slower:
+        print(f"No fewer db hits than the baseline query: {', '.join(slower)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
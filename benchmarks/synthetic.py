@@ -0,0 +1,122 @@
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Tuple
+import hashlib
+import random
+
+from src.models.airport import Airport
+from src.models.bscFlysTo import BscFlysTo
+
+# Rough bounding box of the Ryanair network
+LATITUDE_RANGE = (35.0, 65.0)
+LONGITUDE_RANGE = (-10.0, 30.0)
+
+
+def stable_hash(*parts) -> int:
+    # Python's hash() is salted per process, benchmarks need the same numbers every run
+    return int.from_bytes(hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=8).digest(), "big")
+
+
+@dataclass
+class SyntheticNetwork:
+    airports: List[Airport]
+    bases: List[str]
+    # (origin, destination) -> operating dates
+    routes: Dict[Tuple[str, str], List[date]] = field(default_factory=dict)
+
+    @property
+    def airport_lookup(self) -> Dict[str, Airport]:
+        return {airport.code: airport for airport in self.airports}
+
+    def destinations(self, origin: str) -> List[str]:
+        return [destination for (o, destination) in self.routes if o == origin]
+
+    def flights(self) -> List[BscFlysTo]:
+        lookup = self.airport_lookup
+        return [
+            BscFlysTo(
+                origin=lookup[origin],
+                destination=lookup[destination],
+                date=flight_date,
+                fare=self.cheapest_fare(origin, destination, flight_date.isoformat()),
+            )
+            for (origin, destination), dates in self.routes.items()
+            for flight_date in dates
+        ]
+
+    def fares(self, origin: str, destination: str, depart_date: str, flights_per_day: int = 2) -> List[dict]:
+        """Deterministic flights for one leg, shaped like the booking availability payload."""
+        flights = []
+        for i in range(flights_per_day):
+            seed = stable_hash(origin, destination, depart_date, i)
+            departure = datetime.fromisoformat(depart_date) + timedelta(hours=6 + (seed % 14), minutes=5 * (seed % 12))
+            duration = timedelta(minutes=60 + seed % 180)
+            flights.append({
+                "departure": departure,
+                "arrival": departure + duration,
+                "duration": f"{duration.seconds // 3600:02d}:{duration.seconds % 3600 // 60:02d}",
+                "flightNumber": f"FR {seed % 9000 + 1000}",
+                "fare": round(9.99 + (seed % 20000) / 100, 2),
+            })
+        return flights
+
+    def cheapest_fare(self, origin: str, destination: str, depart_date: str) -> float:
+        """The lowest fare of the day, as the cheapestPerDay endpoint reports it."""
+        return min(flight["fare"] for flight in self.fares(origin, destination, depart_date))
+
+    def route_fares(self) -> Dict[Tuple[str, str], Dict[date, float]]:
+        return {
+            route: {d: self.cheapest_fare(*route, d.isoformat()) for d in dates}
+            for route, dates in self.routes.items()
+        }
+
+
+def generate_network(
+    airport_count: int = 200,
+    base_count: int = 5,
+    routes_per_airport: int = 8,
+    routes_per_base: int = 60,
+    days: int = 60,
+    country_count: int = 30,
+    start: date | None = None,
+    seed: int = 42,
+) -> SyntheticNetwork:
+    """
+    Random but reproducible network: airports spread over Europe, a few
+    well-connected bases, and every route flying on a weekly pattern of 2-7
+    days over the next `days` days. Routes are always served in both directions.
+    """
+    rng = random.Random(seed)
+    start = start or date.today() + timedelta(days=1)
+
+    airports = []
+    for i in range(airport_count):
+        code = f"{chr(65 + i // 676 % 26)}{chr(65 + i // 26 % 26)}{chr(65 + i % 26)}"
+        country = f"Country {i % country_count:02d}"
+        airports.append(Airport(
+            code=code,
+            name=f"{code} Airport",
+            cityName=f"City {code}",
+            countryName=country,
+            latitude=round(rng.uniform(*LATITUDE_RANGE), 4),
+            longitude=round(rng.uniform(*LONGITUDE_RANGE), 4),
+        ))
+
+    bases = [airport.code for airport in airports[:base_count]]
+    codes = [airport.code for airport in airports]
+
+    pairs = set()
+    for code in codes:
+        count = routes_per_base if code in bases else routes_per_airport
+        for destination in rng.sample(codes, min(count, len(codes) - 1) + 1):
+            if destination != code:
+                pairs.add(tuple(sorted((code, destination))))
+
+    network = SyntheticNetwork(airports=airports, bases=bases)
+    for a, b in sorted(pairs):
+        weekdays = set(rng.sample(range(7), rng.randint(2, 7)))
+        dates = [start + timedelta(days=d) for d in range(days) if (start + timedelta(days=d)).weekday() in weekdays]
+        network.routes[(a, b)] = dates
+        network.routes[(b, a)] = list(dates)
+
+    return network
@@ -0,0 +1,165 @@
+"""
+Memory held by 100k assembled trips, compared with the previous flat Trip.
+
+    python -m benchmarks.tripMemory --trips 100000
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+from benchmarks.synthetic import generate_network
+from src.models.advFlysTo import AdvFlysTo
+from src.models.neo4jResult import Neo4jResultFormatted
+from src.utils import build_trip
+
+
+@dataclass
+class LegacyTrip:
+    # The flat 20-field layout Trip had before it held references
+    destination: str
+    originDepartureAirportName: str = None
+    destinationArrivalAirportName: str = None
+    destinationDepartureAirportName: str = None
+    originArrivalAirportName: str = None
+    originDepartureTime: datetime = None
+    destinationArrivalTime: datetime = None
+    destinationDepartureTime: datetime = None
+    originArrivalTime: datetime = None
+    fullFare: float = None
+    transfer: bool = False
+    distance: Optional[float] = None
+    originDepartureLat: Optional[float] = None
+    originDepartureLon: Optional[float] = None
+    destinationArrivalLat: Optional[float] = None
+    destinationArrivalLon: Optional[float] = None
+    destinationDepartureLat: Optional[float] = None
+    destinationDepartureLon: Optional[float] = None
+    originArrivalLat: Optional[float] = None
+    originArrivalLon: Optional[float] = None
+
+
+def build_legacy_trip(result, outbound, ret, airport_lookup) -> LegacyTrip:
+    def coord(code, attr):
+        airport = airport_lookup.get(code)
+        # Arithmetic gives each trip its own float, as values read from Neo4j rows did
+        return getattr(airport, attr) + 0.0 if airport else None
+
+    destination = (
+        outbound.destinationName
+        if outbound.destinationName == ret.originName
+        else f"{outbound.destinationName} / {ret.originName}"
+    )
+
+    return LegacyTrip(
+        destination=destination,
+        originDepartureAirportName=result.origin_departure_airport_code,
+        destinationArrivalAirportName=result.destination_arrival_airport_code,
+        destinationDepartureAirportName=result.destination_departure_airport_code,
+        originArrivalAirportName=result.origin_arrival_airport_code,
+        originDepartureTime=outbound.departureTime,
+        destinationArrivalTime=outbound.arrivalTime,
+        destinationDepartureTime=ret.departureTime,
+        originArrivalTime=ret.arrivalTime,
+        fullFare=outbound.fare + ret.fare,
+        distance=result.travel_distance_km,
+        originDepartureLat=coord(result.origin_departure_airport_code, "latitude"),
+        originDepartureLon=coord(result.origin_departure_airport_code, "longitude"),
+        destinationArrivalLat=coord(result.destination_arrival_airport_code, "latitude"),
+        destinationArrivalLon=coord(result.destination_arrival_airport_code, "longitude"),
+        destinationDepartureLat=coord(result.destination_departure_airport_code, "latitude"),
+        destinationDepartureLon=coord(result.destination_departure_airport_code, "longitude"),
+        originArrivalLat=coord(result.origin_arrival_airport_code, "latitude"),
+        originArrivalLon=coord(result.origin_arrival_airport_code, "longitude"),
+    )
+
+
+def make_inputs(trip_count: int, flights_per_leg: int = 4):
+    """Candidate rows and per-leg flights shaped like a wide search."""
+    network = generate_network(airport_count=500, base_count=5)
+    lookup = network.airport_lookup
+    routes = list(network.routes.items())
+
+    pairs = []
+    flights_cache: Dict[tuple, list] = {}
+
+    def flights(origin, destination, day):
+        key = (origin, destination, day)
+        if key not in flights_cache:
+            flights_cache[key] = [
+                AdvFlysTo(
+                    origin=origin,
+                    destination=destination,
+                    originName=lookup[origin].cityName,
+                    destinationName=lookup[destination].cityName,
+                    departureTime=datetime.combine(day, datetime.min.time()) + timedelta(hours=6 + i),
+                    arrivalTime=datetime.combine(day, datetime.min.time()) + timedelta(hours=8 + i),
+                    fare=19.99 + i,
+                    flightNumber=f"FR {1000 + i}",
+                    duration="02:00",
+                )
+                for i in range(flights_per_leg)
+            ]
+        return flights_cache[key]
+
+    i = 0
+    while len(pairs) < trip_count:
+        (origin, destination), dates = routes[i % len(routes)]
+        day = dates[i % len(dates)]
+        result = Neo4jResultFormatted(origin, destination, destination, origin, day, day + timedelta(days=3))
+        outbound_flights = flights(origin, destination, day)
+        return_flights = flights(destination, origin, day + timedelta(days=3))
+        for outbound in outbound_flights:
+            for ret in return_flights:
+                pairs.append((result, outbound, ret))
+        i += 1
+
+    return pairs[:trip_count], lookup
+
+
+def measure_trips(build, pairs, lookup) -> Dict:
+    tracemalloc.start()
+    started = time.perf_counter()
+    trips = [build(result, outbound, ret, lookup) for result, outbound, ret in pairs]
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "trips": len(trips),
+        "seconds": elapsed,
+        "bytes": current,
+        "peak_bytes": peak,
+        "bytes_per_trip": current / len(trips),
+    }
+
+
+def run(trip_count: int = 100_000) -> Dict:
+    pairs, lookup = make_inputs(trip_count)
+    return {
+        "trip": measure_trips(build_trip, pairs, lookup),
+        "legacy_trip": measure_trips(build_legacy_trip, pairs, lookup),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trips", type=int, default=100_000)
+    parser.add_argument("--output")
+    args = parser.parse_args(argv)
+
+    report = run(args.trips)
+    for name, result in report.items():
+        print(f"{name:12} {result['bytes'] / 2**20:8.1f} MiB {result['bytes_per_trip']:8.0f} B/trip {result['seconds']:6.2f}s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
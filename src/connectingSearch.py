@@ -0,0 +1,347 @@
+from concurrent.futures import CancelledError
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+import heapq
+import math
+import time
+
+from src.metrics import log_event, search_stage_seconds
+from src.models.advFlysTo import AdvFlysTo
+from src.models.connectingTrip import ConnectingTrip
+from src.searchEngine import FlightSearchEngine
+from src.utils import Leg, fetch_legs
+
+
+@dataclass(slots=True)
+class PathCandidate:
+    """
+    An airport sequence that can be flown within the date bounds, with the
+    days each leg may fly on and the least its indicative fares can add up to.
+    """
+    lower_bound: float
+    airports: Tuple[str, ...]
+    days: Tuple[Tuple[date, ...], ...]    # per leg
+
+    def legs(self) -> List[Leg]:
+        return [
+            (origin, destination, day.isoformat())
+            for (origin, destination), leg_days in zip(zip(self.airports, self.airports[1:]), self.days)
+            for day in leg_days
+        ]
+
+
+class ConnectingSearch:
+    """
+    One-way itineraries from origins to destinations with up to `max_hops`
+    intermediate airports, ranked by total fare.
+
+    The search runs in two pruned passes. The first walks the route/date
+    bitsets of a FlightSearchEngine snapshot depth first, one departure day
+    at a time. It drops a partial path as soon as:
+      - it can no longer reach a destination in the legs left (a backwards
+        breadth-first search from the destinations gives that bound);
+      - no day fits the connection window and the total travel time;
+      - its indicative fares already exceed `max_total_fare`, or it cannot
+        beat the candidates kept so far (see below).
+    Every departure day and origin gets an equal share of the `max_paths`
+    candidates, the rest go to the best paths overall. Paths are ranked by
+    fare bound, then legs, then airports, so ties (e.g. routes without
+    stored fares, which count as free) do not depend on the walk order.
+    Only the candidates are then priced live. The second pass does the same
+    walk over the priced flights, with exact connection times and fares.
+    """
+
+    def __init__(self, engine: FlightSearchEngine, fetch: Callable[..., Dict[Leg, List[AdvFlysTo]]] = fetch_legs):
+        self.engine = engine
+        self.fetch = fetch
+
+    @staticmethod
+    def _legs_to_destination(index, destination_ids: Set[int], max_legs: int) -> Dict[int, int]:
+        # Fewest legs from each airport to any destination, ignoring dates
+        distance = {airport_id: 0 for airport_id in destination_ids}
+        frontier = list(destination_ids)
+        for legs in range(1, max_legs + 1):
+            following = []
+            for airport_id in frontier:
+                for origin_id in index.incoming[airport_id]:
+                    if origin_id not in distance:
+                        distance[origin_id] = legs
+                        following.append(origin_id)
+            frontier = following
+        return distance
+
+    def candidate_paths(
+        self,
+        origins: Sequence[str],
+        destinations: Sequence[str],
+        departure_dates: Sequence[date],
+        max_hops: int = 1,
+        max_connection: timedelta = timedelta(hours=8),
+        max_travel_time: timedelta = timedelta(hours=24),
+        max_total_fare: Optional[float] = None,
+        max_paths: int = 200,
+    ) -> List[PathCandidate]:
+        """
+        Up to `max_paths` date-feasible paths, lowest indicative fare bound
+        first, shared out over departure days and origins.
+        """
+        index = self.engine.route_index()
+        origin_ids = [index.ids[code] for code in dict.fromkeys(origins) if code in index.ids]
+        destination_ids = {index.ids[code] for code in destinations if code in index.ids}
+        if not origin_ids or not destination_ids:
+            return []
+
+        max_legs = max_hops + 1
+        reach = self._legs_to_destination(index, destination_ids, max_legs)
+        # A connection may roll over to a later day, the whole trip spans at most span_days
+        connection_days = math.ceil(max_connection / timedelta(days=1))
+        span_days = math.ceil(max_travel_time / timedelta(days=1))
+
+        counts = {"expanded": 0, "pruned_reach": 0, "pruned_dates": 0, "pruned_fare": 0, "groups": 0}
+
+        def min_fare(fares: Dict[int, float], bits: int) -> float:
+            # Cheapest indicative fare over the leg's days, a day without one counts as free
+            if not fares:
+                return 0.0
+            return min(fares.get(offset, 0.0) for offset in _offsets(bits))
+
+        def spread(bits: int) -> int:
+            window = 0
+            for days in range(connection_days + 1):
+                window |= bits << days
+            return window
+
+        # Paths are ranked by (bound, legs, airport ids, start day), a total order, so which are kept
+        # does not depend on the order the walk finds them in. Heaps hold negated keys (max-heaps).
+        # Every departure day and origin keeps its best `share` paths, the paths they push out
+        # compete for the remaining places in `overflow`.
+        groups_total = bin(index.mask(departure_dates)).count("1") * len(origin_ids)
+        share = max(1, max_paths // groups_total) if groups_total else 1
+        overflow: list = []
+
+        def beaten(heap: list, size: int, bound: float, legs: int) -> bool:
+            # Every completion has at least this bound and legs, a tie is only settled once complete
+            return len(heap) >= size and (bound, legs) > (-heap[0][0], -heap[0][1])
+
+        def offer(heap: list, size: int, entry: tuple) -> Optional[tuple]:
+            """Keep `entry` if it is among the best `size`, returning whichever entry did not fit."""
+            if len(heap) < size:
+                heapq.heappush(heap, entry)
+                return None
+            if entry[:4] > heap[0][:4]:
+                return heapq.heapreplace(heap, entry)
+            return entry
+
+        def walk(group: list, start: int, path: List[int], masks: List[int], window: int, span: int, bound: float) -> None:
+            current = path[-1]
+            legs_left = max_legs - len(masks) - 1
+
+            for following, route_bits in index.routes[current].items():
+                counts["expanded"] += 1
+                if following in path:
+                    continue
+                if following not in destination_ids and reach.get(following, max_legs + 1) > legs_left:
+                    counts["pruned_reach"] += 1
+                    continue
+
+                bits = route_bits & window
+                if not bits:
+                    counts["pruned_dates"] += 1
+                    continue
+
+                leg_bound = bound + min_fare(index.fares[current].get(following, {}), bits)
+                if (max_total_fare is not None and leg_bound > max_total_fare) or (
+                    beaten(group, share, leg_bound, len(path) + 1)
+                    and beaten(overflow, max_paths, leg_bound, len(path) + 1)
+                ):
+                    counts["pruned_fare"] += 1
+                    continue
+
+                if following in destination_ids:
+                    airports = path + [following]
+                    entry = (-leg_bound, -len(airports), tuple(-a for a in airports), -start, masks + [bits])
+                    pushed_out = offer(group, share, entry)
+                    if pushed_out is not None:
+                        offer(overflow, max_paths, pushed_out)
+                    continue
+
+                walk(group, start, path + [following], masks + [bits], spread(bits) & span, span, leg_bound)
+
+        started = time.perf_counter()
+        kept: list = []
+        for start in _offsets(index.mask(departure_dates)):
+            span = ((1 << (span_days + 1)) - 1) << start
+            for origin_id in origin_ids:
+                group: list = []
+                walk(group, start, [origin_id], [], 1 << start, span, 0.0)
+                counts["groups"] += bool(group)
+                kept += group
+
+        def ranked(entries: list) -> list:
+            return sorted(entries, key=lambda entry: (-entry[0], -entry[1], [-a for a in entry[2]], -entry[3]))
+
+        chosen = ranked(kept)[:max_paths]
+        chosen = ranked(chosen + ranked(overflow)[:max_paths - len(chosen)])
+
+        candidates = [
+            PathCandidate(
+                lower_bound=-negated_bound,
+                airports=tuple(index.codes[-a] for a in negated_path),
+                days=tuple(tuple(index.dates(bits)) for bits in masks),
+            )
+            for negated_bound, _, negated_path, _, masks in chosen
+        ]
+
+        elapsed = time.perf_counter() - started
+        search_stage_seconds.observe(elapsed, stage="connecting_paths")
+        log_event("connecting_paths", paths=len(candidates), seconds=round(elapsed, 3), **counts)
+        return candidates
+
+    def search(
+        self,
+        origins: Sequence[str],
+        destinations: Sequence[str],
+        departure_dates: Sequence[date],
+        adults: int = 1,
+        max_hops: int = 1,
+        min_connection: timedelta = timedelta(hours=1),
+        max_connection: timedelta = timedelta(hours=8),
+        max_travel_time: timedelta = timedelta(hours=24),
+        max_total_fare: Optional[float] = None,
+        limit: int = 50,
+        max_paths: int = 200,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+        time_budget: Optional[float] = None,
+        price_batch: int = 25,
+    ) -> List[ConnectingTrip]:
+        """
+        The `limit` cheapest itineraries, ties broken by travel time. Only
+        the legs of the best `max_paths` candidate paths are priced.
+
+        Candidates are priced `price_batch` at a time, lowest bound first.
+        Once `time_budget` seconds of pricing have passed, the batch in
+        flight is dropped and trips are built from the candidates priced so
+        far. `should_stop()` turning true raises CancelledError instead.
+        """
+        candidates = self.candidate_paths(
+            origins,
+            destinations,
+            departure_dates,
+            max_hops=max_hops,
+            max_connection=max_connection,
+            max_travel_time=max_travel_time,
+            max_total_fare=max_total_fare,
+            max_paths=max_paths,
+        )
+        if not candidates:
+            return []
+
+        started = time.perf_counter()
+        legs_total = len({leg for candidate in candidates for leg in candidate.legs()})
+
+        def over_budget() -> bool:
+            return time_budget is not None and time.perf_counter() - started > time_budget
+
+        def stop() -> bool:
+            return (should_stop is not None and should_stop()) or over_budget()
+
+        fetched: Dict[Leg, List[AdvFlysTo]] = {}
+        priced = 0
+        while priced < len(candidates) and not over_budget():
+            batch = candidates[priced:priced + price_batch]
+            missing = {leg for candidate in batch for leg in candidate.legs()} - fetched.keys()
+
+            def progress(done: int, total: int, before: int = len(fetched)) -> None:
+                if on_progress is not None:
+                    on_progress(before + done, legs_total)
+
+            try:
+                fetched.update(self.fetch(missing, adults, progress, stop))
+            except CancelledError:
+                if should_stop is not None and should_stop():
+                    raise
+                break
+            priced += len(batch)
+
+        search_stage_seconds.observe(time.perf_counter() - started, stage="fetch")
+        if priced < len(candidates):
+            log_event("connecting_budget_exhausted", priced=priced, paths=len(candidates), time_budget=time_budget)
+        candidates = candidates[:priced]
+
+        started = time.perf_counter()
+        # Each leg's usable flights, in departure order
+        flights: Dict[Leg, List[AdvFlysTo]] = {
+            leg: sorted(
+                (f for f in leg_flights if f.fare is not None and f.departureTime and f.arrivalTime),
+                key=lambda f: f.departureTime,
+            )
+            for leg, leg_flights in fetched.items()
+        }
+
+        heap: list = []    # max-heap on (fare, travel time) via negation
+        sequence = 0
+
+        def full() -> bool:
+            return len(heap) >= limit
+
+        def extend(candidate: PathCandidate, position: int, chosen: List[AdvFlysTo], fare: float) -> None:
+            nonlocal sequence
+            origin, destination = candidate.airports[position], candidate.airports[position + 1]
+            previous = chosen[-1] if chosen else None
+
+            for day in candidate.days[position]:
+                for flight in flights.get((origin, destination, day.isoformat()), []):
+                    if previous is not None:
+                        connection = flight.departureTime - previous.arrivalTime
+                        if connection < min_connection:
+                            continue
+                        if connection > max_connection:
+                            break
+                    if chosen and flight.arrivalTime - chosen[0].departureTime > max_travel_time:
+                        continue
+
+                    total = fare + flight.fare
+                    if max_total_fare is not None and total > max_total_fare:
+                        continue
+                    if full() and total > -heap[0][0]:
+                        continue
+
+                    if position + 1 < len(candidate.days):
+                        extend(candidate, position + 1, chosen + [flight], total)
+                        continue
+
+                    trip = ConnectingTrip(legs=tuple(chosen + [flight]))
+                    sequence += 1
+                    entry = (-total, -trip.travelTime.total_seconds(), -sequence, trip)
+                    if not full():
+                        heapq.heappush(heap, entry)
+                    elif entry > heap[0]:
+                        heapq.heapreplace(heap, entry)
+
+        for candidate in candidates:
+            # Paths come cheapest bound first, none after this one can beat the current worst
+            if full() and candidate.lower_bound > -heap[0][0]:
+                break
+            extend(candidate, 0, [], 0.0)
+
+        trips = [entry[3] for entry in sorted(heap, key=lambda entry: (-entry[0], -entry[1], -entry[2]))]
+
+        elapsed = time.perf_counter() - started
+        search_stage_seconds.observe(elapsed, stage="connecting_assemble")
+        log_event(
+            "connecting_trips_built",
+            paths=len(candidates),
+            legs=len(fetched),
+            trips=len(trips),
+            assemble_seconds=round(elapsed, 3),
+        )
+        return trips
+
+
+def _offsets(bits: int):
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
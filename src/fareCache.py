@@ -0,0 +1,324 @@
+from collections.abc import MutableMapping
+from datetime import datetime
+from itertools import count
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+
+from cachetools import LRUCache
+
+from src.models.advFlysTo import AdvFlysTo
+
+FARE_CACHE_BACKEND = os.getenv("FARE_CACHE_BACKEND", "sqlite")
+FARE_CACHE_PATH = os.getenv("FARE_CACHE_PATH", os.path.join(tempfile.gettempdir(), "rya-fare-cache.sqlite3"))
+
+
+def encode_adv_flights(flights: List[AdvFlysTo]) -> bytes:
+    # One JSON array per flight instead of a dict keeps repeated field names out of the payload
+    rows = [
+        [
+            flight.origin,
+            flight.destination,
+            flight.originName,
+            flight.destinationName,
+            flight.departureTime.isoformat() if flight.departureTime else None,
+            flight.arrivalTime.isoformat() if flight.arrivalTime else None,
+            flight.fare,
+            flight.flightNumber,
+            flight.duration,
+        ]
+        for flight in flights
+    ]
+    return zlib.compress(json.dumps(rows, separators=(",", ":")).encode())
+
+
+def decode_adv_flights(payload: bytes) -> List[AdvFlysTo]:
+    return [
+        AdvFlysTo(
+            origin=origin,
+            destination=destination,
+            originName=originName,
+            destinationName=destinationName,
+            departureTime=datetime.fromisoformat(departureTime) if departureTime else None,
+            arrivalTime=datetime.fromisoformat(arrivalTime) if arrivalTime else None,
+            fare=fare,
+            flightNumber=flightNumber,
+            duration=duration,
+        )
+        for origin, destination, originName, destinationName, departureTime, arrivalTime, fare, flightNumber, duration
+        in json.loads(zlib.decompress(payload))
+    ]
+
+
+def encode_json(value: Any) -> bytes:
+    return json.dumps(value).encode()
+
+
+def decode_json(payload: bytes) -> Any:
+    return json.loads(payload)
+
+
+class SqliteCacheBackend:
+    """
+    Cache table in a local SQLite file, shared by every worker process on the
+    host and kept across restarts. WAL mode lets readers run alongside a writer.
+    """
+
+    def __init__(self, path: str, namespace: str, maxsize: int):
+        self.path = path
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self._local = threading.local()
+        self._writes = count(1)
+
+        with self._connection() as connection:
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cache (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+                """
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS cache_expiry ON cache (namespace, expires_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        row = self._connection().execute(
+            "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (self.namespace, key, time.time()),
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def set(self, key: str, value: bytes, expires_at: float) -> None:
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, key, value, expires_at),
+            )
+
+        if next(self._writes) % 100 == 0:
+            self.evict()
+
+    def delete(self, key: str) -> None:
+        with self._connection() as connection:
+            connection.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+    def clear(self) -> None:
+        with self._connection() as connection:
+            connection.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+
+    def evict(self) -> int:
+        """Drop expired entries, then the ones closest to expiry beyond maxsize."""
+        with self._connection() as connection:
+            expired = connection.execute(
+                "DELETE FROM cache WHERE namespace = ? AND expires_at <= ?",
+                (self.namespace, time.time()),
+            ).rowcount
+            overflow = connection.execute(
+                """
+                DELETE FROM cache WHERE namespace = ? AND key IN (
+                    SELECT key FROM cache WHERE namespace = ?
+                    ORDER BY expires_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.namespace, self.namespace, self.maxsize),
+            ).rowcount
+        return expired + overflow
+
+    def recent(self, limit: int) -> List[Tuple[str, bytes, float]]:
+        return self._connection().execute(
+            """
+            SELECT key, value, expires_at FROM cache
+            WHERE namespace = ? AND expires_at > ?
+            ORDER BY expires_at DESC LIMIT ?
+            """,
+            (self.namespace, time.time(), limit),
+        ).fetchall()
+
+
+_UNDECODABLE = object()
+
+
+class _CountingLRUCache(LRUCache):
+    def __init__(self, maxsize: int):
+        super().__init__(maxsize=maxsize)
+        self.evictions = 0
+
+    def popitem(self):
+        # Only called by cachetools when an insert needs room
+        self.evictions += 1
+        return super().popitem()
+
+
+class TieredCache(MutableMapping):
+    """
+    In-memory LRU in front of an optional shared backend.
+
+    Works as the cache argument of cachetools.cached. Keys must be strings
+    and every entry expires `ttl` seconds after it was first stored,
+    whichever tier it is served from. A backend that errors (locked, full
+    or corrupt file) is logged and skipped, the memory tier keeps serving.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        backend: Optional[SqliteCacheBackend] = None,
+        encode: Callable[[Any], bytes] = encode_json,
+        decode: Callable[[bytes], Any] = decode_json,
+    ):
+        self.ttl = ttl
+        self.backend = backend
+        self.encode = encode
+        self.decode = decode
+        self._memory = _CountingLRUCache(maxsize=maxsize)
+        self._lock = threading.RLock()
+        self.backend_errors = 0
+
+    def _backend(self, action: str, call: Callable[..., Any], *args, default: Any = None) -> Any:
+        try:
+            return call(*args)
+        except sqlite3.Error as e:
+            self.backend_errors += 1
+            print(f"Warning: Fare cache backend {action} failed, serving from memory. Error: {e}")
+            return default
+
+    def _decode(self, key: str, payload: bytes) -> Any:
+        try:
+            return self.decode(payload)
+        except (zlib.error, ValueError, TypeError) as e:
+            # A truncated or corrupt row is dropped, so the next lookup goes upstream
+            print(f"Warning: Dropping undecodable cache entry {key}. Error: {e}")
+            self._backend("delete", self.backend.delete, key)
+            return _UNDECODABLE
+
+    def __getitem__(self, key: str) -> Any:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.time():
+                    return value
+                del self._memory[key]
+
+        if self.backend is None:
+            raise KeyError(key)
+
+        stored = self._backend("read", self.backend.get, key)
+        if stored is None:
+            raise KeyError(key)
+
+        payload, expires_at = stored
+        value = self._decode(key, payload)
+        if value is _UNDECODABLE:
+            raise KeyError(key)
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+        return value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+
+        if self.backend is not None:
+            self._backend("write", self.backend.set, key, self.encode(value), expires_at)
+
+    def __delitem__(self, key: str) -> None:
+        with self._lock:
+            self._memory.pop(key, None)
+        if self.backend is not None:
+            self._backend("delete", self.backend.delete, key)
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self._memory))
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self.backend is not None:
+            self._backend("clear", self.backend.clear)
+
+    @property
+    def evictions(self) -> int:
+        """Entries dropped from memory to make room (they may still be in the backend)."""
+        return self._memory.evictions
+
+    def expires_at(self, key: str) -> Optional[float]:
+        """When the entry for `key` expires, or None if it is not cached."""
+        with self._lock:
+            entry = self._memory.get(key)
+        if entry is not None and entry[0] > time.time():
+            return entry[0]
+
+        if self.backend is None:
+            return None
+        stored = self._backend("read", self.backend.get, key)
+        return stored[1] if stored else None
+
+    def warm(self, limit: Optional[int] = None) -> int:
+        """Load the freshest backend entries into memory, e.g. right after boot."""
+        if self.backend is None:
+            return 0
+
+        rows = self._backend("warm", self.backend.recent, limit or self._memory.maxsize, default=[])
+        warmed = 0
+        for key, payload, expires_at in reversed(rows):
+            value = self._decode(key, payload)
+            if value is _UNDECODABLE:
+                continue
+            with self._lock:
+                self._memory[key] = (expires_at, value)
+            warmed += 1
+        return warmed
+
+
+def create_cache(
+    namespace: str,
+    maxsize: int,
+    ttl: float,
+    encode: Callable[[Any], bytes] = encode_json,
+    decode: Callable[[bytes], Any] = decode_json,
+    backend: str = FARE_CACHE_BACKEND,
+    path: str = FARE_CACHE_PATH,
+) -> TieredCache:
+    """
+    Build a TieredCache for `namespace`. FARE_CACHE_BACKEND=sqlite (default)
+    shares entries through FARE_CACHE_PATH, memory keeps them per process.
+    """
+    shared = None
+    if backend == "sqlite":
+        try:
+            shared = SqliteCacheBackend(path, namespace, maxsize=maxsize * 8)
+        except sqlite3.Error as e:
+            print(f"Warning: Could not open fare cache at {path}, using memory only. Error: {e}")
+
+    cache = TieredCache(maxsize=maxsize, ttl=ttl, backend=shared, encode=encode, decode=decode)
+    warmed = cache.warm()
+    if warmed:
+        print(f"Warmed {namespace} cache with {warmed} entries")
+    return cache
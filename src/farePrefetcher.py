@@ -0,0 +1,167 @@
+from collections import Counter
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+import threading
+import time
+
+from src.graphRepository import GraphRepository
+from src.models.neo4jResult import Neo4jResultFormatted
+from src.ryanairApi import adv_flights_cache, adv_flights_key, getAdvFlights
+from src.utils import Leg, plan_legs
+
+
+class FarePrefetcher:
+    """
+    Background worker that keeps getAdvFlights warm for the legs searches are
+    likely to need.
+
+    Every cycle it collects the base airport FLYS_TO edges for the next
+    `horizon_days` plus the legs of recent searches, ranks them by how often
+    their route was searched and how close the departure is, and fetches at
+    most `budget` of them. Legs already cached are skipped unless they expire
+    within `refresh_margin` seconds, in which case they are refreshed so an
+    interactive search never sees the gap.
+
+    Searches are only recorded while the worker runs, and at most
+    `max_tracked_legs` searched legs are kept between cycles, the most
+    recently searched ones.
+    """
+
+    def __init__(
+        self,
+        repository: GraphRepository,
+        interval: float = 300,
+        budget: int = 200,
+        horizon_days: int = 28,
+        refresh_margin: float = 120,
+        decay: float = 0.9,
+        max_tracked_legs: int = 20000,
+    ):
+        self.repository = repository
+        self.interval = interval
+        self.budget = budget
+        self.horizon_days = horizon_days
+        self.refresh_margin = refresh_margin
+        self.decay = decay
+        self.max_tracked_legs = max_tracked_legs
+
+        self._lock = threading.Lock()
+        self._route_demand: Counter = Counter()
+        self._searched_legs: Dict[Leg, float] = {}
+        self._adults: Counter = Counter()
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"cycles": 0, "fetched": 0, "refreshed": 0, "skipped": 0, "errors": 0, "last_cycle_seconds": 0.0}
+
+    def record_search(self, results: List[Neo4jResultFormatted], adults: int = 1) -> None:
+        """Remember the legs a search had to price, to rank future prefetches."""
+        if not self.running:
+            return
+
+        legs = plan_legs(results)
+        now = time.time()
+        with self._lock:
+            self._adults[adults] += 1
+            for leg in legs:
+                self._route_demand[leg[:2]] += 1
+                # Re-inserted so the dict stays in order of last search
+                self._searched_legs.pop(leg, None)
+                self._searched_legs[leg] = now
+            excess = len(self._searched_legs) - self.max_tracked_legs
+            if excess > 0:
+                for leg in list(self._searched_legs)[:excess]:
+                    del self._searched_legs[leg]
+
+    def _candidates(self) -> List[Leg]:
+        today = date.today()
+        until = today + timedelta(days=self.horizon_days)
+
+        legs = {
+            (origin, destination, flight_date.isoformat())
+            for origin, destination, flight_date in self.repository.getBaseFlights(today, until)
+        }
+        with self._lock:
+            legs.update(leg for leg in self._searched_legs if today.isoformat() <= leg[2] <= until.isoformat())
+            demand = dict(self._route_demand)
+
+        def priority(leg: Leg) -> float:
+            days_ahead = (date.fromisoformat(leg[2]) - today).days
+            return (1 + demand.get(leg[:2], 0)) / (1 + days_ahead)
+
+        return sorted(legs, key=priority, reverse=True)
+
+    def _decay(self) -> None:
+        # Older searches count for less each cycle, and stop counting once faded out
+        cutoff = date.today().isoformat()
+        with self._lock:
+            for route in list(self._route_demand):
+                self._route_demand[route] *= self.decay
+                if self._route_demand[route] < 0.1:
+                    del self._route_demand[route]
+            self._searched_legs = {leg: seen for leg, seen in self._searched_legs.items() if leg[2] >= cutoff}
+
+    def run_once(self) -> Dict[str, int]:
+        started = time.monotonic()
+        with self._lock:
+            adults = self._adults.most_common(1)[0][0] if self._adults else 1
+
+        fetched = refreshed = skipped = errors = 0
+        for origin, destination, depart_date in self._candidates():
+            if fetched + refreshed >= self.budget:
+                break
+
+            args = (adults, depart_date, origin, destination)
+            expires_at = adv_flights_cache.expires_at(adv_flights_key(*args))
+            if expires_at is not None and expires_at - time.time() > self.refresh_margin:
+                skipped += 1
+                continue
+
+            try:
+                getAdvFlights.refresh(*args)
+            except Exception as e:
+                errors += 1
+                print(f"Warning: Could not prefetch {origin}->{destination} on {depart_date}. Error: {e}")
+                continue
+
+            if expires_at is None:
+                fetched += 1
+            else:
+                refreshed += 1
+
+        self._decay()
+        cycle = {"fetched": fetched, "refreshed": refreshed, "skipped": skipped, "errors": errors}
+        with self._lock:
+            self._stats["cycles"] += 1
+            for counter, amount in cycle.items():
+                self._stats[counter] += amount
+            self._stats["last_cycle_seconds"] = round(time.monotonic() - started, 3)
+        return cycle
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Warning: Fare prefetch cycle failed. Error: {e}")
+            self._stop.wait(self.interval)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._stop.is_set()
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="fare-prefetcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, tracked_routes=len(self._route_demand), tracked_legs=len(self._searched_legs))
@@ -0,0 +1,133 @@
+from typing import Callable, Iterable, List, Optional, Set, Tuple
+
+from src.graphRepository import GraphRepository
+from src.models.airport import Airport
+from src.models.refreshSummary import RefreshSummary
+from src.ryanairApi import getDestinationsForAirports
+from src.utils import distanceForEachAirport, get_airports_by_codes
+
+
+def refreshBaseAirports(
+    repository: GraphRepository,
+    baseCodes: Iterable[str],
+    airports: List[Airport],
+) -> RefreshSummary:
+    """
+    Bring the FLYS_TO edges touching the given base airports in line with a
+    fresh crawl, writing only the difference.
+
+    Edges on routes whose lookup failed are left alone, so a partial crawl
+    never removes data it could not re-check.
+    """
+    baseCodes = sorted(set(baseCodes))
+    summary = RefreshSummary(baseAirports=baseCodes)
+
+    repository.setup_schema()
+    summary.airportsUpdated = repository.update_airports(airports)
+    repository.load_spatial_index()
+
+    if not baseCodes:
+        return summary
+
+    return refreshBaseRoutes(repository, baseCodes, airports, summary)
+
+
+def refreshBaseRoutes(
+    repository: GraphRepository,
+    baseCodes: Iterable[str],
+    airports: List[Airport],
+    summary: Optional[RefreshSummary] = None,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    crawled: Optional[Set[Tuple[str, str]]] = None,
+) -> RefreshSummary:
+    """
+    The route part of refreshBaseAirports, for callers that have already
+    updated the airports. Counts are added to `summary` when one is given.
+
+    Callers refreshing bases one call at a time pass the same `crawled` set
+    to each call. Directions an earlier call crawled are then not fetched
+    again, and their edges are left as that call wrote them.
+    """
+    baseCodes = sorted(set(baseCodes))
+    if summary is None:
+        summary = RefreshSummary(baseAirports=baseCodes)
+
+    served_before = repository.getServedAirportCodes()
+
+    crawled_before = set(crawled) if crawled else set()
+    flights, failures = getDestinationsForAirports(baseCodes, airports, on_progress=on_progress, crawled=crawled)
+    summary.failures.extend(failures)
+
+    fresh = {(flight.origin.code, flight.destination.code, flight.date): flight for flight in flights}
+    existing = repository.getFlightFares(baseCodes)
+
+    failed_airports = {failure.origin for failure in failures if failure.destination is None}
+    failed_routes = set()
+    for failure in failures:
+        if failure.destination is not None:
+            failed_routes.add((failure.origin, failure.destination))
+            failed_routes.add((failure.destination, failure.origin))
+
+    stale = [
+        key
+        for key in existing.keys() - fresh.keys()
+        if (key[0], key[1]) not in failed_routes
+        and (key[0], key[1]) not in crawled_before
+        and key[0] not in failed_airports
+        and key[1] not in failed_airports
+    ]
+    added = [fresh[key] for key in fresh.keys() - existing.keys()]
+    # Kept edges whose indicative fare moved; a missing fresh fare keeps the stored one
+    repriced = [
+        fresh[key]
+        for key in fresh.keys() & existing.keys()
+        if fresh[key].fare is not None and fresh[key].fare != existing[key]
+    ]
+
+    summary.flightsAdded += repository.save_flights(added)
+    summary.flightsRemoved += repository.delete_flights(stale)
+    summary.faresUpdated += repository.save_flights(repriced)
+
+    # Only pairs involving a newly served airport need a DISTANCE_TO edge
+    served_after = repository.getServedAirportCodes()
+    new_codes = served_after - served_before
+
+    if new_codes:
+        distances = (
+            distance
+            for distance in distanceForEachAirport(get_airports_by_codes(served_after, airports))
+            if distance.origin.code in new_codes or distance.destination.code in new_codes
+        )
+        summary.distancesAdded += repository.save_distances(distances)
+
+    # Airports that lost their last route keep no DISTANCE_TO edges
+    summary.distancesRemoved += repository.delete_distances(served_before - served_after)
+
+    return summary
+
+
+def removeBaseAirports(
+    repository: GraphRepository,
+    removedCodes: Iterable[str],
+    remainingCodes: Iterable[str],
+) -> int:
+    """
+    Delete the FLYS_TO edges that were only crawled for the removed bases.
+    Edges to or from a remaining base are kept, and airports left without
+    any route lose their DISTANCE_TO edges.
+    """
+    remainingCodes = set(remainingCodes)
+
+    stale = [
+        key
+        for key in repository.getFlightKeys(list(removedCodes))
+        if key[0] not in remainingCodes and key[1] not in remainingCodes
+    ]
+    if not stale:
+        return 0
+
+    served_before = repository.getServedAirportCodes()
+    deleted = repository.delete_flights(stale)
+    repository.delete_distances(served_before - repository.getServedAirportCodes())
+
+    return deleted
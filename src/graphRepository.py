@@ -1,41 +1,212 @@
-from datetime import date
+from datetime import date, timedelta
+from itertools import islice
+from typing import Iterable
+import os
+import sys
+import time
 
+from src.metrics import graph_rows_written_total, graph_write_rows_per_second, graph_write_seconds, log_event
 from src.models.airport import Airport
 from src.models.neo4jResult import Neo4jResultFormatted
+from src.spatialIndex import AirportSpatialIndex
+
+
+WRITE_BATCH_SIZE = int(os.getenv("NEO4J_WRITE_BATCH_SIZE", "1000"))
+
+# Idempotent, so safe to run on every startup and before each ingestion
+SCHEMA_STATEMENTS = [
+    "CREATE CONSTRAINT airport_code_unique IF NOT EXISTS FOR (a:Airport) REQUIRE a.code IS UNIQUE",
+    "CREATE CONSTRAINT ingestion_lock_id_unique IF NOT EXISTS FOR (l:IngestionLock) REQUIRE l.id IS UNIQUE",
+    "CREATE INDEX airport_base IF NOT EXISTS FOR (a:Airport) ON (a.base)",
+    "CREATE INDEX flys_to_date IF NOT EXISTS FOR ()-[r:FLYS_TO]-() ON (r.date)",
+    "CREATE INDEX distance_to_distance IF NOT EXISTS FOR ()-[r:DISTANCE_TO]-() ON (r.distance)",
+]
 
 
 class GraphRepository:
-    def __init__(self, driver):
+    def __init__(self, driver, batch_size: int = WRITE_BATCH_SIZE, spatial_index: AirportSpatialIndex | None = None):
         self.driver = driver
+        self.batch_size = batch_size
+        self.spatial_index = spatial_index
 
     @staticmethod
     def build_set_clause(alias: str, props: dict) -> str:
         return ", ".join([f"{alias}.{k} = ${k}" for k in props.keys()])
 
+    @staticmethod
+    def _run_batch(tx, query: str, rows: list[dict]):
+        tx.run(query, rows=rows).consume()
+
+    def _write_batches(self, query: str, rows: Iterable[dict], label: str) -> int:
+        """
+        Send rows to Neo4j in chunks of `batch_size` through an UNWIND query.
+        Each chunk is its own managed write transaction, so transient errors
+        (deadlocks, leader switches) are retried by the driver.
+        """
+        rows = iter(rows)
+        written = 0
+        started = time.perf_counter()
+
+        with self.driver.session() as session:
+            while batch := list(islice(rows, self.batch_size)):
+                session.execute_write(self._run_batch, query, batch)
+                written += len(batch)
+
+        if written:
+            self.bump_graph_version()
+
+        elapsed = time.perf_counter() - started
+        rate = written / elapsed if elapsed > 0 else 0.0
+        graph_rows_written_total.inc(written, kind=label)
+        graph_write_seconds.observe(elapsed, kind=label)
+        graph_write_rows_per_second.set(rate, kind=label)
+        log_event("graph_write", kind=label, rows=written, seconds=round(elapsed, 3), rows_per_second=round(rate))
+        return written
+
+    def setup_schema(self):
+        """Create the constraints and indexes the ingestion and search queries rely on."""
+        with self.driver.session() as session:
+            for statement in SCHEMA_STATEMENTS:
+                session.run(statement).consume()
+        print("Schema ready!")
+
     def clearGraph(self):
         with self.driver.session() as session:
             session.run("MATCH (n) DETACH DELETE n")
+        self.bump_graph_version()
         print("Graph cleared!")
 
-    def save_airports(self, airports):
+    @staticmethod
+    def _bump_version(tx) -> str:
+        # A random stamp rather than a counter, so clearing the graph cannot reuse an old version
+        record = tx.run(
+            """
+            MERGE (v:GraphVersion {id: 'graph'})
+            SET v.version = randomUUID(), v.updated = datetime()
+            RETURN v.version AS version
+            """
+        ).single()
+        return record["version"]
+
+    def bump_graph_version(self) -> str:
+        """Mark the graph as changed, invalidating search results cached against the old version."""
         with self.driver.session() as session:
-            for airport in airports:
-                props = airport.to_dict()
-                set_clause = self.build_set_clause("a", props)
+            return session.execute_write(self._bump_version)
+
+    def getGraphVersion(self) -> str | None:
+        with self.driver.session() as session:
+            record = session.run("MATCH (v:GraphVersion {id: 'graph'}) RETURN v.version AS version").single()
+            return record["version"] if record else None
+
+    @staticmethod
+    def _acquire_lock(tx, owner: str, ttl: float, lock_id: str = "ingestion") -> bool:
+        # The id constraint keeps MERGE to one node. A MERGE that matches takes no write lock, so
+        # the first SET takes it before the owner is read; a second writer waits, then sees the winner.
+        record = tx.run(
+            """
+            MERGE (l:IngestionLock {id: $lock_id})
+            SET l.attempted = datetime()
+            WITH l
+            WHERE l.owner IS NULL OR l.owner = $owner OR l.expires < datetime()
+            SET l.owner = $owner, l.expires = datetime() + duration({seconds: $ttl})
+            RETURN l.owner AS owner
+            """,
+            owner=owner,
+            ttl=int(ttl),
+            lock_id=lock_id,
+        ).single()
+        return record is not None
+
+    def acquire_ingestion_lock(self, owner: str, ttl: float) -> bool:
+        """
+        Take or renew the single-writer ingestion lease for `owner`. The lease
+        lapses after `ttl` seconds, so a crashed writer cannot hold it forever.
+        """
+        with self.driver.session() as session:
+            return session.execute_write(self._acquire_lock, owner, ttl)
+
+    def release_ingestion_lock(self, owner: str):
+        with self.driver.session() as session:
+            session.run(
+                """
+                MATCH (l:IngestionLock {id: 'ingestion', owner: $owner})
+                REMOVE l.owner, l.expires
+                """,
+                owner=owner,
+            ).consume()
+
+    def save_ingestion_checkpoint(self, checkpoint: dict):
+        with self.driver.session() as session:
+            session.run(
+                """
+                MERGE (c:IngestionCheckpoint {id: 'ingestion'})
+                SET c += $checkpoint, c.updated = datetime()
+                """,
+                checkpoint=checkpoint,
+            ).consume()
+
+    def getIngestionCheckpoint(self) -> dict | None:
+        with self.driver.session() as session:
+            record = session.run("MATCH (c:IngestionCheckpoint {id: 'ingestion'}) RETURN c").single()
+            if record is None:
+                return None
+            checkpoint = dict(record["c"])
+            checkpoint.pop("id", None)
+            checkpoint["updated"] = checkpoint["updated"].to_native()
+            return checkpoint
+
+    def clear_ingestion_checkpoint(self):
+        with self.driver.session() as session:
+            session.run("MATCH (c:IngestionCheckpoint {id: 'ingestion'}) DELETE c").consume()
+
+    def save_airports(self, airports):
+        rows = (airport.to_dict() for airport in airports)
+
+        return self._write_batches(
+            """
+            UNWIND $rows AS row
+            MERGE (a:Airport {code: row.code})
+            SET a += row
+            """,
+            rows,
+            "airports",
+        )
+
+    def update_airports(self, airports) -> int:
+        """
+        Write only airports that are new or whose properties changed.
+        The base flag is owned by setBaseAirports and left untouched.
+        """
+        existing = {airport.code: airport.to_dict() for airport in self.getAirports()}
+
+        rows = []
+        for airport in airports:
+            props = airport.to_dict()
+            props.pop("base")
+            current = existing.get(airport.code)
+            if current is None or any(current[k] != v for k, v in props.items()):
+                rows.append(props)
+
+        return self._write_batches(
+            """
+            UNWIND $rows AS row
+            MERGE (a:Airport {code: row.code})
+            ON CREATE SET a.base = false
+            SET a += row
+            """,
+            rows,
+            "changed airports",
+        )
 
-                session.run(
-                    f"""
-                    MERGE (a:Airport {{code: $code}})
-                    SET {set_clause}
-                    """,
-                    **props,
-                )
-                
     def getAirports(self) -> list[Airport]:
         with self.driver.session() as session:
             result = session.run("MATCH (a:Airport) RETURN a")
             return [Airport(**record["a"]) for record in result]
         
+    def load_spatial_index(self) -> AirportSpatialIndex:
+        self.spatial_index = AirportSpatialIndex(self.getAirports())
+        return self.spatial_index
+
     def getBaseAirports(self) -> list[Airport]:
         with self.driver.session() as session:
             result = session.run("MATCH (a:Airport {base: true}) RETURN a")
@@ -52,120 +223,309 @@ class GraphRepository:
                 is_base=is_base
             )
 
-    def save_flights(self, flights):
+    def setBaseAirports(self, airport_codes: list[str]):
         with self.driver.session() as session:
-            for flight in flights:
-                props = flight.to_dict()
-                set_clause = self.build_set_clause("r", props)
-
-                session.run(
-                    f"""
-                    MATCH (o:Airport {{code: $originCode}})
-                    MATCH (d:Airport {{code: $destCode}})
-                    MERGE (o)-[r:FLYS_TO {{date: $date}}]->(d)
-                    SET {set_clause}
-                    """,
-                    originCode=flight.origin.code,
-                    destCode=flight.destination.code,
-                    **props,
-                )
+            session.run(
+                """
+                MATCH (a:Airport)
+                WITH a, a.code IN $codes AS is_base
+                WHERE coalesce(a.base, false) <> is_base
+                SET a.base = is_base
+                """,
+                codes=list(airport_codes),
+            )
 
-    def save_distances(self, distances):
+    def getFlightKeys(self, airport_codes: list[str]) -> set[tuple[str, str, date]]:
+        """
+        Return (origin, destination, date) for every FLYS_TO edge that starts
+        or ends at one of the given airports.
+        """
         with self.driver.session() as session:
-            for distance in distances:
-                props = distance.to_dict()
-                set_clause = self.build_set_clause("r", props)
-
-                session.run(
-                    f"""
-                    MATCH (o:Airport {{code: $originCode}})
-                    MATCH (d:Airport {{code: $destCode}})
-                    MERGE (o)-[r:DISTANCE_TO]->(d)
-                    SET {set_clause}
-                    """,
-                    originCode=distance.origin.code,
-                    destCode=distance.destination.code,
-                    **props,
-                )
+            result = session.run(
+                """
+                MATCH (a:Airport)-[r:FLYS_TO]-(:Airport)
+                WHERE a.code IN $codes
+                RETURN startNode(r).code AS originCode, endNode(r).code AS destCode, r.date AS date
+                """,
+                codes=list(airport_codes),
+            )
+            return {
+                (record["originCode"], record["destCode"], record["date"].to_native())
+                for record in result
+            }
 
-    def query_flights(
-            self,
-            origin_departure_airports: list[str],
-            origin_arrival_airports: list[str],
-            r1_dates: list[date],
-            r2_dates: list[date],
-            lengths_of_stay: list[int],
-            blacklist_countries: list[str] = None,
-            whitelist_countries: list[str] = None,
-            same_airport_return: bool = True,
-            max_distance: int = None
-        ) -> list[Neo4jResultFormatted]:
-            
-            # Initialize blacklist and whitelist
-            blacklist_countries = blacklist_countries if blacklist_countries else []
-            whitelist_countries = whitelist_countries if whitelist_countries else []
-            
-            base_query = """
-            MATCH (o1:Airport)-[r1:FLYS_TO]->(d:Airport)-[r2:FLYS_TO]->(o2:Airport)
-            WHERE o1.code IN $origin_departure_airports
-                AND r1.date IN $r1_dates
-                AND r2.date IN $r2_dates
-                AND r2.date >= r1.date
-                AND duration.between(r1.date, r2.date).days IN $lengths_of_stay
-                AND o2.code IN $origin_arrival_airports
+    def getFlightFares(self, airport_codes: list[str]) -> dict[tuple[str, str, date], float | None]:
+        """Like getFlightKeys, with the indicative fare stored on each edge."""
+        with self.driver.session() as session:
+            result = session.run(
+                """
+                MATCH (a:Airport)-[r:FLYS_TO]-(:Airport)
+                WHERE a.code IN $codes
+                RETURN startNode(r).code AS originCode, endNode(r).code AS destCode, r.date AS date, r.fare AS fare
+                """,
+                codes=list(airport_codes),
+            )
+            return {
+                (record["originCode"], record["destCode"], record["date"].to_native()): record["fare"]
+                for record in result
+            }
+
+    def getRouteDates(self) -> dict[tuple[str, str], list[date]]:
+        """Every FLYS_TO date, grouped by (origin, destination) route."""
+        with self.driver.session() as session:
+            result = session.run(
+                """
+                MATCH (o:Airport)-[r:FLYS_TO]->(d:Airport)
+                RETURN o.code AS originCode, d.code AS destCode, collect(r.date) AS dates
+                """
+            )
+            return {
+                (record["originCode"], record["destCode"]): [d.to_native() for d in record["dates"]]
+                for record in result
+            }
+
+    def getRouteFares(self) -> dict[tuple[str, str], dict[date, float]]:
+        """Indicative fares of the FLYS_TO edges that have one, grouped by route."""
+        with self.driver.session() as session:
+            result = session.run(
+                """
+                MATCH (o:Airport)-[r:FLYS_TO]->(d:Airport)
+                WHERE r.fare IS NOT NULL
+                RETURN o.code AS originCode, d.code AS destCode, collect([r.date, r.fare]) AS fares
+                """
+            )
+            return {
+                (record["originCode"], record["destCode"]): {d.to_native(): fare for d, fare in record["fares"]}
+                for record in result
+            }
+
+    def getBaseFlights(self, start: date, end: date) -> list[tuple[str, str, date]]:
+        """(origin, destination, date) of FLYS_TO edges touching a base airport between two dates."""
+        with self.driver.session() as session:
+            result = session.run(
+                """
+                MATCH (o:Airport)-[r:FLYS_TO]->(d:Airport)
+                WHERE r.date >= $start AND r.date <= $end AND (o.base OR d.base)
+                RETURN o.code AS originCode, d.code AS destCode, r.date AS date
+                """,
+                start=start,
+                end=end,
+            )
+            return [(record["originCode"], record["destCode"], record["date"].to_native()) for record in result]
+
+    def getServedAirportCodes(self) -> set[str]:
+        with self.driver.session() as session:
+            result = session.run("MATCH (a:Airport) WHERE EXISTS { (a)-[:FLYS_TO]-() } RETURN a.code AS code")
+            return {record["code"] for record in result}
+
+    def delete_flights(self, flight_keys) -> int:
+        rows = (
+            {"originCode": origin, "destCode": destination, "date": flight_date}
+            for origin, destination, flight_date in flight_keys
+        )
+
+        return self._write_batches(
             """
-            
-            # Add blacklist filter only if there are countries to blacklist
-            if blacklist_countries:
-                base_query += "\n            AND NOT d.countryName IN $blacklist_countries"
-            
-            # Add whitelist filter if provided
-            if whitelist_countries:
-                base_query += "\n            AND d.countryName IN $whitelist_countries"
-            
-            # Add same airport return filter if needed
-            if same_airport_return:
-                base_query += "\n            AND o1.code = o2.code"
-            
-            base_query += """
-            RETURN
-                o1.code AS origin_departure_airport_code,
-                r1.date AS origin_departure_date,
-                d.code  AS destination_arrival_airport_code,
-                d.code  AS destination_departure_airport_code,
-                r2.date AS destination_departure,
-                o2.code AS origin_arrival_airport_code,
-                null    AS landDistance
+            UNWIND $rows AS row
+            MATCH (o:Airport {code: row.originCode})-[r:FLYS_TO {date: row.date}]->(d:Airport {code: row.destCode})
+            DELETE r
+            """,
+            rows,
+            "deleted flights",
+        )
+
+    def save_flights(self, flights):
+        rows = (
+            {
+                "originCode": flight.origin.code,
+                "destCode": flight.destination.code,
+                "date": flight.date,
+                "props": flight.to_dict(),
+            }
+            for flight in flights
+        )
+
+        return self._write_batches(
+            """
+            UNWIND $rows AS row
+            MATCH (o:Airport {code: row.originCode})
+            MATCH (d:Airport {code: row.destCode})
+            MERGE (o)-[r:FLYS_TO {date: row.date}]->(d)
+            SET r += row.props
+            """,
+            rows,
+            "flights",
+        )
+
+    def save_distances(self, distances):
+        rows = (
+            {
+                "originCode": distance.origin.code,
+                "destCode": distance.destination.code,
+                "props": distance.to_dict(),
+            }
+            for distance in distances
+        )
+
+        return self._write_batches(
             """
-            
-            distance_query = """
-            MATCH (o1:Airport)-[r1:FLYS_TO]->(d1:Airport)
-                -[t:DISTANCE_TO]->(d2:Airport)
-                -[r2:FLYS_TO]->(o2:Airport)
-            WHERE o1.code IN $origin_departure_airports
-                AND r1.date IN $r1_dates
-                AND r2.date IN $r2_dates
-                AND r2.date >= r1.date
-                AND duration.between(r1.date, r2.date).days IN $lengths_of_stay
-                AND o2.code IN $origin_arrival_airports
-                AND t.distance < $max_distance
+            UNWIND $rows AS row
+            MATCH (o:Airport {code: row.originCode})
+            MATCH (d:Airport {code: row.destCode})
+            MERGE (o)-[r:DISTANCE_TO]->(d)
+            SET r += row.props
+            """,
+            rows,
+            "distances",
+        )
+
+    @staticmethod
+    def _delete_distances(tx, codes: list[str]) -> int:
+        record = tx.run(
             """
-            
-            # Add blacklist filter only if there are countries to blacklist
+            MATCH (a:Airport)-[r:DISTANCE_TO]-(:Airport)
+            WHERE a.code IN $codes
+            WITH DISTINCT r
+            DELETE r
+            RETURN count(r) AS deleted
+            """,
+            codes=codes,
+        ).single()
+        return record["deleted"]
+
+    def delete_distances(self, airport_codes) -> int:
+        """Remove the DISTANCE_TO edges touching the given airports, e.g. once they are no longer served."""
+        codes = list(airport_codes)
+        if not codes:
+            return 0
+
+        with self.driver.session() as session:
+            deleted = session.execute_write(self._delete_distances, codes)
+
+        if deleted:
+            self.bump_graph_version()
+        return deleted
+
+    @staticmethod
+    def build_date_pairs(
+        r1_dates: list[date],
+        r2_dates: list[date],
+        lengths_of_stay: list[int],
+    ) -> dict[str, list[date]]:
+        """
+        Valid return dates for each outbound date, keyed by ISO date so the
+        query can look them up with toString(r1.date).
+        """
+        r2_set = set(r2_dates)
+        pairs: dict[str, list[date]] = {}
+
+        for outbound in sorted(set(r1_dates)):
+            returns = sorted({
+                outbound + timedelta(days=days)
+                for days in lengths_of_stay
+                if days >= 0 and outbound + timedelta(days=days) in r2_set
+            })
+            if returns:
+                pairs[outbound.isoformat()] = returns
+
+        return pairs
+
+    def build_flights_query(
+        self,
+        origin_departure_airports: list[str],
+        origin_arrival_airports: list[str],
+        r1_dates: list[date],
+        r2_dates: list[date],
+        lengths_of_stay: list[int],
+        blacklist_countries: list[str] = None,
+        whitelist_countries: list[str] = None,
+        same_airport_return: bool = True,
+        max_distance: int = None,
+        max_total_fare: float = None,
+    ) -> tuple[str, dict]:
+        """
+        Build the round-trip search query and its parameters.
+
+        Outbound/return date pairs are worked out here rather than with
+        duration.between in Cypher, origins are anchored through the
+        Airport.code constraint, and the open-jaw case reuses each outbound
+        expansion instead of repeating the whole pattern under UNION.
+
+        With `max_total_fare`, legs whose indicative fares already add up to
+        more are pruned here, before any live pricing. Edges without a fare
+        count as free, so they are never pruned.
+        """
+        blacklist_countries = blacklist_countries if blacklist_countries else []
+        whitelist_countries = whitelist_countries if whitelist_countries else []
+
+        origin_departure_airports = list(dict.fromkeys(origin_departure_airports))
+        if same_airport_return:
+            # o2 has to be o1, so origins that cannot be returned to are dropped up front
+            origin_departure_airports = [
+                code for code in origin_departure_airports if code in origin_arrival_airports
+            ]
+
+        date_pairs = self.build_date_pairs(r1_dates, r2_dates, lengths_of_stay)
+
+        def country_filters(alias: str) -> list[str]:
+            filters = []
             if blacklist_countries:
-                distance_query += "\n            AND NOT d1.countryName IN $blacklist_countries"
-                distance_query += "\n            AND NOT d2.countryName IN $blacklist_countries"
-            
-            # Add whitelist filter if provided
+                filters.append(f"NOT {alias}.countryName IN $blacklist_countries")
             if whitelist_countries:
-                distance_query += "\n            AND d1.countryName IN $whitelist_countries"
-                distance_query += "\n            AND d2.countryName IN $whitelist_countries"
-            
-            # Add same airport return filter if needed
-            if same_airport_return:
-                distance_query += "\n            AND o1.code = o2.code"
-            
-            distance_query += """
+                filters.append(f"{alias}.countryName IN $whitelist_countries")
+            return filters
+
+        def where(filters: list[str]) -> str:
+            return "WHERE " + "\n                AND ".join(filters)
+
+        outbound_filters = ["r1.date IN $outbound_dates"] + country_filters("d1")
+        return_filters = ["r2.date IN return_dates", "o2.code IN $origin_arrival_airports"]
+
+        if max_total_fare is not None:
+            outbound_filters.append("coalesce(r1.fare, 0) <= $max_total_fare")
+            return_filters.append("coalesce(r1.fare, 0) + coalesce(r2.fare, 0) <= $max_total_fare")
+
+        # Add same airport return filter if needed
+        if same_airport_return:
+            return_filters.append("o2 = o1")
+
+        query = f"""
+            UNWIND $origin_departure_airports AS origin_code
+            MATCH (o1:Airport {{code: origin_code}})-[r1:FLYS_TO]->(d1:Airport)
+            {where(outbound_filters)}
+            WITH o1, r1, d1, $date_pairs[toString(r1.date)] AS return_dates
+            """
+
+        if max_distance is None:
+            query += f"""
+            MATCH (d1)-[r2:FLYS_TO]->(o2:Airport)
+            {where(return_filters)}
+            WITH o1, r1, d1, d1 AS d2, r2, o2, null AS landDistance
+            """
+        else:
+            # With a spatial index the nearby airports come in as a parameter,
+            # so the radius can change per query without DISTANCE_TO edges
+            if self.spatial_index is not None:
+                nearby = "coalesce($neighbours[d1.code], [])"
+            else:
+                nearby = (
+                    "[(d1)-[dt:DISTANCE_TO]->(n:Airport) WHERE dt.distance < $max_distance"
+                    " | {code: n.code, distance: dt.distance}]"
+                )
+
+            # The outbound leg is expanded once and shared by the plain and open-jaw returns
+            nearby_filters = country_filters("d2")
+            if nearby_filters:
+                return_filters.append(f"(d2 = d1 OR ({' AND '.join(nearby_filters)}))")
+
+            query += f"""
+            UNWIND [{{code: d1.code, distance: null}}] + {nearby} AS t
+            MATCH (d2:Airport {{code: t.code}})-[r2:FLYS_TO]->(o2:Airport)
+            {where(return_filters)}
+            WITH o1, r1, d1, d2, r2, o2, t.distance AS landDistance
+            """
+
+        query += """
             RETURN
                 o1.code AS origin_departure_airport_code,
                 r1.date AS origin_departure_date,
@@ -173,45 +533,106 @@ class GraphRepository:
                 d2.code AS destination_departure_airport_code,
                 r2.date AS destination_departure,
                 o2.code AS origin_arrival_airport_code,
-                t.distance AS landDistance
+                landDistance,
+                r1.fare + r2.fare AS indicativeFare
             """
-            
-            if max_distance is not None:
-                query = f"""
-                {base_query}
-                UNION
-                {distance_query}
-                """
+
+        params = {
+            "origin_departure_airports": origin_departure_airports,
+            "origin_arrival_airports": origin_arrival_airports,
+            "outbound_dates": [date.fromisoformat(outbound) for outbound in date_pairs],
+            "date_pairs": date_pairs,
+        }
+
+        if max_distance is not None:
+            if self.spatial_index is not None:
+                params["neighbours"] = self.spatial_index.neighbour_map(max_distance)
             else:
-                query = base_query
-            
-            params = {
-                "origin_departure_airports": origin_departure_airports,
-                "origin_arrival_airports": origin_arrival_airports,
-                "r1_dates": r1_dates,
-                "r2_dates": r2_dates,
-                "lengths_of_stay": lengths_of_stay,
-                "max_distance": max_distance
-            }
-            
-            # Only add blacklist/whitelist to params if they're actually used in the query
-            if blacklist_countries:
-                params["blacklist_countries"] = blacklist_countries
-            
-            if whitelist_countries:
-                params["whitelist_countries"] = whitelist_countries
-            
-            with self.driver.session() as session:
-                result = session.run(query, params)
-                return [
-                    Neo4jResultFormatted(
-                        origin_departure_airport_code=record["origin_departure_airport_code"],
-                        destination_arrival_airport_code=record["destination_arrival_airport_code"],
-                        destination_departure_airport_code=record["destination_departure_airport_code"],
-                        origin_arrival_airport_code=record["origin_arrival_airport_code"],
-                        origin_departure_date=record["origin_departure_date"],
-                        destination_departure=record["destination_departure"],
-                        travel_distance_km=record["landDistance"]
-                    )
-                    for record in result
-                ]
\ No newline at end of file
+                params["max_distance"] = max_distance
+
+        if max_total_fare is not None:
+            params["max_total_fare"] = max_total_fare
+
+        # Only add blacklist/whitelist to params if they're actually used in the query
+        if blacklist_countries:
+            params["blacklist_countries"] = blacklist_countries
+
+        if whitelist_countries:
+            params["whitelist_countries"] = whitelist_countries
+
+        return query, params
+
+    def query_flights(self, *args, **kwargs) -> list[Neo4jResultFormatted]:
+        query, params = self.build_flights_query(*args, **kwargs)
+
+        with self.driver.session() as session:
+            result = session.run(query, params)
+            return [
+                Neo4jResultFormatted(
+                    # Interned so every row shares one string per airport code
+                    origin_departure_airport_code=sys.intern(record["origin_departure_airport_code"]),
+                    destination_arrival_airport_code=sys.intern(record["destination_arrival_airport_code"]),
+                    destination_departure_airport_code=sys.intern(record["destination_departure_airport_code"]),
+                    origin_arrival_airport_code=sys.intern(record["origin_arrival_airport_code"]),
+                    origin_departure_date=record["origin_departure_date"],
+                    destination_departure=record["destination_departure"],
+                    travel_distance_km=record["landDistance"],
+                    indicative_fare=record["indicativeFare"],
+                )
+                for record in result
+            ]
+
+    def explain_flights_query(self, *args, **kwargs) -> list[dict]:
+        """
+        Plan the search query with EXPLAIN and return the operators that read
+        from an index, e.g. to check that origins are anchored on Airport.code.
+        """
+        query, params = self.build_flights_query(*args, **kwargs)
+
+        with self.driver.session() as session:
+            summary = session.run(f"EXPLAIN {query}", params).consume()
+
+        return self._index_operators(summary.plan)
+
+    def profile_flights_query(self, *args, **kwargs) -> dict:
+        """
+        Run the search query under PROFILE and return its row count and total
+        database hits, for comparing query shapes against a populated graph.
+        """
+        return self.profile_query(*self.build_flights_query(*args, **kwargs))
+
+    def profile_query(self, query: str, params: dict) -> dict:
+        """Run any read query under PROFILE, see profile_flights_query."""
+        with self.driver.session() as session:
+            result = session.run(f"PROFILE {query}", params)
+            rows = len(list(result))
+            summary = result.consume()
+
+        return {
+            "rows": rows,
+            "db_hits": self._db_hits(summary.profile),
+            "indexes": self._index_operators(summary.profile),
+        }
+
+    @classmethod
+    def _db_hits(cls, profile) -> int:
+        if not profile:
+            return 0
+        return profile.get("dbHits", 0) + sum(cls._db_hits(child) for child in profile.get("children", []))
+
+    @classmethod
+    def _index_operators(cls, plan) -> list[dict]:
+        if not plan:
+            return []
+
+        operators = []
+        if "Index" in plan["operatorType"]:
+            operators.append({
+                "operator": plan["operatorType"],
+                "details": plan["args"].get("Details"),
+            })
+
+        for child in plan.get("children", []):
+            operators.extend(cls._index_operators(child))
+
+        return operators
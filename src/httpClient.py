@@ -0,0 +1,109 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+import threading
+
+from cachetools import LRUCache
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
+import requests
+
+from src.metrics import upstream_request_seconds, upstream_responses_total
+from src.requestScheduler import RequestScheduler
+
+
+@dataclass
+class _Validated:
+    etag: Optional[str]
+    last_modified: Optional[str]
+    value: Any
+
+
+class HttpClient:
+    """
+    Keep-alive session shared by every upstream call.
+
+    The connection pool is sized for the scheduler's concurrency so worker
+    threads do not open and drop sockets, and compressed bodies are
+    negotiated (brotli as well when the brotli package is installed).
+
+    With `revalidate=True` the parsed result is kept alongside the response's
+    ETag / Last-Modified, and the next request for the same URL is made
+    conditional: a 304 returns the stored result without transferring or
+    parsing the body again.
+    """
+
+    def __init__(self, scheduler: RequestScheduler, pool_size: int = 16, max_validated: int = 4096):
+        self.scheduler = scheduler
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(make_headers(accept_encoding=True))
+
+        self._validated: LRUCache = LRUCache(maxsize=max_validated)
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "not_modified": 0, "bytes": 0}
+
+    def _count(self, counter: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[counter] += amount
+
+    def get(
+        self,
+        endpoint: str,
+        url: str,
+        parse: Callable[[requests.Response], Any] = lambda response: response.json(),
+        revalidate: bool = False,
+    ) -> Any:
+        headers: Dict[str, str] = {}
+        entry = None
+        if revalidate:
+            with self._lock:
+                entry = self._validated.get(url)
+            if entry is not None:
+                if entry.etag:
+                    headers["If-None-Match"] = entry.etag
+                if entry.last_modified:
+                    headers["If-Modified-Since"] = entry.last_modified
+
+        try:
+            with upstream_request_seconds.time(endpoint=endpoint):
+                response = self.scheduler.get(endpoint, url, session=self.session, headers=headers)
+        except Exception:
+            upstream_responses_total.inc(endpoint=endpoint, status="error")
+            raise
+        upstream_responses_total.inc(endpoint=endpoint, status=response.status_code)
+        self._count("requests")
+
+        if response.status_code == 304 and entry is not None:
+            self._count("not_modified")
+            return entry.value
+
+        response.raise_for_status()
+        self._count("bytes", len(response.content))
+        value = parse(response)
+
+        if revalidate:
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            with self._lock:
+                if etag or last_modified:
+                    self._validated[url] = _Validated(etag, last_modified, value)
+                else:
+                    self._validated.pop(url, None)
+
+        return value
+
+    def clear(self) -> None:
+        """Forget stored validators, so the next requests transfer full bodies."""
+        with self._lock:
+            self._validated.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        with self._lock:
+            stats["validated_urls"] = len(self._validated)
+        stats["accept_encoding"] = self.session.headers.get("Accept-Encoding")
+        return stats
@@ -0,0 +1,309 @@
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+import threading
+import time
+import uuid
+
+from src.graphRefresh import refreshBaseRoutes, removeBaseAirports
+from src.graphRepository import GraphRepository
+from src.metrics import log_event
+from src.models.refreshSummary import RefreshSummary
+from src.ryanairApi import getActiveAirports
+
+FINISHED_STATES = ("done", "failed")
+
+
+class IngestionBusy(Exception):
+    pass
+
+
+@dataclass
+class BaseProgress:
+    code: str
+    status: str = "pending"     # pending, crawling, done, failed, or skipped when resumed
+    routes_total: int = 0
+    routes_crawled: int = 0
+    edges_written: int = 0
+    failures: int = 0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def set_routes(self, done: int, total: int) -> None:
+        self.routes_crawled = done
+        self.routes_total = total
+
+    def to_dict(self) -> dict:
+        elapsed = (self.finished_at or time.time()) - self.started_at if self.started_at else 0.0
+        return {
+            "code": self.code,
+            "status": self.status,
+            "routes_total": self.routes_total,
+            "routes_crawled": self.routes_crawled,
+            "edges_written": self.edges_written,
+            "failures": self.failures,
+            "seconds": round(elapsed, 1),
+            "routes_per_second": round(self.routes_crawled / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+
+
+@dataclass
+class IngestionJob:
+    kind: str                              # "bases" from the admin form, "refresh" for all bases
+    bases: List[str]                       # bases to crawl, in order
+    selected: Optional[List[str]] = None   # full base selection to store, for "bases" jobs
+    removed: List[str] = field(default_factory=list)
+    resumed_from: Optional[str] = None
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "queued"
+    stage: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    progress: Dict[str, BaseProgress] = field(default_factory=dict)
+    summary: RefreshSummary = None
+    error: Optional[str] = None
+
+    def __post_init__(self):
+        self.progress = self.progress or {code: BaseProgress(code) for code in self.bases}
+        self.summary = self.summary or RefreshSummary(baseAirports=list(self.bases))
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    @property
+    def completed(self) -> List[str]:
+        return [code for code, base in self.progress.items() if base.status in ("done", "skipped")]
+
+    def checkpoint(self) -> dict:
+        return {
+            "job_id": self.resumed_from or self.id,
+            "kind": self.kind,
+            "bases": self.bases,
+            "selected": self.selected,
+            "removed": self.removed,
+            "completed": self.completed,
+        }
+
+    def to_dict(self) -> dict:
+        end = self.finished_at or time.time()
+        running = end - self.started_at if self.started_at else 0.0
+        edges = sum(base.edges_written for base in self.progress.values())
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "stage": self.stage,
+            "resumed_from": self.resumed_from,
+            "bases_done": len(self.completed),
+            "bases_total": len(self.bases),
+            "bases": [base.to_dict() for base in self.progress.values()],
+            "edges_written": edges,
+            "edges_per_second": round(edges / running, 1) if running > 0 else 0.0,
+            "flights_added": self.summary.flightsAdded,
+            "flights_removed": self.summary.flightsRemoved,
+            "fares_updated": self.summary.faresUpdated,
+            "distances_added": self.summary.distancesAdded,
+            "distances_removed": self.summary.distancesRemoved,
+            "failures": len(self.summary.failures),
+            "error": self.error,
+            "created_at": self.created_at,
+            "running_seconds": round(running, 1),
+        }
+
+
+class IngestionJobManager:
+    """
+    Runs crawls and graph writes on a background thread, one job at a time.
+
+    Bases are crawled and written one after another. After each base a
+    checkpoint is stored in the graph, so a job that fails part way can be
+    resumed without re-crawling the bases it finished.
+
+    Route directions already crawled for an earlier base of the job are not
+    fetched again, as in a single multi-base crawl; a resumed job does not
+    know which directions its finished bases crawled, so it fetches those
+    again. Lookups within a base run in parallel, but one base's slow tail
+    does not overlap the next base's lookups.
+
+    A lease lock in the graph keeps a second process from ingesting at the
+    same time. It is renewed after every base and every `lock_ttl` / 3
+    seconds during a crawl, and lapses after `lock_ttl` seconds if the
+    holder dies. A job that finds its lease taken over fails instead of
+    writing on. `on_change` runs after a job has written anything, e.g. to
+    reload search state.
+    """
+
+    def __init__(
+        self,
+        repository: GraphRepository,
+        on_change: Optional[Callable[[], None]] = None,
+        lock_ttl: float = 900,
+        history: int = 20,
+    ):
+        self.repository = repository
+        self.on_change = on_change
+        self.lock_ttl = lock_ttl
+        self._jobs: deque = deque(maxlen=history)
+        self._current: Optional[IngestionJob] = None
+        self._lock = threading.Lock()
+        self._lease_renewed = 0.0
+
+    def submit(
+        self,
+        kind: str,
+        bases: List[str],
+        selected: Optional[List[str]] = None,
+        removed: Optional[List[str]] = None,
+        completed: Optional[List[str]] = None,
+        resumed_from: Optional[str] = None,
+    ) -> IngestionJob:
+        with self._lock:
+            if self._current is not None and not self._current.finished:
+                raise IngestionBusy(f"Ingestion job {self._current.id} is still {self._current.status}")
+
+            job = IngestionJob(
+                kind=kind,
+                bases=sorted(set(bases)),
+                selected=list(selected) if selected is not None else None,
+                removed=sorted(set(removed or [])),
+                resumed_from=resumed_from,
+            )
+            for code in completed or []:
+                if code in job.progress:
+                    job.progress[code].status = "skipped"
+
+            self._current = job
+            self._jobs.appendleft(job)
+
+        threading.Thread(target=self._execute, args=(job,), name=f"ingestion-{job.id[:8]}", daemon=True).start()
+        return job
+
+    def resume(self) -> IngestionJob:
+        """Start a job that picks up the stored checkpoint, skipping the bases it completed."""
+        checkpoint = self.repository.getIngestionCheckpoint()
+        if checkpoint is None:
+            raise ValueError("No ingestion checkpoint to resume from")
+
+        return self.submit(
+            checkpoint["kind"],
+            checkpoint["bases"],
+            selected=checkpoint.get("selected"),
+            removed=checkpoint.get("removed"),
+            completed=checkpoint.get("completed"),
+            resumed_from=checkpoint["job_id"],
+        )
+
+    def _renew_lease(self, job: IngestionJob, every: float = 0.0) -> None:
+        if time.monotonic() - self._lease_renewed < every:
+            return
+        if not self.repository.acquire_ingestion_lock(job.id, self.lock_ttl):
+            raise IngestionBusy("Lost the ingestion lock to another process")
+        self._lease_renewed = time.monotonic()
+
+    def _prepare(self, job: IngestionJob):
+        job.stage = "airports"
+        airports = getActiveAirports()
+
+        self.repository.setup_schema()
+        job.summary.airportsUpdated = self.repository.update_airports(airports)
+        self.repository.load_spatial_index()
+
+        if job.selected is not None:
+            # Drop routes only crawled for removed bases before storing the new selection
+            job.stage = "bases"
+            job.summary.flightsRemoved += removeBaseAirports(self.repository, job.removed, job.selected)
+            self.repository.setBaseAirports(job.selected)
+
+        return airports
+
+    def _crawl(self, job: IngestionJob, base: BaseProgress, airports, crawled: set) -> None:
+        job.stage = f"crawling {base.code}"
+        base.status = "crawling"
+        base.started_at = time.time()
+
+        def edges() -> int:
+            return job.summary.flightsAdded + job.summary.flightsRemoved + job.summary.faresUpdated
+
+        def on_progress(done: int, total: int) -> None:
+            base.set_routes(done, total)
+            # A long crawl must not outlive the lease before anything is written
+            self._renew_lease(job, every=self.lock_ttl / 3)
+
+        edges_before, failures_before = edges(), len(job.summary.failures)
+        refreshBaseRoutes(
+            self.repository, [base.code], airports, job.summary, on_progress=on_progress, crawled=crawled
+        )
+
+        base.edges_written = edges() - edges_before
+        base.failures = len(job.summary.failures) - failures_before
+        base.status = "done"
+        base.finished_at = time.time()
+
+    def _execute(self, job: IngestionJob) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+        wrote = False
+
+        try:
+            if not self.repository.acquire_ingestion_lock(job.id, self.lock_ttl):
+                raise IngestionBusy("Another process holds the ingestion lock")
+            self._lease_renewed = time.monotonic()
+
+            try:
+                airports = self._prepare(job)
+                wrote = True
+                self.repository.save_ingestion_checkpoint(job.checkpoint())
+
+                # (origin, destination) directions crawled so far, shared by every base of the job
+                crawled = set()
+                for base in job.progress.values():
+                    if base.status == "skipped":
+                        continue
+                    try:
+                        self._crawl(job, base, airports, crawled)
+                    except Exception:
+                        base.status = "failed"
+                        base.finished_at = time.time()
+                        raise
+                    self._renew_lease(job)
+                    self.repository.save_ingestion_checkpoint(job.checkpoint())
+
+                self.repository.clear_ingestion_checkpoint()
+            finally:
+                self.repository.release_ingestion_lock(job.id)
+        except Exception as e:
+            print(f"Warning: Ingestion job {job.id} failed. Error: {e}")
+            job.status = "failed"
+            job.error = str(e)
+        else:
+            job.status = "done"
+        finally:
+            job.stage = job.status
+            job.finished_at = time.time()
+            log_event("ingestion_job", **{k: v for k, v in job.to_dict().items() if k != "bases"})
+
+            if wrote and self.on_change:
+                try:
+                    self.on_change()
+                except Exception as e:
+                    print(f"Warning: Could not refresh search state after ingestion. Error: {e}")
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._lock:
+            return next((job for job in self._jobs if job.id == job_id), None)
+
+    def current(self) -> Optional[IngestionJob]:
+        with self._lock:
+            return self._current
+
+    def history(self) -> List[IngestionJob]:
+        with self._lock:
+            return list(self._jobs)
+
+    def stats(self) -> dict:
+        counts: Dict[str, int] = {}
+        for job in self.history():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {"jobs": counts}
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Dict
+from typing import Dict, Optional
 from datetime import datetime
 
 from src.models.airport import Airport
@@ -9,18 +9,19 @@ class BscFlysTo:
     origin: Airport
     destination: Airport
     date: datetime.date
+    # Cheapest indicative one-way fare for the day in EUR, None when unknown
+    fare: Optional[float] = None
     # departureTime: Optional[datetime] = None
     # arrivalTime: Optional[datetime] = None
-    # fare: Optional[float] = None
     # flightNumber: Optional[str] = None
     # duration: Optional[str] = None
     
     def to_dict(self) -> Dict:
         return {
-            "date": self.date #.isoformat(),
+            "date": self.date, #.isoformat(),
+            "fare": self.fare,
             # "departureTime": self.departureTime,
             # "arrivalTime": self.arrivalTime,
-            # "fare": self.fare,
             # "flightNumber": self.flightNumber,
             # "duration": self.duration
         }
\ No newline at end of file
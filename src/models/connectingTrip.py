@@ -0,0 +1,55 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+from src.models.advFlysTo import AdvFlysTo
+
+
+@dataclass(slots=True)
+class ConnectingTrip:
+    """
+    One priced one-way itinerary of one or more flights. Times are local to
+    each airport, so travelTime is off by any time zone difference between
+    the first and last airport.
+    """
+    legs: Tuple[AdvFlysTo, ...]
+
+    @property
+    def origin(self) -> str:
+        return self.legs[0].origin
+
+    @property
+    def destination(self) -> str:
+        return self.legs[-1].destination
+
+    @property
+    def via(self) -> List[str]:
+        return [leg.destination for leg in self.legs[:-1]]
+
+    @property
+    def stops(self) -> int:
+        return len(self.legs) - 1
+
+    @property
+    def transfer(self) -> bool:
+        return len(self.legs) > 1
+
+    @property
+    def fullFare(self) -> float:
+        return sum(leg.fare for leg in self.legs)
+
+    @property
+    def departureTime(self) -> datetime:
+        return self.legs[0].departureTime
+
+    @property
+    def arrivalTime(self) -> datetime:
+        return self.legs[-1].arrivalTime
+
+    @property
+    def travelTime(self) -> timedelta:
+        return self.arrivalTime - self.departureTime
+
+    @property
+    def connectionTimes(self) -> List[timedelta]:
+        return [later.departureTime - earlier.arrivalTime for earlier, later in zip(self.legs, self.legs[1:])]
@@ -0,0 +1,9 @@
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class CrawlFailure:
+    origin: str
+    destination: Optional[str]
+    error: str
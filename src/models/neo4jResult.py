@@ -3,7 +3,7 @@ from datetime import datetime
 from typing import Optional
 
 
-@dataclass
+@dataclass(slots=True)
 class Neo4jResultFormatted:
     origin_departure_airport_code: str
     destination_arrival_airport_code: str
@@ -11,4 +11,6 @@ class Neo4jResultFormatted:
     origin_arrival_airport_code: str
     origin_departure_date: datetime.date
     destination_departure: datetime.date
-    travel_distance_km: Optional[float] = None
\ No newline at end of file
+    travel_distance_km: Optional[float] = None
+    # Sum of the two legs' stored fares, None if either is unknown
+    indicative_fare: Optional[float] = None
\ No newline at end of file
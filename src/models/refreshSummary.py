@@ -0,0 +1,16 @@
+from dataclasses import dataclass, field
+from typing import List
+
+from src.models.crawlFailure import CrawlFailure
+
+
+@dataclass
+class RefreshSummary:
+    baseAirports: List[str]
+    airportsUpdated: int = 0
+    flightsAdded: int = 0
+    flightsRemoved: int = 0
+    faresUpdated: int = 0
+    distancesAdded: int = 0
+    distancesRemoved: int = 0
+    failures: List[CrawlFailure] = field(default_factory=list)
@@ -2,32 +2,104 @@ from dataclasses import dataclass
 from typing import Optional
 from datetime import datetime
 
+from src.models.advFlysTo import AdvFlysTo
+from src.models.airport import Airport
+from src.models.neo4jResult import Neo4jResultFormatted
 
-@dataclass
+
+@dataclass(slots=True)
 class Trip:
-    # origin: str
-    destination: str
-    # date: datetime.date
-    originDepartureAirportName: str = None
-    destinationArrivalAirportName: str = None
-    destinationDepartureAirportName: str = None
-    originArrivalAirportName: str = None
-    originDepartureTime: datetime = None
-    destinationArrivalTime: datetime = None
-    destinationDepartureTime: datetime = None
-    originArrivalTime: datetime = None
-    fullFare: float = None
+    """
+    One priced round trip.
+
+    Only references are stored: the candidate row, the two flights (shared by
+    every trip using the same leg) and the four airports (shared by all
+    trips). The flat attributes the templates use are derived properties.
+    """
+    result: Neo4jResultFormatted
+    outbound: AdvFlysTo
+    inbound: AdvFlysTo
+    originDepartureAirport: Optional[Airport] = None
+    destinationArrivalAirport: Optional[Airport] = None
+    destinationDepartureAirport: Optional[Airport] = None
+    originArrivalAirport: Optional[Airport] = None
     transfer: bool = False
-    distance:  Optional[float] = None
-    originDepartureLat: Optional[float] = None
-    originDepartureLon: Optional[float] = None
-    destinationArrivalLat: Optional[float] = None
-    destinationArrivalLon: Optional[float] = None
-    destinationDepartureLat: Optional[float] = None
-    destinationDepartureLon: Optional[float] = None
-    originArrivalLat: Optional[float] = None
-    originArrivalLon: Optional[float] = None
-
-    # transferAirport: Optional[str] = None
-    # departureTime: Optional[datetime] = None
-    # arrivalTime: Optional[datetime] = None
\ No newline at end of file
+
+    @property
+    def destination(self) -> str:
+        if self.outbound.destinationName == self.inbound.originName:
+            return self.outbound.destinationName
+        return f"{self.outbound.destinationName} / {self.inbound.originName}"
+
+    @property
+    def fullFare(self) -> float:
+        return self.outbound.fare + self.inbound.fare
+
+    @property
+    def distance(self) -> Optional[float]:
+        return self.result.travel_distance_km
+
+    # Airport codes of the four stops
+    @property
+    def originDepartureAirportName(self) -> str:
+        return self.result.origin_departure_airport_code
+
+    @property
+    def destinationArrivalAirportName(self) -> str:
+        return self.result.destination_arrival_airport_code
+
+    @property
+    def destinationDepartureAirportName(self) -> str:
+        return self.result.destination_departure_airport_code
+
+    @property
+    def originArrivalAirportName(self) -> str:
+        return self.result.origin_arrival_airport_code
+
+    @property
+    def originDepartureTime(self) -> Optional[datetime]:
+        return self.outbound.departureTime
+
+    @property
+    def destinationArrivalTime(self) -> Optional[datetime]:
+        return self.outbound.arrivalTime
+
+    @property
+    def destinationDepartureTime(self) -> Optional[datetime]:
+        return self.inbound.departureTime
+
+    @property
+    def originArrivalTime(self) -> Optional[datetime]:
+        return self.inbound.arrivalTime
+
+    @property
+    def originDepartureLat(self) -> Optional[float]:
+        return self.originDepartureAirport.latitude if self.originDepartureAirport else None
+
+    @property
+    def originDepartureLon(self) -> Optional[float]:
+        return self.originDepartureAirport.longitude if self.originDepartureAirport else None
+
+    @property
+    def destinationArrivalLat(self) -> Optional[float]:
+        return self.destinationArrivalAirport.latitude if self.destinationArrivalAirport else None
+
+    @property
+    def destinationArrivalLon(self) -> Optional[float]:
+        return self.destinationArrivalAirport.longitude if self.destinationArrivalAirport else None
+
+    @property
+    def destinationDepartureLat(self) -> Optional[float]:
+        return self.destinationDepartureAirport.latitude if self.destinationDepartureAirport else None
+
+    @property
+    def destinationDepartureLon(self) -> Optional[float]:
+        return self.destinationDepartureAirport.longitude if self.destinationDepartureAirport else None
+
+    @property
+    def originArrivalLat(self) -> Optional[float]:
+        return self.originArrivalAirport.latitude if self.originArrivalAirport else None
+
+    @property
+    def originArrivalLon(self) -> Optional[float]:
+        return self.originArrivalAirport.longitude if self.originArrivalAirport else None
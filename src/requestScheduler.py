@@ -0,0 +1,254 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+import random
+import threading
+import time
+
+import requests
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+@dataclass
+class EndpointPolicy:
+    rate: float = 10.0                 # requests per second
+    burst: int = 10                    # token bucket capacity
+    max_concurrency: int = 16          # AIMD ceiling
+    min_concurrency: int = 1           # AIMD floor
+    target_latency: float = 2.0        # seconds, slower responses shrink the window
+    timeout: float = 10.0              # per-request timeout
+    max_retries: int = 4
+    backoff_base: float = 0.5          # seconds
+    backoff_cap: float = 30.0          # seconds
+    failure_threshold: int = 5         # consecutive failures that open the breaker
+    reset_timeout: float = 30.0        # seconds before a half-open trial request
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take a token, sleeping until one is available. Returns the time waited."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency window that grows by one request per window of successes and
+    halves on throttling or slow responses (AIMD).
+    """
+
+    def __init__(self, policy: EndpointPolicy):
+        self.policy = policy
+        self.limit = float(policy.max_concurrency)
+        self.in_flight = 0
+        self.cond = threading.Condition()
+
+    def acquire(self) -> None:
+        with self.cond:
+            self.cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    def release(self, latency: float, throttled: bool) -> None:
+        with self.cond:
+            self.in_flight -= 1
+            if throttled or latency > self.policy.target_latency:
+                self.limit = max(self.policy.min_concurrency, self.limit / 2)
+            else:
+                self.limit = min(self.policy.max_concurrency, self.limit + 1 / self.limit)
+            self.cond.notify_all()
+
+
+class CircuitBreaker:
+    def __init__(self, policy: EndpointPolicy):
+        self.policy = policy
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_progress = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.policy.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self.lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.trial_in_progress:
+                self.trial_in_progress = True
+                return True
+            return False
+
+    def record(self, success: bool) -> None:
+        with self.lock:
+            self.trial_in_progress = False
+            if success:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.policy.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class _Endpoint:
+    def __init__(self, name: str, policy: EndpointPolicy):
+        self.name = name
+        self.policy = policy
+        self.bucket = TokenBucket(policy.rate, policy.burst)
+        self.limiter = AdaptiveLimiter(policy)
+        self.breaker = CircuitBreaker(policy)
+        self.stats_lock = threading.Lock()
+        self.queued = 0
+        self.stats = {
+            "requests": 0,
+            "retries": 0,
+            "throttled": 0,
+            "failures": 0,
+            "rejected": 0,
+            "rate_limited_seconds": 0.0,
+        }
+
+    def count(self, counter: str, amount=1) -> None:
+        with self.stats_lock:
+            self.stats[counter] += amount
+
+    def count_queued(self, amount: int) -> None:
+        with self.stats_lock:
+            self.queued += amount
+
+
+class RequestScheduler:
+    """
+    Central gate for upstream HTTP calls.
+
+    Every endpoint gets its own token bucket, AIMD concurrency window and
+    circuit breaker, so a throttled availability lookup does not starve the
+    route crawl and vice versa. 429s, 5xx responses, timeouts and connection
+    errors are retried with jittered exponential backoff, honouring
+    Retry-After when the server sends it.
+    """
+
+    def __init__(self, policies: Dict[str, EndpointPolicy], default_policy: Optional[EndpointPolicy] = None):
+        self.default_policy = default_policy or EndpointPolicy()
+        self._endpoints: Dict[str, _Endpoint] = {
+            name: _Endpoint(name, policy) for name, policy in policies.items()
+        }
+        self._lock = threading.Lock()
+
+    def _endpoint(self, name: str) -> _Endpoint:
+        with self._lock:
+            if name not in self._endpoints:
+                self._endpoints[name] = _Endpoint(name, self.default_policy)
+            return self._endpoints[name]
+
+    def _backoff(self, policy: EndpointPolicy, attempt: int, response=None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(policy.backoff_cap, float(retry_after))
+        # Full jitter keeps retrying clients from synchronising
+        return random.uniform(0, min(policy.backoff_cap, policy.backoff_base * 2 ** attempt))
+
+    def request(self, endpoint: str, send: Callable[[float], requests.Response]) -> requests.Response:
+        """
+        Run `send(timeout)` under the endpoint's limits and retry policy.
+        Returns the last response once retries are exhausted, so callers can
+        still raise_for_status().
+        """
+        ep = self._endpoint(endpoint)
+        policy = ep.policy
+
+        for attempt in range(policy.max_retries + 1):
+            if not ep.breaker.allow():
+                ep.count("rejected")
+                raise CircuitOpenError(f"Circuit open for {endpoint}")
+
+            # Queued until both the rate limit and the concurrency window allow it
+            ep.count_queued(1)
+            try:
+                ep.count("rate_limited_seconds", ep.bucket.acquire())
+                ep.limiter.acquire()
+            finally:
+                ep.count_queued(-1)
+            ep.count("requests")
+
+            started = time.monotonic()
+            response = None
+            error = None
+            try:
+                response = send(policy.timeout)
+            except (requests.Timeout, requests.ConnectionError) as e:
+                error = e
+            except Exception:
+                # Not retried, but still a failed call: it must not leave a half-open trial pending
+                ep.limiter.release(time.monotonic() - started, throttled=False)
+                ep.breaker.record(False)
+                ep.count("failures")
+                raise
+            latency = time.monotonic() - started
+
+            throttled = response is not None and response.status_code == 429
+            retryable = error is not None or (response is not None and response.status_code in RETRY_STATUS_CODES)
+
+            ep.limiter.release(latency, throttled)
+            ep.breaker.record(not retryable)
+            if throttled:
+                ep.count("throttled")
+
+            if not retryable:
+                return response
+
+            ep.count("failures")
+            if attempt == policy.max_retries:
+                if error is not None:
+                    raise error
+                return response
+
+            ep.count("retries")
+            time.sleep(self._backoff(policy, attempt, response))
+
+    def get(self, endpoint: str, url: str, session=requests, **kwargs) -> requests.Response:
+        return self.request(endpoint, lambda timeout: session.get(url, timeout=timeout, **kwargs))
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            endpoints = list(self._endpoints.values())
+
+        stats = {}
+        for ep in endpoints:
+            with ep.stats_lock:
+                endpoint_stats = dict(ep.stats)
+                endpoint_stats["queue_depth"] = ep.queued
+            endpoint_stats.update(
+                in_flight=ep.limiter.in_flight,
+                concurrency_limit=round(ep.limiter.limit, 2),
+                circuit=ep.breaker.state,
+            )
+            stats[ep.name] = endpoint_stats
+        return stats
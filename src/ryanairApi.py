@@ -1,22 +1,78 @@
-from datetime import datetime
-from typing import List
-from cachetools import TTLCache, cached
-import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple
+import os
 
+from src.fareCache import create_cache, decode_adv_flights, encode_adv_flights
+from src.httpClient import HttpClient
 from src.models.advFlysTo import AdvFlysTo
 from src.models.airport import Airport
 from src.models.bscFlysTo import BscFlysTo
+from src.models.crawlFailure import CrawlFailure
+from src.requestScheduler import EndpointPolicy, RequestScheduler
+from src.singleFlight import single_flight_cached
 
-GET_ALL_ACTIVE_AIRPORTS_URL = "https://www.ryanair.com/api/views/locate/5/airports/en/active"
-GET_ALL_ROUTES_FOR_AIRPORT_URL = "https://www.ryanair.com/api/views/locate/searchWidget/routes/en/airport/{airportCode}"
-GET_DATES_FOR_FLIGHT_URL = "https://www.ryanair.com/api/farfnd/v4/oneWayFares/{origin}/{destination}/availabilities"
-GET_FARE_FOR_NO_ADULTS_URL ="https://www.ryanair.com/api/booking/v4/en-gb/availability?ADT={adult}&DateOut={departDate}&Destination={destination}&Origin={origin}&IncludeConnectingFlights=false&RoundTrip=false&ToUs=AGREED"
-GET_CURRENCY_EXCHANGE_RATE_URL = "https://api.exchangerate-api.com/v4/latest/{from_currency}"
+# Overridable so benchmarks can point the client at a local stand-in
+RYANAIR_BASE_URL = os.getenv("RYANAIR_BASE_URL", "https://www.ryanair.com")
+EXCHANGE_RATE_BASE_URL = os.getenv("EXCHANGE_RATE_BASE_URL", "https://api.exchangerate-api.com")
 
-exchange_rate_cache = TTLCache(maxsize=256, ttl=60 * 60)
-adv_flights_cache = TTLCache(maxsize=2048, ttl=15 * 60)
+GET_ALL_ACTIVE_AIRPORTS_URL = RYANAIR_BASE_URL + "/api/views/locate/5/airports/en/active"
+GET_ALL_ROUTES_FOR_AIRPORT_URL = RYANAIR_BASE_URL + "/api/views/locate/searchWidget/routes/en/airport/{airportCode}"
+GET_DATES_FOR_FLIGHT_URL = RYANAIR_BASE_URL + "/api/farfnd/v4/oneWayFares/{origin}/{destination}/availabilities"
+GET_CHEAPEST_PER_DAY_URL = RYANAIR_BASE_URL + "/api/farfnd/v4/oneWayFares/{origin}/{destination}/cheapestPerDay?outboundMonthOfDate={month}&currency={currency}"
+GET_FARE_FOR_NO_ADULTS_URL = RYANAIR_BASE_URL + "/api/booking/v4/en-gb/availability?ADT={adult}&DateOut={departDate}&Destination={destination}&Origin={origin}&IncludeConnectingFlights=false&RoundTrip=false&ToUs=AGREED"
+GET_CURRENCY_EXCHANGE_RATE_URL = EXCHANGE_RATE_BASE_URL + "/v4/latest/{from_currency}"
 
-@cached(exchange_rate_cache)
+CRAWL_MAX_WORKERS = int(os.getenv("CRAWL_MAX_WORKERS", "16"))
+CRAWL_RATE_LIMIT = float(os.getenv("CRAWL_RATE_LIMIT", "10"))
+FARES_RATE_LIMIT = float(os.getenv("FARES_RATE_LIMIT", "10"))
+FARES_MAX_CONCURRENCY = int(os.getenv("FARES_MAX_CONCURRENCY", "10"))
+# Months ahead, from the current one, whose indicative fares are stored on FLYS_TO (0 disables)
+CRAWL_FARE_MONTHS = int(os.getenv("CRAWL_FARE_MONTHS", "3"))
+REQUEST_TIMEOUT = float(os.getenv("RYANAIR_REQUEST_TIMEOUT", "10"))
+
+# Every upstream call goes through one scheduler, each endpoint with its own budget
+ENDPOINT_POLICIES = {
+    "airports": EndpointPolicy(rate=1, burst=2, max_concurrency=2, timeout=REQUEST_TIMEOUT),
+    "routes": EndpointPolicy(rate=CRAWL_RATE_LIMIT, burst=CRAWL_MAX_WORKERS, max_concurrency=CRAWL_MAX_WORKERS, timeout=REQUEST_TIMEOUT),
+    "dates": EndpointPolicy(rate=CRAWL_RATE_LIMIT, burst=CRAWL_MAX_WORKERS, max_concurrency=CRAWL_MAX_WORKERS, timeout=REQUEST_TIMEOUT),
+    "cheapest_fares": EndpointPolicy(rate=CRAWL_RATE_LIMIT, burst=CRAWL_MAX_WORKERS, max_concurrency=CRAWL_MAX_WORKERS, timeout=REQUEST_TIMEOUT),
+    "fares": EndpointPolicy(rate=FARES_RATE_LIMIT, burst=FARES_MAX_CONCURRENCY, max_concurrency=FARES_MAX_CONCURRENCY, timeout=REQUEST_TIMEOUT),
+    "exchange_rates": EndpointPolicy(rate=1, burst=5, max_concurrency=2, timeout=REQUEST_TIMEOUT),
+}
+request_scheduler = RequestScheduler(ENDPOINT_POLICIES)
+
+# Endpoints share one session, so its pool must hold every endpoint's in-flight requests at once
+HTTP_POOL_SIZE = int(os.getenv(
+    "HTTP_POOL_SIZE",
+    str(sum(policy.max_concurrency for policy in ENDPOINT_POLICIES.values())),
+))
+
+http_client = HttpClient(request_scheduler, pool_size=HTTP_POOL_SIZE)
+
+# In-memory LRU per process, backed by a cache file shared by all workers (see src/fareCache.py)
+exchange_rate_cache = create_cache("exchange_rates", maxsize=256, ttl=60 * 60)
+adv_flights_cache = create_cache(
+    "adv_flights",
+    maxsize=2048,
+    ttl=15 * 60,
+    encode=encode_adv_flights,
+    decode=decode_adv_flights,
+)
+
+def exchange_rate_key(from_currency: str, to_currency: str) -> str:
+    return f"{from_currency}|{to_currency}"
+
+def adv_flights_key(
+    adult: int,
+    departDate: str,
+    origin_airport: str,
+    destination_airport: str,
+    currency: str = "EUR"
+) -> str:
+    return f"{adult}|{departDate}|{origin_airport}|{destination_airport}|{currency}"
+
+@single_flight_cached(exchange_rate_cache, key=exchange_rate_key)
 def get_exchange_rate(from_currency: str, to_currency: str) -> float:
     """
     Fetch exchange rate from one currency to another.
@@ -27,9 +83,7 @@ def get_exchange_rate(from_currency: str, to_currency: str) -> float:
     
     # Example using exchangerate-api.com (free tier available)
     url = GET_CURRENCY_EXCHANGE_RATE_URL.format(from_currency=from_currency)
-    response = requests.get(url)
-    response.raise_for_status()
-    data = response.json()
+    data = http_client.get("exchange_rates", url)
     
     if to_currency not in data.get("rates", {}):
         raise ValueError(f"Currency {to_currency} not found in exchange rates")
@@ -37,15 +91,10 @@ def get_exchange_rate(from_currency: str, to_currency: str) -> float:
     return data["rates"][to_currency]
 
 
-def getActiveAirports() -> List[Airport]:
-    response = requests.get(GET_ALL_ACTIVE_AIRPORTS_URL)
-    response.raise_for_status()
-    
-    data = response.json()
-
+def parseActiveAirports(response) -> List[Airport]:
     airports: List[Airport] = []
 
-    for item in data:
+    for item in response.json():
         airport = Airport(
             code=item["code"],
             name=item["name"],
@@ -58,7 +107,12 @@ def getActiveAirports() -> List[Airport]:
     
     return airports
 
-@cached(adv_flights_cache)
+def getActiveAirports() -> List[Airport]:
+    # Unchanged catalogues come back as a 304 and reuse the parsed list
+    return list(http_client.get("airports", GET_ALL_ACTIVE_AIRPORTS_URL, parse=parseActiveAirports, revalidate=True))
+
+# Concurrent searches often need the same leg, only one thread fetches it
+@single_flight_cached(adv_flights_cache, key=adv_flights_key)
 def getAdvFlights(
     adult: int, 
     departDate: str, 
@@ -73,9 +127,7 @@ def getAdvFlights(
         destination=destination_airport
     )
     
-    response = requests.get(url)
-    response.raise_for_status()
-    data = response.json()
+    data = http_client.get("fares", url)
     
     # Get the response currency
     response_currency = data.get("currency", "EUR")
@@ -135,58 +187,172 @@ def getAdvFlights(
                 )
     return flights_list
 
-def getDestinationsForAirport(airportCode: str, airportList: List[Airport]) -> List[BscFlysTo]:
+def getRoutesForAirport(airportCode: str) -> List[str]:
+    url = GET_ALL_ROUTES_FOR_AIRPORT_URL.format(airportCode=airportCode)
+    return list(http_client.get(
+        "routes",
+        url,
+        parse=lambda response: [item["arrivalAirport"]["code"] for item in response.json()],
+        revalidate=True,
+    ))
+
+def getFlightDates(origin: str, destination: str) -> List[date]:
+    url = GET_DATES_FOR_FLIGHT_URL.format(origin=origin, destination=destination)
+    return list(http_client.get(
+        "dates",
+        url,
+        parse=lambda response: [datetime.strptime(item, "%Y-%m-%d").date() for item in response.json()],
+        revalidate=True,
+    ))
+
+def parseCheapestPerDay(response) -> Dict[date, Tuple[float, str]]:
+    fares: Dict[date, Tuple[float, str]] = {}
+
+    for item in response.json().get("outbound", {}).get("fares", []):
+        price = item.get("price") or {}
+        if item.get("unavailable") or item.get("soldOut") or price.get("value") is None:
+            continue
+        fares[datetime.strptime(item["day"], "%Y-%m-%d").date()] = (price["value"], price.get("currencyCode", "EUR"))
+
+    return fares
+
+def getCheapestFares(origin: str, destination: str, month: date, currency: str = "EUR") -> Dict[date, float]:
+    """Cheapest one-way fare for each day of `month` that has one, in `currency`."""
+    url = GET_CHEAPEST_PER_DAY_URL.format(
+        origin=origin,
+        destination=destination,
+        month=month.replace(day=1).isoformat(),
+        currency=currency,
+    )
+    fares = http_client.get("cheapest_fares", url, parse=parseCheapestPerDay, revalidate=True)
+
+    converted: Dict[date, float] = {}
+    for day, (value, fare_currency) in fares.items():
+        rate = 1.0 if fare_currency == currency else get_exchange_rate(fare_currency, currency)
+        converted[day] = round(value * rate, 2)
+    return converted
+
+def getFlightDatesWithFares(
+    origin: str,
+    destination: str,
+    fare_months: int = CRAWL_FARE_MONTHS,
+) -> Tuple[List[date], Dict[date, float]]:
+    """
+    A route's availability dates, and the indicative fares of those in the
+    next `fare_months` months. A failed fare lookup only loses its fares.
+    """
+    flight_dates = getFlightDates(origin, destination)
+
+    today = date.today()
+    months = sorted({
+        flight_date.replace(day=1)
+        for flight_date in flight_dates
+        if (flight_date.year - today.year) * 12 + flight_date.month - today.month < fare_months
+    })
+
+    fares: Dict[date, float] = {}
+    for month in months:
+        try:
+            fares.update(getCheapestFares(origin, destination, month))
+        except Exception as e:
+            print(f"Warning: Could not fetch fares for {origin}->{destination} in {month:%Y-%m}. Error: {e}")
+
+    return flight_dates, fares
+
+def getDestinationsForAirports(
+    airportCodes: List[str],
+    airportList: List[Airport],
+    max_workers: int = CRAWL_MAX_WORKERS,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    crawled: Optional[Set[Tuple[str, str]]] = None,
+) -> Tuple[List[BscFlysTo], List[CrawlFailure]]:
+    """
+    Crawl the routes of several base airports at once.
+
+    Route lists and availability dates are fetched on one shared thread pool,
+    so `max_workers` caps the number of in-flight requests across all bases.
+    Each direction of a route is only fetched once, even when both ends are
+    bases. Lookups that fail are returned as CrawlFailures instead of
+    aborting the crawl.
+
+    `on_progress(done, total)` is called as each route direction finishes.
+
+    `crawled` carries that dedup across calls: (origin, destination)
+    directions in it are skipped, and every direction looked up here is
+    added to it.
+    """
     # Build internal lookup by code
     airports = {airport.code: airport for airport in airportList}
 
-    url = GET_ALL_ROUTES_FOR_AIRPORT_URL.format(airportCode=airportCode)
-    response = requests.get(url)
-    response.raise_for_status()
-    data = response.json()
+    for airportCode in airportCodes:
+        if airportCode not in airports:
+            raise ValueError(f"Airport {airportCode} not found in the provided list")
 
     flys_to_list: List[BscFlysTo] = []
+    failures: List[CrawlFailure] = []
+    directions = crawled if crawled is not None else set()
+    skipped = len(directions)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        route_futures = {
+            executor.submit(getRoutesForAirport, airportCode): airportCode
+            for airportCode in airportCodes
+        }
+        date_futures = {}
+
+        for future in as_completed(route_futures):
+            airportCode = route_futures[future]
 
-    origin_airport = airports.get(airportCode)
-    if not origin_airport:
-        raise ValueError(f"Airport {airportCode} not found in the provided list")
-
-    for item in data:
-        dest_data = item["arrivalAirport"]
-        dest_code = dest_data["code"]
-
-        destination_airport = airports.get(dest_code)
-        if not destination_airport:
-            print("WARNING aiport not in list")
-            
-        url = GET_DATES_FOR_FLIGHT_URL.format(origin=origin_airport.code, destination=destination_airport.code)
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        
-        for item in data:
-            # Create BscFlysTo object
-            flys_to = BscFlysTo(
-            origin=origin_airport,
-            destination=destination_airport,
-            date=datetime.strptime(item, "%Y-%m-%d").date()
-            )
-            flys_to_list.append(flys_to)
-        
-        temp_orgin = destination_airport # Reverse
-        temp_destination = origin_airport # Reverse
-        
-        url = GET_DATES_FOR_FLIGHT_URL.format(origin=temp_orgin.code, destination=temp_destination.code)
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        
-        for item in data:
-            # Create BscFlysTo object            
-            flys_to = BscFlysTo(
-            origin=temp_orgin,
-            destination=temp_destination,
-            date=datetime.strptime(item, "%Y-%m-%d").date(),
-            )
-            flys_to_list.append(flys_to)
-
-    return flys_to_list
\ No newline at end of file
+            try:
+                dest_codes = future.result()
+            except Exception as e:
+                failures.append(CrawlFailure(origin=airportCode, destination=None, error=str(e)))
+                continue
+
+            for dest_code in dest_codes:
+                if dest_code not in airports:
+                    print(f"WARNING airport {dest_code} not in list, skipping route from {airportCode}")
+                    failures.append(CrawlFailure(origin=airportCode, destination=dest_code, error="Unknown airport"))
+                    continue
+
+                # Outbound and reverse direction
+                for origin, destination in ((airportCode, dest_code), (dest_code, airportCode)):
+                    if (origin, destination) in directions:
+                        continue
+                    directions.add((origin, destination))
+
+                    date_future = executor.submit(getFlightDatesWithFares, origin, destination)
+                    date_futures[date_future] = (origin, destination)
+
+        if on_progress:
+            on_progress(0, len(date_futures))
+
+        for done, future in enumerate(as_completed(date_futures), 1):
+            origin, destination = date_futures[future]
+            if on_progress:
+                on_progress(done, len(date_futures))
+
+            try:
+                flight_dates, fares = future.result()
+            except Exception as e:
+                failures.append(CrawlFailure(origin=origin, destination=destination, error=str(e)))
+                continue
+
+            for flight_date in flight_dates:
+                flys_to_list.append(
+                    BscFlysTo(
+                        origin=airports[origin],
+                        destination=airports[destination],
+                        date=flight_date,
+                        fare=fares.get(flight_date),
+                    )
+                )
+
+    if failures:
+        print(f"WARNING: {len(failures)} of {len(route_futures) + len(directions) - skipped} lookups failed")
+
+    return flys_to_list, failures
+
+def getDestinationsForAirport(airportCode: str, airportList: List[Airport]) -> List[BscFlysTo]:
+    flys_to_list, _ = getDestinationsForAirports([airportCode], airportList)
+    return flys_to_list
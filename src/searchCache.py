@@ -0,0 +1,135 @@
+from datetime import date
+from typing import Callable, List, Optional
+import json
+import threading
+import time
+
+from cachetools import TTLCache
+
+from src.graphRepository import GraphRepository
+from src.models.neo4jResult import Neo4jResultFormatted
+from src.models.trip import Trip
+
+
+def canonical_search(search: dict) -> str:
+    """
+    Cache key for query_flights arguments that ignores list order and
+    duplicates, so equivalent form submissions share an entry.
+    """
+    def normalise(value):
+        if isinstance(value, date):
+            return value.isoformat()
+        if isinstance(value, (list, tuple, set)):
+            return sorted({normalise(item) for item in value})
+        if isinstance(value, str):
+            return value.strip()
+        return value
+
+    return json.dumps({name: normalise(value) for name, value in search.items()}, sort_keys=True)
+
+
+class SearchResultCache:
+    """
+    Caches candidate rows and assembled trips per canonical search.
+
+    Entries are keyed by the graph version stamp, so anything written to the
+    graph (see GraphRepository.bump_graph_version) makes older entries
+    unreachable. The version is re-read at most every `version_check_interval`
+    seconds. Candidates only depend on the graph and live for
+    `candidate_ttl`, trips also depend on fares and live for `trip_ttl`.
+    """
+
+    def __init__(
+        self,
+        repository: GraphRepository,
+        candidate_ttl: float = 3600,
+        trip_ttl: float = 300,
+        maxsize: int = 256,
+        version_check_interval: float = 5,
+    ):
+        self.repository = repository
+        self.version_check_interval = version_check_interval
+        self._candidates = TTLCache(maxsize=maxsize, ttl=candidate_ttl)
+        self._trips = TTLCache(maxsize=maxsize, ttl=trip_ttl)
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._version_checked = 0.0
+        self._stats = {"candidate_hits": 0, "candidate_misses": 0, "trip_hits": 0, "trip_misses": 0}
+
+    def graph_version(self) -> Optional[str]:
+        now = time.monotonic()
+        with self._lock:
+            if now - self._version_checked < self.version_check_interval:
+                return self._version
+
+        version = self.repository.getGraphVersion()
+        with self._lock:
+            if version != self._version:
+                # Old entries could never be hit again, free them now
+                self._candidates.clear()
+                self._trips.clear()
+            self._version = version
+            self._version_checked = now
+        return version
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            self._stats[counter] += 1
+
+    def get_candidates(
+        self,
+        search: dict,
+        compute: Callable[[], List[Neo4jResultFormatted]],
+    ) -> List[Neo4jResultFormatted]:
+        key = (self.graph_version(), canonical_search(search))
+        with self._lock:
+            cached = self._candidates.get(key)
+        if cached is not None:
+            self._count("candidate_hits")
+            return cached
+
+        self._count("candidate_misses")
+        results = compute()
+        with self._lock:
+            self._candidates[key] = results
+        return results
+
+    def get_trips(
+        self,
+        search: dict,
+        adults: int,
+        sort_key: str,
+        limit: Optional[int],
+        compute: Callable[[], List[Trip]],
+    ) -> List[Trip]:
+        key = (self.graph_version(), canonical_search(search), adults, sort_key)
+        with self._lock:
+            cached = self._trips.get(key)
+
+        # A ranking kept to a larger limit (or one that found fewer trips than its limit) covers this one
+        if cached is not None:
+            cached_limit, trips = cached
+            if cached_limit is None or (limit is not None and limit <= cached_limit) or len(trips) < cached_limit:
+                self._count("trip_hits")
+                return trips if limit is None else trips[:limit]
+
+        self._count("trip_misses")
+        trips = compute()
+        with self._lock:
+            self._trips[key] = (limit, trips)
+        return trips
+
+    def clear(self) -> None:
+        with self._lock:
+            self._candidates.clear()
+            self._trips.clear()
+            self._version_checked = 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(
+                self._stats,
+                graph_version=self._version,
+                candidates=len(self._candidates),
+                trips=len(self._trips),
+            )
@@ -0,0 +1,237 @@
+from datetime import date
+from typing import Dict, List, Optional
+import threading
+import time
+
+from src.graphRepository import GraphRepository
+from src.models.airport import Airport
+from src.models.neo4jResult import Neo4jResultFormatted
+from src.spatialIndex import AirportSpatialIndex
+
+
+class _RouteIndex:
+    """
+    Immutable snapshot of the FLYS_TO graph.
+
+    Airports get integer ids and every route stores its operating dates as a
+    Python int bitset, where bit i means the route flies on epoch + i days.
+    Indicative fares are kept per route as {day offset: fare}.
+    """
+
+    def __init__(
+        self,
+        airports: List[Airport],
+        route_dates: Dict[tuple, List[date]],
+        route_fares: Optional[Dict[tuple, Dict[date, float]]] = None,
+    ):
+        self.codes = [airport.code for airport in airports]
+        self.ids = {code: i for i, code in enumerate(self.codes)}
+        self.countries = [airport.countryName for airport in airports]
+        self.spatial_index = AirportSpatialIndex(airports)
+
+        all_dates = [d for dates in route_dates.values() for d in dates]
+        self.epoch = min(all_dates).toordinal() if all_dates else 0
+
+        # routes[origin id][destination id] -> date bitset
+        self.routes: List[Dict[int, int]] = [{} for _ in self.codes]
+        for (origin, destination), dates in route_dates.items():
+            if origin not in self.ids or destination not in self.ids:
+                continue
+            self.routes[self.ids[origin]][self.ids[destination]] = self.mask(dates)
+
+        # incoming[destination id] -> origin ids, for searching backwards from destinations
+        self.incoming: List[List[int]] = [[] for _ in self.codes]
+        for origin_id, destinations in enumerate(self.routes):
+            for destination_id in destinations:
+                self.incoming[destination_id].append(origin_id)
+
+        # fares[origin id][destination id] -> {day offset: fare}, only routes with fares
+        self.fares: List[Dict[int, Dict[int, float]]] = [{} for _ in self.codes]
+        for (origin, destination), fares in (route_fares or {}).items():
+            if origin not in self.ids or destination not in self.ids:
+                continue
+            self.fares[self.ids[origin]][self.ids[destination]] = {
+                d.toordinal() - self.epoch: fare for d, fare in fares.items() if d.toordinal() >= self.epoch
+            }
+
+    def mask(self, dates) -> int:
+        bits = 0
+        for d in dates:
+            offset = d.toordinal() - self.epoch
+            if offset >= 0:
+                bits |= 1 << offset
+        return bits
+
+    def dates(self, bits: int):
+        while bits:
+            low = bits & -bits
+            yield date.fromordinal(self.epoch + low.bit_length() - 1)
+            bits ^= low
+
+    def over_budget(self, fares: Dict[int, float], max_fare: float) -> int:
+        """Bitset of the days whose fare alone is above `max_fare`."""
+        bits = 0
+        for offset, fare in fares.items():
+            if fare > max_fare:
+                bits |= 1 << offset
+        return bits
+
+
+class FlightSearchEngine:
+    """
+    In-process alternative to GraphRepository.query_flights.
+
+    The route/date graph is loaded from Neo4j (still the system of record)
+    into per-route date bitsets, so a search is a few AND and shift operations
+    per candidate route instead of a Cypher pattern over every FLYS_TO edge.
+    Call reload() after ingestion; snapshots older than `max_age` seconds
+    are also reloaded on the next search.
+    """
+
+    def __init__(self, repository: GraphRepository, max_age: Optional[float] = None):
+        self.repository = repository
+        self.max_age = max_age
+        self._index: Optional[_RouteIndex] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def reload(self) -> None:
+        started = time.perf_counter()
+        index = _RouteIndex(
+            self.repository.getAirports(),
+            self.repository.getRouteDates(),
+            self.repository.getRouteFares(),
+        )
+
+        # Swap in the new snapshot in one assignment, searches keep the old one meanwhile
+        self._index = index
+        self._loaded_at = time.monotonic()
+        print(f"Search engine loaded {len(index.codes)} airports in {time.perf_counter() - started:.2f}s")
+
+    def _is_stale(self) -> bool:
+        if self._index is None:
+            return True
+        return self.max_age is not None and time.monotonic() - self._loaded_at > self.max_age
+
+    def _current_index(self) -> _RouteIndex:
+        if self._is_stale():
+            with self._lock:
+                if self._is_stale():
+                    self.reload()
+        return self._index
+
+    def route_index(self) -> _RouteIndex:
+        """The current snapshot, for other searches over the same route/date graph."""
+        return self._current_index()
+
+    def invalidate(self) -> None:
+        """Drop the snapshot so the next search loads a fresh one."""
+        self._index = None
+
+    def query_flights(
+            self,
+            origin_departure_airports: list[str],
+            origin_arrival_airports: list[str],
+            r1_dates: list[date],
+            r2_dates: list[date],
+            lengths_of_stay: list[int],
+            blacklist_countries: list[str] = None,
+            whitelist_countries: list[str] = None,
+            same_airport_return: bool = True,
+            max_distance: int = None,
+            max_total_fare: float = None,
+        ) -> list[Neo4jResultFormatted]:
+        index = self._current_index()
+
+        blacklist = set(blacklist_countries or [])
+        whitelist = set(whitelist_countries or [])
+
+        def allowed(airport_id: int) -> bool:
+            country = index.countries[airport_id]
+            if country in blacklist:
+                return False
+            return not whitelist or country in whitelist
+
+        r1_mask = index.mask(r1_dates)
+        r2_mask = index.mask(r2_dates)
+        stays = sorted({days for days in lengths_of_stay if days >= 0})
+        # Repeated codes would repeat rows, build_flights_query drops them the same way
+        origin_departure_airports = list(dict.fromkeys(origin_departure_airports))
+        arrival_ids = list(dict.fromkeys(index.ids[code] for code in origin_arrival_airports if code in index.ids))
+
+        # Days each route can fly within the budget, worked out once per route per query
+        in_budget: Dict[tuple, int] = {}
+
+        def within_budget(origin_id: int, destination_id: int, bits: int) -> int:
+            if max_total_fare is None or not bits:
+                return bits
+            key = (origin_id, destination_id)
+            if key not in in_budget:
+                fares = index.fares[origin_id].get(destination_id)
+                in_budget[key] = ~index.over_budget(fares, max_total_fare) if fares else -1
+            return bits & in_budget[key]
+
+        results: list[Neo4jResultFormatted] = []
+
+        for origin_code in origin_departure_airports:
+            o1 = index.ids.get(origin_code)
+            if o1 is None:
+                continue
+
+            if same_airport_return:
+                if o1 not in arrival_ids:
+                    continue
+                returns_to = [o1]
+            else:
+                returns_to = arrival_ids
+
+            for d1, outbound_bits in index.routes[o1].items():
+                outbound_bits = within_budget(o1, d1, outbound_bits & r1_mask)
+                outbound_fares = index.fares[o1].get(d1, {})
+                if not outbound_bits or not allowed(d1):
+                    continue
+
+                # Return from the same airport, or from any allowed airport nearby
+                return_from = [(d1, None)]
+                if max_distance is not None:
+                    return_from += [
+                        (index.ids[airport.code], distance)
+                        for airport, distance in index.spatial_index.airports_within(index.codes[d1], max_distance)
+                        if allowed(index.ids[airport.code])
+                    ]
+
+                for d2, distance in return_from:
+                    for o2 in returns_to:
+                        return_bits = within_budget(d2, o2, index.routes[d2].get(o2, 0) & r2_mask)
+                        if not return_bits:
+                            continue
+                        return_fares = index.fares[d2].get(o2, {})
+
+                        for days in stays:
+                            # Shift outbound dates forward by the stay and keep those with a return flight
+                            for return_date in index.dates((outbound_bits << days) & return_bits):
+                                offset = return_date.toordinal() - index.epoch
+                                outbound_fare = outbound_fares.get(offset - days)
+                                return_fare = return_fares.get(offset)
+                                # Unknown fares count as free, as in the Cypher query
+                                if max_total_fare is not None and (outbound_fare or 0) + (return_fare or 0) > max_total_fare:
+                                    continue
+
+                                results.append(
+                                    Neo4jResultFormatted(
+                                        origin_departure_airport_code=index.codes[o1],
+                                        destination_arrival_airport_code=index.codes[d1],
+                                        destination_departure_airport_code=index.codes[d2],
+                                        origin_arrival_airport_code=index.codes[o2],
+                                        origin_departure_date=date.fromordinal(return_date.toordinal() - days),
+                                        destination_departure=return_date,
+                                        travel_distance_km=distance,
+                                        indicative_fare=(
+                                            outbound_fare + return_fare
+                                            if outbound_fare is not None and return_fare is not None
+                                            else None
+                                        ),
+                                    )
+                                )
+
+        return results
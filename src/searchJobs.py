@@ -0,0 +1,187 @@
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+import threading
+import time
+import uuid
+
+from src.models.trip import Trip
+
+FINISHED_STATES = ("done", "failed", "cancelled", "timed_out")
+
+
+class JobRejected(Exception):
+    pass
+
+
+@dataclass
+class SearchJob:
+    search: dict
+    adults: int
+    sort_key: str
+    limit: Optional[int]
+    form: Any = None                       # submitted form, for rendering the results page
+    time_budget: Optional[float] = None    # seconds from start
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "queued"
+    stage: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    results: int = 0
+    legs_done: int = 0
+    legs_total: int = 0
+    trips_found: int = 0                   # trips kept so far while ranking
+    trips: List[Trip] = field(default_factory=list)
+    error: Optional[str] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def deadline_passed(self) -> bool:
+        return (
+            self.time_budget is not None
+            and self.started_at is not None
+            and time.time() - self.started_at > self.time_budget
+        )
+
+    def should_stop(self) -> bool:
+        return self.cancel_event.is_set() or self.deadline_passed()
+
+    def check_stop(self) -> None:
+        """Raise CancelledError between stages once the job is cancelled or over budget."""
+        if self.should_stop():
+            raise CancelledError(f"Stopped before {self.stage}")
+
+    def set_progress(self, done: int, total: int) -> None:
+        self.legs_done = done
+        self.legs_total = total
+
+    def set_trips_found(self, count: int) -> None:
+        self.trips_found = count
+
+    def to_dict(self) -> dict:
+        end = self.finished_at or time.time()
+        return {
+            "id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "results": self.results,
+            "legs_done": self.legs_done,
+            "legs_total": self.legs_total,
+            "trips": len(self.trips),
+            "trips_found": self.trips_found,
+            "error": self.error,
+            "queued_seconds": round((self.started_at or end) - self.created_at, 3),
+            "running_seconds": round(end - self.started_at, 3) if self.started_at else 0.0,
+        }
+
+
+class SearchJobManager:
+    """
+    Runs searches on a bounded worker pool so a broad search does not hold a
+    web worker for its whole duration.
+
+    At most `max_workers` jobs run at once and `max_queued` more may wait;
+    beyond that submit() raises JobRejected. Each job is cancelled once it
+    has run for `time_budget` seconds, checked between stages and while
+    legs are fetched and trips ranked; a graph query already running is
+    not interrupted. Finished jobs are kept for `retention` seconds so
+    clients can fetch their results.
+
+    Jobs live in this process only. Behind several web worker processes,
+    status, event and trip requests must reach the worker that accepted
+    the job, so run one worker or route /search_jobs/<id> stickily.
+    """
+
+    def __init__(
+        self,
+        run: Callable[[SearchJob], List[Trip]],
+        max_workers: int = 4,
+        max_queued: int = 16,
+        time_budget: Optional[float] = 120,
+        retention: float = 600,
+    ):
+        self.run = run
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.time_budget = time_budget
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="search-job")
+        self._jobs: Dict[str, SearchJob] = {}
+        self._lock = threading.Lock()
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.retention
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and job.finished_at < cutoff:
+                del self._jobs[job_id]
+
+    def submit(self, search: dict, adults: int, sort_key: str, limit: Optional[int], form=None) -> SearchJob:
+        with self._lock:
+            self._prune()
+            active = sum(1 for job in self._jobs.values() if not job.finished)
+            if active >= self.max_workers + self.max_queued:
+                raise JobRejected(f"{active} search jobs already queued or running")
+
+            job = SearchJob(
+                search=search,
+                adults=adults,
+                sort_key=sort_key,
+                limit=limit,
+                form=form,
+                time_budget=self.time_budget,
+            )
+            self._jobs[job.id] = job
+
+        self._executor.submit(self._execute, job)
+        return job
+
+    def _finish(self, job: SearchJob, status: str, error: Optional[str] = None) -> None:
+        job.status = status
+        job.stage = status
+        job.error = error
+        job.finished_at = time.time()
+
+    def _execute(self, job: SearchJob) -> None:
+        if job.cancel_event.is_set():
+            self._finish(job, "cancelled")
+            return
+
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            trips = self.run(job)
+        except CancelledError:
+            if job.cancel_event.is_set():
+                self._finish(job, "cancelled")
+            else:
+                self._finish(job, "timed_out", f"Exceeded the {self.time_budget}s time budget")
+            return
+        except Exception as e:
+            print(f"Warning: Search job {job.id} failed. Error: {e}")
+            self._finish(job, "failed", str(e))
+            return
+
+        job.trips = trips
+        self._finish(job, "done")
+
+    def get(self, job_id: str) -> Optional[SearchJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[SearchJob]:
+        job = self.get(job_id)
+        if job is not None and not job.finished:
+            job.cancel_event.set()
+        return job
+
+    def stats(self) -> dict:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        counts: Dict[str, int] = {}
+        for job in jobs:
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {"max_workers": self.max_workers, "max_queued": self.max_queued, "jobs": counts}
@@ -0,0 +1,168 @@
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, Tuple
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls for the same key into one: the first caller runs
+    the function, later callers block until it finishes and share its result
+    (or its exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Return (result, shared), where shared means another caller did the work."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.errors = 0
+
+    def add(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def to_dict(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "refreshes": self.refreshes,
+                "errors": self.errors,
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.hits = self.misses = self.coalesced = self.refreshes = self.errors = 0
+
+
+def single_flight_cached(cache, key: Callable[..., Hashable], lock=None):
+    """
+    Like cachetools.cached, but concurrent misses for the same key wait on one
+    in-flight call instead of each calling the function.
+
+    `cache` must be thread-safe unless a `lock` is given to guard it. The
+    wrapper exposes cache_info() with hit, miss (upstream calls), coalesced
+    (duplicate calls suppressed), refresh and error counts, cache_clear(), and
+    refresh(*args) to fetch a key ahead of its expiry.
+    """
+    def decorator(func):
+        flight = SingleFlight()
+        stats = CacheStats()
+
+        def lookup(k):
+            if lock is None:
+                return cache[k]
+            with lock:
+                return cache[k]
+
+        def store(k, value):
+            try:
+                if lock is None:
+                    cache[k] = value
+                else:
+                    with lock:
+                        cache[k] = value
+            except ValueError:
+                pass  # value too large
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            k = key(*args, **kwargs)
+            try:
+                value = lookup(k)
+                stats.add("hits")
+                return value
+            except KeyError:
+                pass
+
+            def load():
+                # A flight for this key may have finished since the lookup above
+                try:
+                    return lookup(k), True
+                except KeyError:
+                    pass
+                value = func(*args, **kwargs)
+                store(k, value)
+                return value, False
+
+            try:
+                (value, cached), shared = flight.do(k, load)
+            except Exception:
+                stats.add("errors")
+                raise
+
+            stats.add("coalesced" if shared else "hits" if cached else "misses")
+            return value
+
+        def refresh(*args, **kwargs):
+            """Call the function even on a hit and store the new value."""
+            k = key(*args, **kwargs)
+
+            def load():
+                # Same (value, cached) shape as the wrapper's load, either may join the other's flight
+                value = func(*args, **kwargs)
+                store(k, value)
+                return value, False
+
+            try:
+                (value, _), _ = flight.do(k, load)
+            except Exception:
+                stats.add("errors")
+                raise
+            stats.add("refreshes")
+            return value
+
+        def cache_clear():
+            if lock is None:
+                cache.clear()
+            else:
+                with lock:
+                    cache.clear()
+            stats.reset()
+
+        wrapper.cache_info = stats.to_dict
+        wrapper.cache_clear = cache_clear
+        wrapper.refresh = refresh
+        return wrapper
+
+    return decorator
@@ -0,0 +1,131 @@
+from collections import defaultdict
+import math
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from cachetools import LRUCache
+
+from src.models.airport import Airport
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+HALF_CIRCUMFERENCE_KM = math.pi * EARTH_RADIUS_KM
+
+# Neighbour maps kept per index; radii come from user input, so the cache is bounded
+NEIGHBOUR_MAP_CACHE_SIZE = 8
+
+
+def _haversine(lat1, lon1, lat2, lon2) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class AirportSpatialIndex:
+    """
+    Fixed-size lat/lon grid over the airport catalogue.
+
+    Radius queries only look at the grid cells overlapping the search circle's
+    bounding box and then check exact haversine distances, so a lookup touches
+    a handful of airports instead of the whole catalogue.
+    """
+
+    def __init__(self, airports: List[Airport], cell_size_deg: float = 1.0):
+        self.cell_size_deg = cell_size_deg
+        self.columns = math.ceil(360 / cell_size_deg)
+        self.airports: Dict[str, Airport] = {airport.code: airport for airport in airports}
+        self.cells: Dict[Tuple[int, int], List[Airport]] = defaultdict(list)
+        self._neighbour_maps: LRUCache = LRUCache(maxsize=NEIGHBOUR_MAP_CACHE_SIZE)
+        self._neighbour_maps_lock = threading.Lock()
+
+        for airport in self.airports.values():
+            self.cells[self._cell(airport.latitude, airport.longitude)].append(airport)
+
+    def __len__(self) -> int:
+        return len(self.airports)
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        row = math.floor(latitude / self.cell_size_deg)
+        column = math.floor((longitude + 180) / self.cell_size_deg) % self.columns
+        return row, column
+
+    def _candidates(self, latitude: float, longitude: float, radius_km: float):
+        lat_span = radius_km / KM_PER_DEGREE
+        min_row = math.floor((latitude - lat_span) / self.cell_size_deg)
+        max_row = math.floor((latitude + lat_span) / self.cell_size_deg)
+
+        # Longitude degrees shrink towards the poles, so widen the box there
+        widest_lat = min(90.0, abs(latitude) + lat_span)
+        cos_lat = math.cos(math.radians(widest_lat))
+        if cos_lat < 1e-6 or radius_km / (KM_PER_DEGREE * cos_lat) >= 180:
+            columns = range(self.columns)
+        else:
+            lon_span = radius_km / (KM_PER_DEGREE * cos_lat)
+            first = math.floor((longitude - lon_span + 180) / self.cell_size_deg)
+            last = math.floor((longitude + lon_span + 180) / self.cell_size_deg)
+            columns = [column % self.columns for column in range(first, last + 1)]
+
+        for row in range(min_row, max_row + 1):
+            for column in columns:
+                yield from self.cells.get((row, column), ())
+
+    def within(self, latitude: float, longitude: float, radius_km: float) -> List[Tuple[Airport, float]]:
+        """Airports within `radius_km` of a point, closest first."""
+        matches = []
+
+        for airport in self._candidates(latitude, longitude, radius_km):
+            distance = _haversine(latitude, longitude, airport.latitude, airport.longitude)
+            if distance < radius_km:
+                matches.append((airport, distance))
+
+        matches.sort(key=lambda match: match[1])
+        return matches
+
+    def airports_within(self, code: str, radius_km: float) -> List[Tuple[Airport, float]]:
+        """Other airports within `radius_km` of the airport `code`, closest first."""
+        origin = self.airports.get(code)
+        if origin is None:
+            return []
+
+        return [
+            (airport, distance)
+            for airport, distance in self.within(origin.latitude, origin.longitude, radius_km)
+            if airport.code != code
+        ]
+
+    def nearest_airports(self, code: str, k: int, max_radius_km: Optional[float] = None) -> List[Tuple[Airport, float]]:
+        """The `k` airports closest to the airport `code`, optionally capped by distance."""
+        radius_km = 100.0
+        limit = min(max_radius_km or HALF_CIRCUMFERENCE_KM, HALF_CIRCUMFERENCE_KM)
+
+        # Grow the search circle until it holds k airports or covers the limit
+        while True:
+            radius_km = min(radius_km, limit)
+            matches = self.airports_within(code, radius_km)
+            if len(matches) >= k or radius_km >= limit:
+                return matches[:k]
+            radius_km *= 2
+
+    def neighbour_map(self, radius_km: float) -> Dict[str, List[Dict]]:
+        """
+        For every airport, the other airports within `radius_km`, shaped as a
+        Cypher parameter: {code: [{code, distance}, ...]}.
+        """
+        with self._neighbour_maps_lock:
+            cached = self._neighbour_maps.get(radius_km)
+        if cached is not None:
+            return cached
+
+        neighbours = {}
+
+        for code in self.airports:
+            matches = self.airports_within(code, radius_km)
+            if matches:
+                neighbours[code] = [
+                    {"code": airport.code, "distance": distance}
+                    for airport, distance in matches
+                ]
+
+        with self._neighbour_maps_lock:
+            self._neighbour_maps[radius_km] = neighbours
+        return neighbours
@@ -0,0 +1,100 @@
+from typing import Dict, Iterable, List, Optional
+import base64
+import hashlib
+import json
+
+from src.models.airport import Airport
+from src.models.trip import Trip
+
+TRIP_COLUMNS = (
+    "origin_departure",        # airport index
+    "destination_arrival",     # airport index
+    "destination_departure",   # airport index
+    "origin_arrival",          # airport index
+    "destination",
+    "fare",
+    "distance",
+    "outbound_departure",
+    "outbound_arrival",
+    "return_departure",
+    "return_arrival",
+)
+
+
+class AirportDictionary:
+    """
+    Airports sorted by code, sent once per search so trips can refer to
+    them by position instead of repeating names and coordinates.
+    """
+
+    def __init__(self, airports: Iterable[Airport]):
+        self.airports = sorted(airports, key=lambda airport: airport.code)
+        self.index = {airport.code: i for i, airport in enumerate(self.airports)}
+
+    def ref(self, code: str) -> Optional[int]:
+        return self.index.get(code)
+
+    def to_columns(self) -> Dict[str, list]:
+        return {
+            "code": [airport.code for airport in self.airports],
+            "name": [airport.name for airport in self.airports],
+            "country": [airport.countryName for airport in self.airports],
+            "lat": [airport.latitude for airport in self.airports],
+            "lon": [airport.longitude for airport in self.airports],
+        }
+
+
+def _time(value) -> Optional[str]:
+    return value.isoformat(timespec="minutes") if value else None
+
+
+def trip_columns(trips: List[Trip], airports: AirportDictionary) -> Dict[str, list]:
+    """One list per TRIP_COLUMNS entry, row i of every list describing trips[i]."""
+    return {
+        "origin_departure": [airports.ref(trip.originDepartureAirportName) for trip in trips],
+        "destination_arrival": [airports.ref(trip.destinationArrivalAirportName) for trip in trips],
+        "destination_departure": [airports.ref(trip.destinationDepartureAirportName) for trip in trips],
+        "origin_arrival": [airports.ref(trip.originArrivalAirportName) for trip in trips],
+        "destination": [trip.destination for trip in trips],
+        "fare": [round(trip.fullFare, 2) for trip in trips],
+        "distance": [round(trip.distance, 1) if trip.distance is not None else None for trip in trips],
+        "outbound_departure": [_time(trip.originDepartureTime) for trip in trips],
+        "outbound_arrival": [_time(trip.destinationArrivalTime) for trip in trips],
+        "return_departure": [_time(trip.destinationDepartureTime) for trip in trips],
+        "return_arrival": [_time(trip.originArrivalTime) for trip in trips],
+    }
+
+
+def filter_trips(
+    trips: List[Trip],
+    max_fare: Optional[float] = None,
+    destinations: Optional[List[str]] = None,
+) -> List[Trip]:
+    if max_fare is None and not destinations:
+        return trips
+
+    wanted = set(destinations or [])
+    return [
+        trip for trip in trips
+        if (max_fare is None or trip.fullFare <= max_fare)
+        and (not wanted or trip.destinationArrivalAirportName in wanted or trip.destinationDepartureAirportName in wanted)
+    ]
+
+
+def query_fingerprint(*parts) -> str:
+    return hashlib.blake2b(json.dumps(parts, sort_keys=True, default=str).encode(), digest_size=8).hexdigest()
+
+
+def encode_cursor(offset: int, fingerprint: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([offset, fingerprint]).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, fingerprint: str) -> int:
+    """Offset stored in `cursor`. Raises ValueError for a cursor from another query."""
+    try:
+        offset, cursor_fingerprint = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Malformed cursor") from e
+    if cursor_fingerprint != fingerprint or not isinstance(offset, int) or offset < 0:
+        raise ValueError("Cursor does not belong to this search")
+    return offset
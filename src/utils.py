@@ -1,16 +1,43 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ThreadPoolExecutor, wait
+import heapq
 import math
-from typing import Dict, List
+import os
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
+import numpy as np
+import requests
 
+from src.metrics import fetch_legs_pending, log_event, search_stage_seconds
+from src.models.advFlysTo import AdvFlysTo
 from src.models.landDistance import landDistance
 from src.models.airport import Airport
 from src.models.neo4jResult import Neo4jResultFormatted
 from src.models.trip import Trip
+from src.requestScheduler import CircuitOpenError
 from src.ryanairApi import getAdvFlights
 
 MAX_WORKERS = 10
 
+# How often a running fetch checks whether it should stop, in seconds
+STOP_CHECK_INTERVAL = 0.5
+# and how many candidate rows trip assembly ranks between checks
+STOP_CHECK_RESULTS = 500
+
+# What one leg's fare lookup can fail with: HTTP errors after retries, an open breaker, a malformed payload
+LEG_ERRORS = (requests.RequestException, CircuitOpenError, ValueError, KeyError, IndexError)
+
+# (origin code, destination code, YYYY-MM-DD)
+Leg = Tuple[str, str, str]
+
+SORT_KEYS = ("fare", "distance", "departure")
+
+EARTH_RADIUS_KM = 6371.0
+
+# Only airport pairs closer than this get a DISTANCE_TO edge at ingest time
+MAX_LAND_DISTANCE_KM = float(os.getenv("MAX_LAND_DISTANCE_KM", "300"))
+DISTANCE_BLOCK_SIZE = 512
+
 @staticmethod
 def haversine(lat1, lon1, lat2, lon2) -> float:
     # Radius of the Earth in kilometers
@@ -35,25 +62,62 @@ def haversine(lat1, lon1, lat2, lon2) -> float:
 
     return distance
 
+def distanceMatrix(
+    airports: List[Airport],
+    max_distance: Optional[float] = MAX_LAND_DISTANCE_KM,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Haversine distances between every ordered pair of airports, keeping only
+    pairs within `max_distance` km (all pairs when None).
+
+    Returns parallel arrays (origin index, destination index, distance km).
+    Rows are processed in blocks so peak memory stays proportional to the
+    block size and the number of kept pairs rather than n².
+    """
+    lat = np.radians(np.array([airport.latitude for airport in airports], dtype=np.float64))
+    lon = np.radians(np.array([airport.longitude for airport in airports], dtype=np.float64))
+    cos_lat = np.cos(lat)
+
+    origins, destinations, distances = [], [], []
+
+    for start in range(0, len(airports), DISTANCE_BLOCK_SIZE):
+        block = slice(start, start + DISTANCE_BLOCK_SIZE)
+
+        dlat = lat[None, :] - lat[block, None]
+        dlon = lon[None, :] - lon[block, None]
+        a = np.sin(dlat / 2) ** 2 + cos_lat[block, None] * cos_lat[None, :] * np.sin(dlon / 2) ** 2
+        a = np.clip(a, 0.0, 1.0)
+        block_distances = EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+        rows = np.arange(start, start + block_distances.shape[0])
+        keep = rows[:, None] != np.arange(len(airports))[None, :]
+        if max_distance is not None:
+            keep &= block_distances < max_distance
+
+        block_origins, block_destinations = np.nonzero(keep)
+        origins.append(block_origins + start)
+        destinations.append(block_destinations)
+        distances.append(block_distances[keep])
+
+    if not origins:
+        empty = np.array([], dtype=np.intp)
+        return empty, empty, np.array([], dtype=np.float64)
+
+    return np.concatenate(origins), np.concatenate(destinations), np.concatenate(distances)
+
 @staticmethod
-def distanceForEachAirport(airports: List[Airport]) -> List[landDistance]:
-    distances: List[landDistance] = []
-    
-    for origin_airport in airports:
-        
-        for destination_airport in airports:
-            if origin_airport == destination_airport:
-                continue
-            
-            distances.append(
-                        landDistance(
-                            origin=origin_airport,
-                            destination=destination_airport,
-                            distance=haversine(origin_airport.latitude, origin_airport.longitude, destination_airport.latitude, destination_airport.longitude)
-                        )
-                    )
-        
-    return distances
+def distanceForEachAirport(
+    airports: List[Airport],
+    max_distance: Optional[float] = MAX_LAND_DISTANCE_KM,
+) -> Iterator[landDistance]:
+    origins, destinations, distances = distanceMatrix(airports, max_distance)
+
+    for origin, destination, distance in zip(origins.tolist(), destinations.tolist(), distances.tolist()):
+        yield landDistance(
+            origin=airports[origin],
+            destination=airports[destination],
+            distance=distance,
+        )
 
 def neo4j_date_to_str(d) -> str:
     """Convert neo4j.time.Date → YYYY-MM-DD"""
@@ -62,11 +126,136 @@ def neo4j_date_to_str(d) -> str:
 def get_airports_by_codes(airport_codes, airports):
     return [airport for airport in airports if airport.code in airport_codes]
 
+def outbound_leg(result: Neo4jResultFormatted) -> Leg:
+    return (
+        result.origin_departure_airport_code,
+        result.destination_arrival_airport_code,
+        neo4j_date_to_str(result.origin_departure_date),
+    )
+
+def return_leg(result: Neo4jResultFormatted) -> Leg:
+    return (
+        result.destination_departure_airport_code,
+        result.origin_arrival_airport_code,
+        neo4j_date_to_str(result.destination_departure),
+    )
+
+def plan_legs(results: List[Neo4jResultFormatted]) -> Set[Leg]:
+    """Unique (origin, destination, date) legs needed to price every result."""
+    legs: Set[Leg] = set()
+    for result in results:
+        legs.add(outbound_leg(result))
+        legs.add(return_leg(result))
+    return legs
+
+def fetch_legs(
+    legs: Iterable[Leg],
+    adults: int = 1,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    failed: Optional[Set[Leg]] = None,
+) -> Dict[Leg, List[AdvFlysTo]]:
+    """
+    Fetch each leg's flights once, in parallel.
+
+    `on_progress(done, total)` is called as legs complete. When `should_stop()`
+    turns true the legs not yet started are dropped and CancelledError raised.
+    A leg whose lookup fails comes back with no flights and is added to
+    `failed`, the other legs still count.
+    """
+    legs = list(legs)
+    fetched: Dict[Leg, List[AdvFlysTo]] = {}
+
+    fetch_legs_pending.inc(len(legs))
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = {
+            executor.submit(
+                getAdvFlights,
+                adult=adults,
+                departDate=leg[2],
+                origin_airport=leg[0],
+                destination_airport=leg[1],
+            ): leg
+            for leg in legs
+        }
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=STOP_CHECK_INTERVAL, return_when=FIRST_COMPLETED)
+                fetch_legs_pending.dec(len(done))
+                for future in done:
+                    leg = futures[future]
+                    try:
+                        fetched[leg] = future.result()
+                    except LEG_ERRORS as e:
+                        print(f"Warning: Could not price {leg[0]}->{leg[1]} on {leg[2]}. Error: {e}")
+                        fetched[leg] = []
+                        if failed is not None:
+                            failed.add(leg)
+                if done and on_progress is not None:
+                    on_progress(len(fetched), len(legs))
+                if should_stop is not None and should_stop():
+                    raise CancelledError(f"Stopped after fetching {len(fetched)} of {len(legs)} legs")
+        finally:
+            fetch_legs_pending.dec(len(pending))
+            for future in pending:
+                future.cancel()
+
+    return {leg: fetched[leg] for leg in legs}
+
+def build_trip(
+    result: Neo4jResultFormatted,
+    outbound: AdvFlysTo,
+    ret: AdvFlysTo,
+    airport_lookup: Dict[str, Airport],
+) -> Trip:
+    return Trip(
+        result=result,
+        outbound=outbound,
+        inbound=ret,
+        originDepartureAirport=airport_lookup.get(result.origin_departure_airport_code),
+        destinationArrivalAirport=airport_lookup.get(result.destination_arrival_airport_code),
+        destinationDepartureAirport=airport_lookup.get(result.destination_departure_airport_code),
+        originArrivalAirport=airport_lookup.get(result.origin_arrival_airport_code),
+    )
+
+def _primary_score(sort_key: str, result: Neo4jResultFormatted, outbound: AdvFlysTo) -> float:
+    # Trips are ranked by (primary, fare); the primary never depends on the return leg
+    if sort_key == "fare":
+        return 0.0
+    if sort_key == "distance":
+        return result.travel_distance_km or 0.0
+    if sort_key == "departure":
+        return outbound.departureTime.timestamp() if outbound.departureTime else math.inf
+    raise ValueError(f"Unknown sort key {sort_key}")
+
 def build_trips_from_neo4j_results(
     results: List[Neo4jResultFormatted],
     adults: int = 1,
     airports: List[Airport] | None = None,
+    limit: Optional[int] = None,
+    sort_key: str = "fare",
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    max_fare: Optional[float] = None,
+    on_trips: Optional[Callable[[int], None]] = None,
 ) -> List[Trip]:
+    """
+    Price the candidate rows and return the best trips, sorted by `sort_key`
+    ("fare", "distance" or "departure", ties broken by fare). Trips whose
+    live fare is above `max_fare` are dropped.
+
+    With a `limit` only the best K outbound/return pairs are kept in a bounded
+    heap. Legs are pre-sorted so that once a pair cannot beat the current K-th
+    best, the remaining pairs for that leg are skipped without building Trips.
+
+    `should_stop()` is checked while legs are fetched and every
+    STOP_CHECK_RESULTS rows while pairs are ranked; CancelledError is raised
+    once it turns true. `on_trips(count)` gets the number of trips kept so
+    far at the same points, and the final count once ranking is done.
+    """
+    if sort_key not in SORT_KEYS:
+        raise ValueError(f"Unknown sort key {sort_key}")
 
     if airports is None:
         airports = []
@@ -74,77 +263,91 @@ def build_trips_from_neo4j_results(
     # Pre-index airports for fast lookup
     airport_lookup: Dict[str, Airport] = {a.code: a for a in airports}
 
-    def process_result(result: Neo4jResultFormatted) -> List[Trip]:
-        local_trips: List[Trip] = []
+    # Many results share a leg (same route and date), so plan them first and fetch each once
+    legs = plan_legs(results)
 
-        outboundflights = getAdvFlights(
-            adult=adults,
-            departDate=neo4j_date_to_str(result.origin_departure_date),
-            origin_airport=result.origin_departure_airport_code,
-            destination_airport=result.destination_arrival_airport_code,
-        )
+    started = time.perf_counter()
+    failed_legs: Set[Leg] = set()
+    leg_flights = fetch_legs(legs, adults, on_progress, should_stop, failed_legs)
+    fetch_seconds = time.perf_counter() - started
+    search_stage_seconds.observe(fetch_seconds, stage="fetch")
+    started = time.perf_counter()
+
+    # Sort every leg's flights by fare once, dropping flights without a fare
+    priced: Dict[Leg, List[AdvFlysTo]] = {}
+    for leg, flights in leg_flights.items():
+        priced[leg] = sorted((f for f in flights if f.fare is not None), key=lambda f: f.fare)
+        if len(priced[leg]) < len(flights):
+            print(f"WARNING: Fare is None, skipping {len(flights) - len(priced[leg])} flights from {leg[0]} to {leg[1]} on {leg[2]}")
 
-        returnflights = getAdvFlights(
-            adult=adults,
-            departDate=neo4j_date_to_str(result.destination_departure),
-            origin_airport=result.destination_departure_airport_code,
-            destination_airport=result.origin_arrival_airport_code,
+    # Max-heap on (primary, fare) via negated scores, holding the best pairs seen so far
+    heap: list = []
+    sequence = 0
+
+    def worst() -> Tuple[float, float]:
+        return -heap[0][0], -heap[0][1]
+
+    for position, result in enumerate(results):
+        if position % STOP_CHECK_RESULTS == 0:
+            if should_stop is not None and should_stop():
+                raise CancelledError(f"Stopped after ranking {position} of {len(results)} results")
+            if on_trips is not None:
+                on_trips(len(heap))
+
+        outboundflights = priced[outbound_leg(result)]
+        returnflights = priced[return_leg(result)]
+        if not outboundflights or not returnflights:
+            continue
+
+        cheapest_return = returnflights[0].fare
+        outbound_order = sorted(
+            outboundflights,
+            key=lambda f: (_primary_score(sort_key, result, f), f.fare),
         )
 
-        for outbound in outboundflights:
+        for outbound in outbound_order:
+            if max_fare is not None and outbound.fare + cheapest_return > max_fare:
+                continue
+
+            primary = _primary_score(sort_key, result, outbound)
+            full = limit is not None and len(heap) >= limit
+
+            # Outbounds are in (primary, fare) order, so no later one can do better either
+            if full and (primary, outbound.fare + cheapest_return) >= worst():
+                break
+
             for ret in returnflights:
-                fare = (
-                    outbound.fare + ret.fare
-                    if outbound.fare is not None and ret.fare is not None
-                    else None
-                )
-                
-                if fare is None:
-                    print(f"WARNING: Fare is None, skipping trip from {result.origin_departure_airport_code} to {result.destination_arrival_airport_code}")
-                    continue
-
-                destination = (
-                    outbound.destinationName
-                    if outbound.destinationName == ret.originName
-                    else f"{outbound.destinationName} / {ret.originName}"
-                )
-
-                def coord(code, attr):
-                    airport = airport_lookup.get(code)
-                    return getattr(airport, attr) if airport else None
-
-                local_trips.append(
-                    Trip(
-                        destination=destination,
-                        originDepartureAirportName=result.origin_departure_airport_code,
-                        destinationArrivalAirportName=result.destination_arrival_airport_code,
-                        destinationDepartureAirportName=result.destination_departure_airport_code,
-                        originArrivalAirportName=result.origin_arrival_airport_code,
-                        originDepartureTime=outbound.departureTime,
-                        destinationArrivalTime=outbound.arrivalTime,
-                        destinationDepartureTime=ret.departureTime,
-                        originArrivalTime=ret.arrivalTime,
-                        fullFare=fare,
-                        distance=result.travel_distance_km,
-                        originDepartureLat=coord(result.origin_departure_airport_code, "latitude"),
-                        originDepartureLon=coord(result.origin_departure_airport_code, "longitude"),
-                        destinationArrivalLat=coord(result.destination_arrival_airport_code, "latitude"),
-                        destinationArrivalLon=coord(result.destination_arrival_airport_code, "longitude"),
-                        destinationDepartureLat=coord(result.destination_departure_airport_code, "latitude"),
-                        destinationDepartureLon=coord(result.destination_departure_airport_code, "longitude"),
-                        originArrivalLat=coord(result.origin_arrival_airport_code, "latitude"),
-                        originArrivalLon=coord(result.origin_arrival_airport_code, "longitude"),
-                    )
-                )
-
-        return local_trips
-
-    trips: List[Trip] = []
+                fare = outbound.fare + ret.fare
+                if max_fare is not None and fare > max_fare:
+                    break
 
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = [executor.submit(process_result, r) for r in results]
+                full = limit is not None and len(heap) >= limit
+
+                if full and (primary, fare) >= worst():
+                    break
+
+                sequence += 1
+                entry = (-primary, -fare, -sequence, result, outbound, ret)
+                if full:
+                    heapq.heapreplace(heap, entry)
+                else:
+                    heapq.heappush(heap, entry)
 
-        for future in as_completed(futures):
-            trips.extend(future.result())
+    ranked = sorted(heap, key=lambda entry: (-entry[0], -entry[1], -entry[2]))
+    trips = [build_trip(result, outbound, ret, airport_lookup) for _, _, _, result, outbound, ret in ranked]
+    if on_trips is not None:
+        on_trips(len(trips))
 
-    return trips
\ No newline at end of file
+    assemble_seconds = time.perf_counter() - started
+    search_stage_seconds.observe(assemble_seconds, stage="assemble")
+    log_event(
+        "trips_built",
+        results=len(results),
+        legs=len(legs),
+        legs_without_dedup=2 * len(results),
+        legs_failed=len(failed_legs),
+        trips=len(trips),
+        fetch_seconds=round(fetch_seconds, 3),
+        assemble_seconds=round(assemble_seconds, 3),
+    )
+    return trips
@@ -0,0 +1,19 @@
+import os
+import unittest
+
+from benchmarks.fixtures import connect_neo4j
+
+
+def connect_or_skip():
+    """
+    Driver for tests that write to Neo4j. They only run against a database
+    named explicitly in BENCH_NEO4J_URI, never a default local one that may
+    hold real data.
+    """
+    if not os.getenv("BENCH_NEO4J_URI"):
+        raise unittest.SkipTest("BENCH_NEO4J_URI is not set")
+
+    driver, _ = connect_neo4j()
+    if driver is None:
+        raise unittest.SkipTest("Neo4j is not reachable")
+    return driver
@@ -0,0 +1,53 @@
+import os
+import unittest
+
+os.environ.setdefault("FARE_CACHE_BACKEND", "memory")
+
+import app
+
+
+class FormInputTest(unittest.TestCase):
+    """Fields that do not parse are answered with a 400 before any search runs."""
+
+    search = {"r1_dates": "2026-11-01", "r2_dates": "2026-11-05", "lengths_of_stay": "4", "adults": "1"}
+
+    def setUp(self):
+        self.client = app.app.test_client()
+
+    def assertBadRequest(self, response, field):
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(field, response.get_json()["error"])
+
+    def test_search_numbers(self):
+        for field, value in [
+            ("adults", "two"), ("adults", "0"), ("limit", "all"), ("max_fare", "cheap"),
+            ("max_total_fare", "nan"), ("max_distance", "far"), ("lengths_of_stay", "4,x"), ("r1_dates", "tomorrow"),
+        ]:
+            with self.subTest(field=field, value=value):
+                response = self.client.post("/api/search", data=dict(self.search, **{field: value}))
+                self.assertBadRequest(response, field)
+
+    def test_connecting_numbers(self):
+        form = {"destinations[]": "AAA", "r1_dates": "2026-11-01"}
+        for field, value in [("max_hops", "two"), ("min_connection", "1h"), ("max_travel_hours", "inf"), ("limit", "-")]:
+            with self.subTest(field=field, value=value):
+                response = self.client.post("/api/connecting", data=dict(form, **{field: value}))
+                self.assertBadRequest(response, field)
+
+    def test_search_job_numbers(self):
+        response = self.client.post("/search_jobs", data=dict(self.search, adults="x"))
+        self.assertBadRequest(response, "adults")
+
+    def test_trips_page(self):
+        job = app.SearchJob(search={}, adults=1, sort_key="fare", limit=10)
+        job.status = "done"
+        job.trips = []
+        app.search_jobs._jobs[job.id] = job
+        for page in ("next", "0"):
+            with self.subTest(page=page):
+                response = self.client.get(f"/search_jobs/{job.id}/trips", query_string={"page": page})
+                self.assertBadRequest(response, "page")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+from concurrent.futures import CancelledError
+from datetime import datetime, time, timedelta
+import random
+import time as clock
+import unittest
+
+from benchmarks.fixtures import SyntheticRepository
+from benchmarks.synthetic import generate_network, stable_hash
+from src.connectingSearch import ConnectingSearch
+from src.models.advFlysTo import AdvFlysTo
+from src.searchEngine import FlightSearchEngine
+
+
+class NoFaresRepository(SyntheticRepository):
+    """A graph crawled before indicative fares were stored, with routes in a shuffled order."""
+
+    def __init__(self, network, seed: int):
+        super().__init__(network)
+        self.seed = seed
+
+    def getRouteDates(self):
+        routes = list(self.network.routes.items())
+        random.Random(self.seed).shuffle(routes)
+        return dict(routes)
+
+    def getRouteFares(self):
+        return {}
+
+
+def fetch(legs, adults=1, on_progress=None, should_stop=None):
+    # Three flights a day on every leg, so one and two stop connections exist
+    if should_stop is not None and should_stop():
+        raise CancelledError("Stopped")
+    flights = {}
+    for origin, destination, day in legs:
+        departure_day = datetime.combine(datetime.fromisoformat(day).date(), time())
+        flights[(origin, destination, day)] = [
+            AdvFlysTo(
+                origin=origin,
+                destination=destination,
+                departureTime=departure_day + timedelta(hours=hour),
+                arrivalTime=departure_day + timedelta(hours=hour + 1),
+                fare=float(10 + stable_hash(origin, destination) % 50),
+                flightNumber=f"FR{hour:02d}",
+            )
+            for hour in (6, 12, 18)
+        ]
+    return flights
+
+
+class ConnectingSearchWithoutFaresTest(unittest.TestCase):
+    def setUp(self):
+        self.network = generate_network(airport_count=120, base_count=3, days=21, seed=11)
+        self.start = min(d for dates in self.network.routes.values() for d in dates)
+        served = {destination for base in self.network.bases for destination in self.network.destinations(base)}
+        self.args = dict(
+            origins=self.network.bases,
+            destinations=[a.code for a in self.network.airports if a.code not in served][:10],
+            departure_dates=[self.start + timedelta(days=d) for d in range(4)],
+            max_hops=2,
+        )
+
+    def search(self, seed: int) -> ConnectingSearch:
+        engine = FlightSearchEngine(NoFaresRepository(self.network, seed))
+        engine.reload()
+        return ConnectingSearch(engine, fetch=fetch)
+
+    def test_candidates_do_not_depend_on_walk_order(self):
+        first = self.search(1).candidate_paths(**self.args, max_paths=24)
+        second = self.search(2).candidate_paths(**self.args, max_paths=24)
+
+        self.assertEqual(len(first), 24)
+        self.assertEqual([(c.airports, c.days) for c in first], [(c.airports, c.days) for c in second])
+        self.assertTrue(all(c.lower_bound == 0 for c in first))
+
+    def test_candidates_shared_over_days_and_origins(self):
+        candidates = self.search(1).candidate_paths(**self.args, max_paths=24)
+        groups = {(c.airports[0], c.days[0][0]) for c in candidates}
+
+        # 3 origins x 4 days, each gets 2 of the 24 places
+        reachable = {
+            (c.airports[0], c.days[0][0]) for c in self.search(1).candidate_paths(**self.args, max_paths=10_000)
+        }
+        self.assertEqual(groups, reachable)
+        for group in groups:
+            self.assertGreaterEqual(sum((c.airports[0], c.days[0][0]) == group for c in candidates), 2)
+
+    def test_search_prices_and_connects(self):
+        trips = self.search(1).search(**self.args, limit=20, max_paths=24)
+
+        self.assertTrue(trips)
+        self.assertEqual([t.fullFare for t in trips], sorted(t.fullFare for t in trips))
+        for trip in trips:
+            self.assertIn(trip.origin, self.network.bases)
+            self.assertIn(trip.destination, self.args["destinations"])
+            self.assertTrue(all(timedelta(hours=1) <= gap <= timedelta(hours=8) for gap in trip.connectionTimes))
+
+    def test_time_budget_prices_the_best_candidates_only(self):
+        fetched = []
+
+        def slow_fetch(legs, *args):
+            fetched.append(len(legs))
+            clock.sleep(0.05)
+            return fetch(legs, *args)
+
+        engine = self.search(1).engine
+        trips = ConnectingSearch(engine, fetch=slow_fetch).search(
+            **self.args, limit=20, max_paths=100, time_budget=0.08, price_batch=10
+        )
+        self.assertTrue(trips)
+        self.assertLess(len(fetched), 10)
+
+    def test_should_stop_cancels(self):
+        with self.assertRaises(CancelledError):
+            self.search(1).search(**self.args, max_paths=24, should_stop=lambda: True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+from src.fareCache import SqliteCacheBackend, TieredCache, decode_adv_flights, encode_adv_flights
+
+
+class BrokenBackend(SqliteCacheBackend):
+    """A backend whose file has gone bad after it was opened."""
+
+    def get(self, key):
+        raise sqlite3.OperationalError("database is locked")
+
+    def set(self, key, value, expires_at):
+        raise sqlite3.OperationalError("database or disk is full")
+
+    def delete(self, key):
+        raise sqlite3.DatabaseError("database disk image is malformed")
+
+    def clear(self):
+        raise sqlite3.OperationalError("database is locked")
+
+    def recent(self, limit):
+        raise sqlite3.OperationalError("database is locked")
+
+
+class TieredCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "cache.sqlite3")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_backend_shared_between_instances(self):
+        first = TieredCache(maxsize=4, ttl=60, backend=SqliteCacheBackend(self.path, "test", maxsize=16))
+        second = TieredCache(maxsize=4, ttl=60, backend=SqliteCacheBackend(self.path, "test", maxsize=16))
+        first["key"] = {"fare": 10}
+        self.assertEqual(second["key"], {"fare": 10})
+
+    def test_backend_errors_fall_back_to_memory(self):
+        cache = TieredCache(maxsize=4, ttl=60, backend=BrokenBackend(self.path, "test", maxsize=16))
+
+        cache["key"] = [1, 2]
+        self.assertEqual(cache["key"], [1, 2])
+        self.assertIsNotNone(cache.expires_at("key"))
+        with self.assertRaises(KeyError):
+            cache["missing"]
+        self.assertIsNone(cache.expires_at("missing"))
+        self.assertEqual(cache.warm(), 0)
+
+        del cache["key"]
+        self.assertNotIn("key", cache)
+        cache.clear()
+        self.assertEqual(cache.backend_errors, 7)
+
+    def test_corrupt_payload_is_a_miss(self):
+        backend = SqliteCacheBackend(self.path, "test", maxsize=16)
+        cache = TieredCache(maxsize=4, ttl=60, backend=backend, encode=encode_adv_flights, decode=decode_adv_flights)
+        cache["good"] = []
+        backend.set("truncated", encode_adv_flights([])[:-3], time.time() + 60)
+        backend.set("garbage", b"not zlib", time.time() + 60)
+
+        reader = TieredCache(maxsize=4, ttl=60, backend=backend, encode=encode_adv_flights, decode=decode_adv_flights)
+        self.assertEqual(reader.warm(), 1)
+        for key in ("truncated", "garbage"):
+            with self.assertRaises(KeyError):
+                reader[key]
+            self.assertIsNone(backend.get(key))
+        self.assertEqual(reader["good"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
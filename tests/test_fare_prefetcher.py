@@ -0,0 +1,35 @@
+from datetime import date, timedelta
+import unittest
+from unittest import mock
+
+from src.farePrefetcher import FarePrefetcher
+from src.models.neo4jResult import Neo4jResultFormatted
+
+
+def results(count: int):
+    day = date.today() + timedelta(days=3)
+    return [
+        Neo4jResultFormatted(f"O{i:03d}", "DST", "DST", f"O{i:03d}", day, day + timedelta(days=2))
+        for i in range(count)
+    ]
+
+
+class FarePrefetcherTest(unittest.TestCase):
+    def test_searches_ignored_while_stopped(self):
+        prefetcher = FarePrefetcher(repository=None)
+        prefetcher.record_search(results(10))
+        self.assertEqual(prefetcher.stats()["tracked_legs"], 0)
+        self.assertEqual(prefetcher.stats()["tracked_routes"], 0)
+
+    def test_tracked_legs_bounded(self):
+        prefetcher = FarePrefetcher(repository=None, max_tracked_legs=15)
+        # Running, as far as record_search is concerned, without a worker thread
+        with mock.patch.object(FarePrefetcher, "running", new_callable=mock.PropertyMock, return_value=True):
+            prefetcher.record_search(results(10))
+            prefetcher.record_search(results(5))
+        self.assertEqual(prefetcher.stats()["tracked_legs"], 15)
+        self.assertIn(("O000", "DST", (date.today() + timedelta(days=3)).isoformat()), prefetcher._searched_legs)
+
+
+if __name__ == "__main__":
+    unittest.main()
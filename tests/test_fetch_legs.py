@@ -0,0 +1,66 @@
+from datetime import date, datetime, timedelta
+import unittest
+from unittest import mock
+
+import requests
+
+from src import utils
+from src.models.advFlysTo import AdvFlysTo
+from src.models.neo4jResult import Neo4jResultFormatted
+from src.requestScheduler import CircuitOpenError
+
+DAY = date(2026, 11, 2)
+
+
+def get_adv_flights(adult, departDate, origin_airport, destination_airport):
+    if origin_airport == "BAD":
+        raise requests.HTTPError("503 Server Error")
+    if destination_airport == "BAD":
+        raise CircuitOpenError("Circuit open for fares")
+    departure = datetime.fromisoformat(departDate) + timedelta(hours=8)
+    return [AdvFlysTo(origin_airport, destination_airport, departureTime=departure,
+                      arrivalTime=departure + timedelta(hours=2), fare=20.0)]
+
+
+class FetchLegsTest(unittest.TestCase):
+    def setUp(self):
+        patch = mock.patch.object(utils, "getAdvFlights", side_effect=get_adv_flights)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_failed_legs_come_back_empty(self):
+        legs = [("DUB", "STN", "2026-11-02"), ("BAD", "STN", "2026-11-02"), ("DUB", "BAD", "2026-11-03")]
+        failed = set()
+        fetched = utils.fetch_legs(legs, failed=failed)
+
+        self.assertEqual(len(fetched[legs[0]]), 1)
+        self.assertEqual(fetched[legs[1]], [])
+        self.assertEqual(fetched[legs[2]], [])
+        self.assertEqual(failed, set(legs[1:]))
+
+    def test_other_legs_still_form_trips(self):
+        results = [
+            Neo4jResultFormatted("DUB", "STN", "STN", "DUB", DAY, DAY + timedelta(days=3)),
+            Neo4jResultFormatted("DUB", "BAD", "BAD", "DUB", DAY, DAY + timedelta(days=3)),
+        ]
+        with mock.patch.object(utils, "log_event") as log_event:
+            trips = utils.build_trips_from_neo4j_results(results)
+
+        self.assertEqual([trip.result.destination_arrival_airport_code for trip in trips], ["STN"])
+        self.assertEqual(log_event.call_args.kwargs["legs_failed"], 2)
+
+    def test_running_trip_count(self):
+        results = [
+            Neo4jResultFormatted("DUB", "STN", "STN", "DUB", DAY, DAY + timedelta(days=stay))
+            for stay in (2, 3, 4)
+        ]
+        counts = []
+        with mock.patch.object(utils, "STOP_CHECK_RESULTS", 1), mock.patch.object(utils, "log_event"):
+            trips = utils.build_trips_from_neo4j_results(results, on_trips=counts.append)
+
+        self.assertEqual(len(trips), 3)
+        self.assertEqual(counts, [0, 1, 2, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+from collections import Counter
+from datetime import date
+import unittest
+from unittest import mock
+
+from src import ryanairApi
+from src.graphRefresh import refreshBaseRoutes
+from src.models.airport import Airport
+from src.models.refreshSummary import RefreshSummary
+
+DAY = date(2026, 11, 2)
+ROUTES = {"AAA": ["BBB", "CCC"], "BBB": ["AAA", "CCC"], "CCC": ["AAA", "BBB"]}
+
+
+class FakeRepository:
+    """The FLYS_TO side of GraphRepository over a dict of (origin, destination, date) -> fare."""
+
+    def __init__(self):
+        self.edges = {}
+
+    def getFlightFares(self, airport_codes):
+        return {key: fare for key, fare in self.edges.items() if key[0] in airport_codes or key[1] in airport_codes}
+
+    def getServedAirportCodes(self):
+        return {code for key in self.edges for code in key[:2]}
+
+    def save_flights(self, flights):
+        for flight in flights:
+            self.edges[(flight.origin.code, flight.destination.code, flight.date)] = flight.fare
+        return len(flights)
+
+    def delete_flights(self, keys):
+        for key in keys:
+            del self.edges[key]
+        return len(keys)
+
+    def save_distances(self, distances):
+        return sum(1 for _ in distances)
+
+    def delete_distances(self, airport_codes):
+        return 0
+
+
+class RefreshBaseRoutesTest(unittest.TestCase):
+    def setUp(self):
+        self.airports = [
+            Airport(code=code, name=code, cityName=code, countryName="Ireland", latitude=53.0 + i, longitude=-6.0)
+            for i, code in enumerate(ROUTES)
+        ]
+        self.fetched = Counter()
+
+        def dates(origin, destination):
+            self.fetched[(origin, destination)] += 1
+            return [DAY], {DAY: 20.0}
+
+        patches = [
+            mock.patch.object(ryanairApi, "getRoutesForAirport", side_effect=lambda code: ROUTES[code]),
+            mock.patch.object(ryanairApi, "getFlightDatesWithFares", side_effect=dates),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_bases_one_at_a_time_share_crawled_directions(self):
+        repository = FakeRepository()
+        summary = RefreshSummary(baseAirports=["AAA", "BBB"])
+        crawled = set()
+
+        refreshBaseRoutes(repository, ["AAA"], self.airports, summary, crawled=crawled)
+        refreshBaseRoutes(repository, ["BBB"], self.airports, summary, crawled=crawled)
+
+        # AAA-BBB is served by both bases but only looked up for the first
+        self.assertEqual(set(self.fetched.values()), {1})
+        self.assertEqual(len(self.fetched), 6)
+        self.assertEqual(len(crawled), 6)
+        self.assertEqual(summary.flightsAdded, 6)
+        self.assertEqual(summary.flightsRemoved, 0)
+        self.assertIn(("BBB", "AAA", DAY), repository.edges)
+
+    def test_without_crawled_every_direction_is_fetched(self):
+        repository = FakeRepository()
+        refreshBaseRoutes(repository, ["AAA"], self.airports)
+        refreshBaseRoutes(repository, ["BBB"], self.airports)
+
+        self.assertEqual(self.fetched[("AAA", "BBB")], 2)
+        self.assertEqual(len(repository.edges), 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import time
+import unittest
+from unittest import mock
+
+from src import ingestionJobs
+from src.ingestionJobs import IngestionJobManager
+
+
+class FakeRepository:
+    """The lock and checkpoint side of GraphRepository, with a lease that can be lost."""
+
+    def __init__(self, renewals_allowed: int):
+        self.renewals_allowed = renewals_allowed
+        self.renewals = 0
+        self.checkpoints = []
+        self.released = False
+
+    def acquire_ingestion_lock(self, owner, ttl):
+        self.renewals += 1
+        return self.renewals <= self.renewals_allowed
+
+    def release_ingestion_lock(self, owner):
+        self.released = True
+
+    def setup_schema(self):
+        pass
+
+    def update_airports(self, airports):
+        return 0
+
+    def load_spatial_index(self):
+        pass
+
+    def save_ingestion_checkpoint(self, checkpoint):
+        self.checkpoints.append(checkpoint)
+
+    def clear_ingestion_checkpoint(self):
+        self.checkpoints.append(None)
+
+
+def crawl(repository, codes, airports, summary, on_progress=None, crawled=None):
+    for done in range(1, 4):
+        on_progress(done, 3)
+    return summary
+
+
+class IngestionJobManagerTest(unittest.TestCase):
+    def run_job(self, repository, lock_ttl=900):
+        manager = IngestionJobManager(repository, lock_ttl=lock_ttl)
+        with mock.patch.object(ingestionJobs, "getActiveAirports", return_value=[]), \
+                mock.patch.object(ingestionJobs, "refreshBaseRoutes", side_effect=crawl):
+            job = manager.submit("refresh", ["AAA", "BBB"])
+            deadline = time.monotonic() + 5
+            while not job.finished and time.monotonic() < deadline:
+                time.sleep(0.01)
+        return job
+
+    def test_done(self):
+        repository = FakeRepository(renewals_allowed=100)
+        job = self.run_job(repository)
+        self.assertEqual(job.status, "done")
+        self.assertEqual(repository.checkpoints[-1], None)
+        self.assertTrue(repository.released)
+
+    def test_lost_lease_after_a_base_fails_the_job(self):
+        # Acquire, then the renewal after the first base is refused
+        repository = FakeRepository(renewals_allowed=1)
+        job = self.run_job(repository)
+        self.assertEqual(job.status, "failed")
+        self.assertIn("Lost the ingestion lock", job.error)
+        self.assertEqual(job.completed, ["AAA"])
+        # Only the checkpoint from before the crawl, nothing written after the lease was lost
+        self.assertEqual(len(repository.checkpoints), 1)
+
+    def test_lease_renewed_during_crawl(self):
+        # With no renewal interval every progress callback renews, the second is refused
+        repository = FakeRepository(renewals_allowed=2)
+        job = self.run_job(repository, lock_ttl=0)
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.progress["AAA"].status, "failed")
+        self.assertEqual(job.progress["AAA"].routes_crawled, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
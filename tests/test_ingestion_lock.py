@@ -0,0 +1,58 @@
+import threading
+import unittest
+import uuid
+
+from src.graphRepository import GraphRepository
+from tests.graphDatabase import connect_or_skip
+
+
+class IngestionLockTest(unittest.TestCase):
+    """Concurrent lease takers against a real database, on lock nodes of their own."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.driver = connect_or_skip()
+        GraphRepository(cls.driver).setup_schema()
+
+    @classmethod
+    def tearDownClass(cls):
+        with cls.driver.session() as session:
+            session.run("MATCH (l:IngestionLock) WHERE l.id STARTS WITH 'test-' DELETE l").consume()
+        cls.driver.close()
+
+    def race(self, lock_id: str, owners: list) -> dict:
+        barrier = threading.Barrier(len(owners))
+        won = {}
+
+        def take(owner):
+            barrier.wait()
+            with self.driver.session() as session:
+                won[owner] = session.execute_write(GraphRepository._acquire_lock, owner, 60, lock_id)
+
+        threads = [threading.Thread(target=take, args=(owner,)) for owner in owners]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(30)
+        return won
+
+    def test_only_one_owner_wins(self):
+        for _ in range(20):
+            lock_id = f"test-{uuid.uuid4().hex}"
+            won = self.race(lock_id, ["first", "second"])
+            self.assertEqual(sorted(won.values()), [False, True])
+
+            with self.driver.session() as session:
+                count = session.run("MATCH (l:IngestionLock {id: $id}) RETURN count(l) AS n", id=lock_id).single()["n"]
+            self.assertEqual(count, 1)
+
+    def test_owner_renews(self):
+        lock_id = f"test-{uuid.uuid4().hex}"
+        with self.driver.session() as session:
+            self.assertTrue(session.execute_write(GraphRepository._acquire_lock, "first", 60, lock_id))
+            self.assertTrue(session.execute_write(GraphRepository._acquire_lock, "first", 60, lock_id))
+            self.assertFalse(session.execute_write(GraphRepository._acquire_lock, "second", 60, lock_id))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+from datetime import timedelta
+import unittest
+
+from benchmarks import queryProfile
+from benchmarks.synthetic import generate_network
+from src.graphRepository import GraphRepository
+from src.searchEngine import FlightSearchEngine
+from tests.graphDatabase import connect_or_skip
+
+
+class QueryProfileTest(unittest.TestCase):
+    """
+    The rewritten search query against the one it replaced, on a synthetic
+    graph in the benchmark database. Only runs with BENCH_NEO4J_URI set,
+    and clears the graph there.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.driver = connect_or_skip()
+
+        network = generate_network(airport_count=80, base_count=3, days=21, seed=7)
+        cls.repository = GraphRepository(cls.driver)
+        cls.repository.clearGraph()
+        cls.repository.setup_schema()
+        cls.repository.save_airports(network.airports)
+        cls.repository.save_flights(network.flights())
+        cls.repository.load_spatial_index()
+
+        start = min(d for dates in network.routes.values() for d in dates)
+        cls.search = {
+            "origin_departure_airports": network.bases,
+            "origin_arrival_airports": network.bases,
+            "r1_dates": [start + timedelta(days=d) for d in range(7)],
+            "r2_dates": [start + timedelta(days=d) for d in range(2, 14)],
+            "lengths_of_stay": [2, 3, 4, 5],
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.driver.close()
+
+    def test_fewer_db_hits_than_baseline(self):
+        profile = queryProfile.compare(self.repository, self.search)
+        self.assertGreater(profile["current"]["rows"], 0)
+        self.assertLess(profile["current"]["db_hits"], profile["baseline"]["db_hits"])
+
+    def test_fewer_db_hits_with_country_filter(self):
+        search = dict(self.search, blacklist_countries=["Country 01", "Country 02"])
+        profile = queryProfile.compare(self.repository, search)
+        self.assertLess(profile["current"]["db_hits"], profile["baseline"]["db_hits"])
+
+    def test_origins_anchored_on_index(self):
+        self.assertTrue(self.repository.profile_flights_query(**self.search)["indexes"])
+
+    def test_engine_matches_repository_with_repeated_codes(self):
+        base = self.search["origin_departure_airports"][0]
+        for same_airport_return in (True, False):
+            search = dict(
+                self.search,
+                origin_departure_airports=[base, base] + self.search["origin_departure_airports"],
+                origin_arrival_airports=self.search["origin_arrival_airports"] + [base],
+                same_airport_return=same_airport_return,
+            )
+            engine = FlightSearchEngine(self.repository)
+            self.assertCountEqual(engine.query_flights(**search), self.repository.query_flights(**search))
+
+
+if __name__ == "__main__":
+    unittest.main()
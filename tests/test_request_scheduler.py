@@ -0,0 +1,47 @@
+import unittest
+
+import requests
+
+from src.requestScheduler import CircuitOpenError, EndpointPolicy, RequestScheduler
+
+
+def response(status: int) -> requests.Response:
+    result = requests.Response()
+    result.status_code = status
+    return result
+
+
+class RequestSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        policy = EndpointPolicy(rate=1000, burst=1000, max_retries=0, failure_threshold=2, reset_timeout=0.05)
+        self.scheduler = RequestScheduler({"test": policy})
+        self.breaker = self.scheduler._endpoint("test").breaker
+
+    def fail(self, error: Exception):
+        def send(timeout):
+            raise error
+        with self.assertRaises(type(error)):
+            self.scheduler.request("test", send)
+
+    def test_unexpected_errors_open_the_breaker(self):
+        self.fail(requests.TooManyRedirects("loop"))
+        self.fail(ValueError("bad payload"))
+        self.assertEqual(self.breaker.state, "open")
+        with self.assertRaises(CircuitOpenError):
+            self.scheduler.request("test", lambda timeout: response(200))
+
+    def test_unexpected_error_ends_half_open_trial(self):
+        self.fail(ValueError("bad payload"))
+        self.fail(ValueError("bad payload"))
+        self.breaker.opened_at -= 1    # past reset_timeout, the next call is the trial
+
+        self.fail(ValueError("bad payload"))
+        self.assertFalse(self.breaker.trial_in_progress)
+
+        self.breaker.opened_at -= 1
+        self.assertEqual(self.scheduler.request("test", lambda timeout: response(200)).status_code, 200)
+        self.assertEqual(self.breaker.state, "closed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+from datetime import timedelta
+import unittest
+
+from benchmarks.fixtures import SyntheticRepository
+from benchmarks.synthetic import generate_network
+from src.searchEngine import FlightSearchEngine
+
+
+class RepeatedAirportCodesTest(unittest.TestCase):
+    def setUp(self):
+        network = generate_network(airport_count=60, base_count=3, days=21, seed=5)
+        start = min(d for dates in network.routes.values() for d in dates)
+        self.engine = FlightSearchEngine(SyntheticRepository(network))
+        self.bases = network.bases
+        self.search = {
+            "r1_dates": [start + timedelta(days=d) for d in range(7)],
+            "r2_dates": [start + timedelta(days=d) for d in range(2, 14)],
+            "lengths_of_stay": [2, 3, 4, 5],
+        }
+
+    def test_repeated_codes_return_the_same_rows(self):
+        base = self.bases[0]
+        for same_airport_return in (True, False):
+            expected = self.engine.query_flights(
+                self.bases, self.bases, same_airport_return=same_airport_return, **self.search
+            )
+            self.assertTrue(expected)
+            repeated = self.engine.query_flights(
+                [base, base] + self.bases,
+                self.bases + [base],
+                same_airport_return=same_airport_return,
+                **self.search,
+            )
+            self.assertEqual(repeated, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
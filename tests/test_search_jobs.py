@@ -0,0 +1,83 @@
+import threading
+import time
+import unittest
+
+from src.searchJobs import SearchJobManager
+
+
+class SearchJobManagerTest(unittest.TestCase):
+    def wait_finished(self, job):
+        deadline = time.monotonic() + 5
+        while not job.finished and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(job.finished)
+
+    def test_cancelled_between_stages(self):
+        querying = threading.Event()
+        cancelled = threading.Event()
+        stages = []
+
+        def run(job):
+            job.stage = "query"
+            job.check_stop()
+            querying.set()
+            cancelled.wait(5)           # a query that does not look at should_stop
+            stages.append("query")
+            job.stage = "pricing"
+            job.check_stop()
+            stages.append("pricing")
+            return []
+
+        manager = SearchJobManager(run, max_workers=1)
+        job = manager.submit({}, 1, "fare", limit=10)
+        self.assertTrue(querying.wait(5))
+        manager.cancel(job.id)
+        cancelled.set()
+
+        self.wait_finished(job)
+        self.assertEqual(job.status, "cancelled")
+        self.assertEqual(stages, ["query"])
+
+    def test_time_budget(self):
+        def run(job):
+            time.sleep(0.1)
+            job.check_stop()
+            return []
+
+        manager = SearchJobManager(run, max_workers=1, time_budget=0.05)
+        job = manager.submit({}, 1, "fare", limit=10)
+
+        self.wait_finished(job)
+        self.assertEqual(job.status, "timed_out")
+
+    def test_done(self):
+        manager = SearchJobManager(lambda job: ["trip"], max_workers=1)
+        job = manager.submit({}, 1, "fare", limit=10)
+
+        self.wait_finished(job)
+        self.assertEqual(job.status, "done")
+        self.assertEqual(job.trips, ["trip"])
+
+    def test_trips_found_while_running(self):
+        ranking = threading.Event()
+        release = threading.Event()
+
+        def run(job):
+            job.set_trips_found(7)
+            ranking.set()
+            release.wait(5)
+            return ["trip"]
+
+        manager = SearchJobManager(run, max_workers=1)
+        job = manager.submit({}, 1, "fare", limit=10)
+        self.assertTrue(ranking.wait(5))
+        self.assertEqual(job.to_dict()["trips_found"], 7)
+        self.assertEqual(job.to_dict()["trips"], 0)
+        release.set()
+
+        self.wait_finished(job)
+        self.assertEqual(job.to_dict()["trips"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import threading
+import unittest
+
+from cachetools import LRUCache
+
+from src.singleFlight import single_flight_cached
+
+
+class SingleFlightCachedTest(unittest.TestCase):
+    def setUp(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = 0
+
+        @single_flight_cached(LRUCache(maxsize=8), key=lambda code: code, lock=threading.Lock())
+        def fetch(code):
+            self.calls += 1
+            self.started.set()
+            self.release.wait(5)
+            return {"code": code, "call": self.calls}
+
+        self.fetch = fetch
+
+    def join(self, leader, follower):
+        """Run `follower` while `leader` holds the flight for the same key; return both results."""
+        results = {}
+        thread = threading.Thread(target=lambda: results.setdefault("leader", leader("DUB")))
+        thread.start()
+        self.assertTrue(self.started.wait(5))
+
+        follower_thread = threading.Thread(target=lambda: results.setdefault("follower", follower("DUB")))
+        follower_thread.start()
+        follower_thread.join(0.1)    # give the follower time to join the flight
+        self.release.set()
+        thread.join(5)
+        follower_thread.join(5)
+        return results
+
+    def test_lookup_joins_refresh(self):
+        results = self.join(self.fetch.refresh, self.fetch)
+        self.assertEqual(results["leader"], {"code": "DUB", "call": 1})
+        self.assertEqual(results["follower"], {"code": "DUB", "call": 1})
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.fetch.cache_info()["coalesced"], 1)
+
+    def test_refresh_joins_lookup(self):
+        results = self.join(self.fetch, self.fetch.refresh)
+        self.assertEqual(results["leader"], {"code": "DUB", "call": 1})
+        self.assertEqual(results["follower"], {"code": "DUB", "call": 1})
+        self.assertEqual(self.calls, 1)
+
+    def test_refresh_replaces_cached_value(self):
+        self.release.set()
+        self.assertEqual(self.fetch("DUB")["call"], 1)
+        self.assertEqual(self.fetch.refresh("DUB")["call"], 2)
+        self.assertEqual(self.fetch("DUB")["call"], 2)
+        self.assertEqual(self.fetch.cache_info()["hits"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()